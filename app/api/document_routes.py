@@ -1,17 +1,36 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
 
-from app.models.document import DocumentCreate, DocumentInDB
+from app.models.document import (
+    DocumentBulkRequest,
+    DocumentBulkResponse,
+    DocumentCreate,
+    DocumentInDB,
+    DocumentPage,
+    DocumentSearchPage,
+    DocumentSimilarPage,
+    DocumentView,
+)
 from app.models.user import TokenData
 from app.services.document_service import (
     create_document,
     get_document,
+    get_document_etag,
     get_all_documents,
+    get_documents_page_etag,
+    export_documents,
     update_document,
     delete_document,
+    bulk_write_documents,
+    search_documents,
+    similar_documents,
 )
 from app.core.security import get_current_user
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.core.config import settings
+from app.core.etag import document_etag, etag_matches
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -22,55 +41,158 @@ async def create_new_document(
     doc: DocumentCreate,
     current_user: TokenData = Depends(get_current_user)
 ):
-    logger.info(f"User {current_user._id} is creating a new document.")
+    logger.info(f"User {current_user.sub} is creating a new document.")
     try:
-        new_doc = await create_document(doc, current_user._id)
-        logger.info(f"Document created with ID: {new_doc.id} by user {current_user._id}.")
+        new_doc = await create_document(doc, current_user.sub)
+        logger.info(f"Document created with ID: {new_doc.id} by user {current_user.sub}.")
         return new_doc
     except Exception as e:
-        logger.error(f"Error creating document for user {current_user._id}: {e}")
+        logger.error(f"Error creating document for user {current_user.sub}: {e}")
         raise HTTPException(status_code=500, detail="Failed to create document")
 
 
-@router.get("/{doc_id}", response_model=DocumentInDB)
-async def get_document_by_id(
-    doc_id: str,
+@router.post("/bulk", response_model=DocumentBulkResponse)
+async def bulk_documents(
+    request: DocumentBulkRequest,
     current_user: TokenData = Depends(get_current_user)
 ):
-    logger.info(f"User {current_user._id} requested document {doc_id}.")
-    document = await get_document(doc_id)
-    if not document:
-        logger.warning(f"Document {doc_id} not found for user {current_user._id}.")
-        raise HTTPException(status_code=404, detail="Document not found")
-    # Optional: check if user is authorized to view document here (if required)
-    return document
+    operations = len(request.create) + len(request.update) + len(request.delete)
+    logger.info(f"User {current_user.sub} submitted a bulk request with {operations} operations.")
+    if operations > settings.BULK_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Bulk requests are limited to {settings.BULK_MAX_OPERATIONS} operations"
+        )
+    try:
+        return await bulk_write_documents(request, current_user.sub, current_user.role)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error applying bulk request for user {current_user.sub}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to apply bulk request")
 
 
-@router.get("/", response_model=List[DocumentInDB])
+@router.get("/", response_model=DocumentPage, response_model_exclude_unset=True)
 async def list_all_documents(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of documents per page"),
+    after: Optional[str] = Query(None, description="Cursor returned as `next_cursor` by the previous page"),
+    view: DocumentView = Query(DocumentView.full, description="`summary` returns metadata, content length and a preview instead of the content"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, overrides `view`"),
+    if_none_match: Optional[str] = Header(None),
     current_user: TokenData = Depends(get_current_user)
 ):
-    logger.info(f"User {current_user._id} requested list of all documents.")
+    logger.info(f"User {current_user.sub} requested list of all documents.")
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
     try:
-        documents = await get_all_documents(current_user._id, current_user.role)
-        return documents
+        if if_none_match:
+            # Versions only: an unchanged page is answered without reading any document bodies
+            etag = await get_documents_page_etag(
+                current_user.sub, current_user.role, limit=limit, after=after, view=view, fields=field_list
+            )
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        page = await get_all_documents(
+            current_user.sub, current_user.role, limit=limit, after=after, view=view, fields=field_list
+        )
+        etag = page.pop("etag", None)
+        if etag:
+            response.headers["ETag"] = etag
+        return page
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching documents list for user {current_user._id}: {e}")
+        logger.error(f"Error fetching documents list for user {current_user.sub}: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch documents")
 
 
+@router.get("/export")
+async def export_all_documents(
+    batch_size: int = Query(settings.EXPORT_BATCH_SIZE, ge=1, le=10000, description="Documents fetched from MongoDB per round trip"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    logger.info(f"User {current_user.sub} requested an export of all documents.")
+    try:
+        chunks = await export_documents(current_user.sub, current_user.role, batch_size=batch_size)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error starting document export for user {current_user.sub}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to export documents")
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
+
+
+@router.get("/search", response_model=DocumentSearchPage, response_model_exclude_unset=True)
+async def search_all_documents(
+    q: str = Query(..., min_length=1, max_length=256, description="Words or \"quoted phrases\" to search for"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of results per page"),
+    offset: int = Query(0, ge=0, le=10000, description="Number of ranked results to skip"),
+    view: DocumentView = Query(DocumentView.summary, description="`full` also returns the content"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, overrides `view`"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    logger.info(f"User {current_user.sub} searched documents.")
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        return await search_documents(
+            current_user.sub, current_user.role, q, limit=limit, offset=offset, view=view, fields=field_list
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching documents for user {current_user.sub}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to search documents")
+
+
+@router.get("/similar", response_model=DocumentSimilarPage, response_model_exclude_unset=True)
+async def similar_to_text(
+    q: str = Query(..., min_length=1, max_length=2048, description="Text to find similar documents for"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of documents"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    logger.info(f"User {current_user.sub} requested similar documents.")
+    try:
+        return await similar_documents(current_user.sub, current_user.role, q, limit=limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding similar documents for user {current_user.sub}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to find similar documents")
+
+
+@router.get("/{doc_id}", response_model=DocumentInDB)
+async def get_document_by_id(
+    doc_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: TokenData = Depends(get_current_user)
+):
+    logger.info(f"User {current_user.sub} requested document {doc_id}.")
+    if if_none_match:
+        etag = await get_document_etag(doc_id)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    document = await get_document(doc_id)
+    if not document:
+        logger.warning(f"Document {doc_id} not found for user {current_user.sub}.")
+        raise HTTPException(status_code=404, detail="Document not found")
+    # Optional: check if user is authorized to view document here (if required)
+    response.headers["ETag"] = document_etag(document["id"], document["version"])
+    return document
+
+
 @router.put("/{doc_id}", response_model=DocumentInDB)
 async def update_existing_document(
     doc_id: str,
     doc: DocumentCreate,
     current_user: TokenData = Depends(get_current_user)
 ):
-    logger.info(f"User {current_user._id} attempts to update document {doc_id}.")
-    updated_doc = await update_document(doc_id, doc, current_user._id, current_user.role)
+    logger.info(f"User {current_user.sub} attempts to update document {doc_id}.")
+    updated_doc = await update_document(doc_id, doc, current_user.sub, current_user.role)
     if not updated_doc:
-        logger.warning(f"Update failed or unauthorized for document {doc_id} by user {current_user._id}.")
+        logger.warning(f"Update failed or unauthorized for document {doc_id} by user {current_user.sub}.")
         raise HTTPException(status_code=404, detail="Document not found or unauthorized")
-    logger.info(f"Document {doc_id} updated successfully by user {current_user._id}.")
+    logger.info(f"Document {doc_id} updated successfully by user {current_user.sub}.")
     return updated_doc
 
 
@@ -79,10 +201,10 @@ async def delete_existing_document(
     doc_id: str,
     current_user: TokenData = Depends(get_current_user)
 ):
-    logger.info(f"User {current_user._id} attempts to delete document {doc_id}.")
-    deleted = await delete_document(doc_id, current_user._id, current_user.role)
+    logger.info(f"User {current_user.sub} attempts to delete document {doc_id}.")
+    deleted = await delete_document(doc_id, current_user.sub, current_user.role)
     if not deleted:
-        logger.warning(f"Delete failed or unauthorized for document {doc_id} by user {current_user._id}.")
+        logger.warning(f"Delete failed or unauthorized for document {doc_id} by user {current_user.sub}.")
         raise HTTPException(status_code=404, detail="Document not found or unauthorized")
-    logger.info(f"Document {doc_id} deleted by user {current_user._id}.")
+    logger.info(f"Document {doc_id} deleted by user {current_user.sub}.")
     return {"message": "Document deleted successfully"}
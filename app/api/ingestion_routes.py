@@ -1,41 +1,108 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 
-from app.services.ingestion_service import trigger_ingestion
-from app.models.ingestion import IngestionRequest, IngestionResponse
-from app.core.auth import decode_access_token
+from app.services.ingestion_service import (
+    trigger_ingestion,
+    trigger_ingestion_batch,
+    get_ingestion_status,
+    get_batch_status,
+    open_job_events,
+    open_batch_events,
+    list_dead_letters,
+    redrive_dead_letter,
+)
+from app.models.ingestion import (
+    IngestionRequest,
+    IngestionResponse,
+    IngestionBatchRequest,
+    IngestionBatchResponse,
+    IngestionStatus,
+    IngestionBatchStatus,
+    IngestionDeadLetterPage,
+)
+from app.models.user import TokenData
+from app.core.security import get_current_user
+from app.core.config import settings
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
-
-
-async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> str:
-    try:
-        payload = decode_access_token(token)
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            logger.warning("Token payload missing 'sub' claim.")
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-        return user_id
-    except JWTError as e:
-        logger.warning(f"JWT error during token decode: {e}")
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
 
 
 @router.post("/trigger", response_model=IngestionResponse, status_code=status.HTTP_202_ACCEPTED)
 async def trigger_ingestion_pipeline(
     request: IngestionRequest,
-    background_tasks: BackgroundTasks,
-    user_id: str = Depends(get_current_user_id),
+    current_user: TokenData = Depends(get_current_user),
 ):
-    logger.info(f"User {user_id} requested ingestion trigger.")
+    logger.info(f"User {current_user.sub} requested ingestion trigger.")
     try:
-        response = await trigger_ingestion(request, user_id, background_tasks)
-        logger.info(f"Ingestion triggered successfully for user {user_id}.")
+        response = await trigger_ingestion(request, current_user.sub, current_user.role)
+        logger.info(f"Ingestion triggered successfully for user {current_user.sub}.")
         return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to trigger ingestion for user {current_user.sub}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to trigger ingestion")
+
+
+@router.post("/trigger/batch", response_model=IngestionBatchResponse, status_code=status.HTTP_202_ACCEPTED)
+async def trigger_ingestion_pipeline_batch(
+    request: IngestionBatchRequest,
+    current_user: TokenData = Depends(get_current_user),
+):
+    if request.document_ids is not None and len(request.document_ids) > settings.INGESTION_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch triggers are limited to {settings.INGESTION_BATCH_MAX_IDS} document IDs"
+        )
+    logger.info(f"User {current_user.sub} requested a batch ingestion trigger.")
+    try:
+        return await trigger_ingestion_batch(request, current_user.sub, current_user.role)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to trigger ingestion for user {user_id}: {e}")
+        logger.error(f"Failed to trigger batch ingestion for user {current_user.sub}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to trigger ingestion")
+
+
+# Disable proxy buffering so events reach the client as soon as they are published
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@router.get("/batch/{batch_id}", response_model=IngestionBatchStatus)
+async def read_batch_status(batch_id: str, current_user: TokenData = Depends(get_current_user)):
+    return await get_batch_status(batch_id, current_user.sub, current_user.role)
+
+
+@router.get("/batch/{batch_id}/events")
+async def stream_batch_events(batch_id: str, current_user: TokenData = Depends(get_current_user)):
+    events = await open_batch_events(batch_id, current_user.sub, current_user.role)
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.get("/dead-letters", response_model=IngestionDeadLetterPage)
+async def read_dead_letters(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of jobs per page"),
+    after: Optional[str] = Query(None, description="Cursor returned as `next_cursor` by the previous page"),
+    current_user: TokenData = Depends(get_current_user),
+):
+    return await list_dead_letters(current_user.sub, current_user.role, limit=limit, after=after)
+
+
+@router.post("/dead-letters/{ingestion_id}/redrive", response_model=IngestionResponse, status_code=status.HTTP_202_ACCEPTED)
+async def redrive_ingestion(ingestion_id: str, current_user: TokenData = Depends(get_current_user)):
+    return await redrive_dead_letter(ingestion_id, current_user.sub, current_user.role)
+
+
+@router.get("/{ingestion_id}", response_model=IngestionStatus)
+async def read_ingestion_status(ingestion_id: str, current_user: TokenData = Depends(get_current_user)):
+    return await get_ingestion_status(ingestion_id, current_user.sub, current_user.role)
+
+
+@router.get("/{ingestion_id}/events")
+async def stream_ingestion_events(ingestion_id: str, current_user: TokenData = Depends(get_current_user)):
+    events = await open_job_events(ingestion_id, current_user.sub, current_user.role)
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,15 @@
+import logging
+from fastapi import APIRouter, Depends
+
+from app.core.metrics import collect_metrics
+from app.core.security import require_roles
+from app.models.user import TokenData, UserRole
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/")
+async def get_metrics(current_user: TokenData = Depends(require_roles([UserRole.admin]))):
+    # Counters of in-process components (caches, pools, queues) for this worker only
+    return collect_metrics()
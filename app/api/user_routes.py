@@ -1,42 +1,30 @@
 import logging
-from typing import List
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from jose import JWTError
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.security import OAuth2PasswordRequestForm
 
-from app.models.user import UserCreate, Token, TokenData, UserInDB
-from app.services.user_service import register_user, authenticate_user, get_all_users, get_user_by_id
-from app.core.auth import decode_access_token
+from app.models.user import UserCreate, Token, TokenData, UserInDB, UserPage, UserRole, UserBatchRequest, UserBatchResponse
+from app.services.user_service import register_user, authenticate_user, get_all_users, get_user_by_id, get_users_by_ids
+from app.core.security import get_current_user, require_roles
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
+require_admin = require_roles([UserRole.admin])
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
-    try:
-        payload: TokenData = decode_access_token(token)
-        if not payload.sub or not payload.role:
-            logger.warning("Invalid token payload, missing user ID or role")
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-        return payload
-    except JWTError as e:
-        logger.warning(f"JWT decode error: {e}")
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
 
-
-async def require_admin(user: TokenData = Depends(get_current_user)) -> TokenData:
-    if user.role != "Admin":
-        logger.warning(f"User {user.sub} with role {user.role} attempted admin-only operation")
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access forbidden")
-    return user
-
-
-@router.get("/", response_model=List[UserInDB])
-async def list_users(admin_user: TokenData = Depends(require_admin)):
+@router.get("/", response_model=UserPage)
+async def list_users(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of users per page"),
+    after: Optional[str] = Query(None, description="Cursor returned as `next_cursor` by the previous page"),
+    role: Optional[UserRole] = Query(None, description="Only list users with this role"),
+    admin_user: TokenData = Depends(require_admin)
+):
     # Only admins can list users
-    return await get_all_users()
+    return await get_all_users(limit=limit, after=after, role=role)
 
 
 @router.post("/register", status_code=status.HTTP_201_CREATED, response_model=UserInDB)
@@ -54,6 +42,21 @@ async def get_current_user_info(current_user: TokenData = Depends(get_current_us
     return current_user
 
 
+@router.post("/batch", response_model=UserBatchResponse)
+async def get_users_batch(request: UserBatchRequest, current_user: TokenData = Depends(get_current_user)):
+    ids = list(dict.fromkeys(request.ids))
+    if len(ids) > settings.USER_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch lookups are limited to {settings.USER_BATCH_MAX_IDS} users"
+        )
+    users = await get_users_by_ids(ids)
+    return {
+        "items": [users[user_id] for user_id in ids if user_id in users],
+        "missing": [user_id for user_id in ids if user_id not in users],
+    }
+
+
 @router.get("/{user_id}", response_model=UserInDB)
 async def get_user(user_id: str, current_user: TokenData = Depends(get_current_user)):
     user = await get_user_by_id(user_id)
@@ -1,32 +1,117 @@
+import asyncio
+import hashlib
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from pydantic import ValidationError
 
 from app.models.user import TokenData
 from app.core.config import settings
 from app.core.logger import get_logger
+from app.core.cache import LRUCache
+from app.core.metrics import register_metrics
+from app.core.hashing import HashingPool, calibrate_bcrypt_rounds, measure_bcrypt
 
 logger = get_logger()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Tokens that already passed signature verification, keyed by their SHA-256
+# digest so raw bearer tokens are never kept in memory. Each entry expires at
+# the token's own `exp` claim.
+token_cache = LRUCache(max_size=settings.TOKEN_CACHE_MAX_ENTRIES, ttl_seconds=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+register_metrics("token_cache", token_cache.stats)
+
+# bcrypt runs here instead of on the event loop
+password_pool = HashingPool(max_workers=settings.PASSWORD_HASH_WORKERS, max_queue=settings.PASSWORD_HASH_MAX_QUEUE)
+register_metrics("password_hashing", password_pool.stats)
+
+# Active bcrypt cost and how it was chosen, set by configure_password_hashing
+password_policy = {"scheme": "bcrypt", "rounds": None, "source": "passlib default", "hash_ms": None}
+register_metrics("password_policy", lambda: dict(password_policy))
+
+
+def apply_password_policy(rounds: int, source: str, hash_ms: Optional[float] = None) -> None:
+    """
+    Hash new passwords with `rounds` and flag weaker stored hashes for
+    re-hashing on the next successful login. Stronger hashes are left alone
+    (max_rounds=31 is bcrypt's ceiling), so a slower host never downgrades them.
+    """
+    pwd_context.update(bcrypt__rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=31)
+    password_policy.update(rounds=rounds, source=source, hash_ms=hash_ms)
+    logger.info(f"Password hashing policy: bcrypt rounds={rounds} ({source})")
+
+
+async def configure_password_hashing() -> None:
+    """
+    Pick the bcrypt cost at startup: PASSWORD_HASH_ROUNDS when set, otherwise
+    the highest cost that fits PASSWORD_HASH_TARGET_MS on this host.
+    """
+    if settings.PASSWORD_HASH_ROUNDS:
+        apply_password_policy(settings.PASSWORD_HASH_ROUNDS, "configured")
+        return
+
+    loop = asyncio.get_running_loop()
+    rounds = await loop.run_in_executor(
+        None,
+        calibrate_bcrypt_rounds,
+        settings.PASSWORD_HASH_TARGET_MS,
+        settings.PASSWORD_HASH_MIN_ROUNDS,
+        settings.PASSWORD_HASH_MAX_ROUNDS,
+    )
+    hash_ms = round(await loop.run_in_executor(None, measure_bcrypt, rounds) * 1000, 1)
+    apply_password_policy(rounds, f"calibrated for {settings.PASSWORD_HASH_TARGET_MS} ms", hash_ms)
+
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and, if its hash no longer matches the current policy,
+    return a replacement hash computed with the current cost (else None).
+    """
+    return await password_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
+
 def decode_access_token(token: str) -> Optional[TokenData]:
+    digest = hashlib.sha256(token.encode("utf-8")).hexdigest() if settings.TOKEN_CACHE_ENABLED else None
+    if digest:
+        cached = token_cache.get(digest)
+        if cached is not None:
+            return cached
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return TokenData(**payload)
-    except JWTError as e:
+        token_data = TokenData(**payload)
+    except (JWTError, ValidationError) as e:
         get_logger().error(f"JWT decode failed: {e}")
         return None
+
+    if digest and payload.get("exp"):
+        remaining = payload["exp"] - time.time()
+        if remaining > 0:
+            token_cache.set(digest, token_data, ttl_seconds=remaining)
+    return token_data
@@ -0,0 +1,121 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """
+    In-process LRU cache with a per-entry TTL and a total size budget.
+
+    Each entry carries a caller-supplied size (e.g. bytes of content); the
+    least recently used entries are evicted once the sum exceeds `max_size`,
+    and entries older than `ttl_seconds` are treated as misses. Not shared
+    between processes: every worker keeps its own copy.
+
+    A read-through fill brackets its read with `begin_fill` / `end_fill` and
+    passes the generation it got to `set`; invalidating the key while the
+    read is in flight bumps the generation, so the stale value is dropped.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._size = 0
+        # key -> (generation, fills in flight), kept only while a fill is in flight
+        self._fills: Dict[Hashable, Tuple[int, int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_fills = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, size, expires_at = entry
+        if expires_at <= self._clock():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        size: int = 1,
+        ttl_seconds: Optional[float] = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        """
+        Store a value; `ttl_seconds` overrides the cache-wide TTL for this entry.
+        With the `generation` of a fill, the value is dropped if the key was
+        invalidated since the fill began.
+        """
+        if generation is not None and self._fills.get(key, (generation, 0))[0] != generation:
+            self.stale_fills += 1
+            return
+        if size > self.max_size:
+            # Never let a single oversized value flush the whole cache
+            self.invalidate(key)
+            return
+        self.invalidate(key)
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (value, size, self._clock() + ttl)
+        self._size += size
+        while self._size > self.max_size:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def begin_fill(self, key: Hashable) -> int:
+        """
+        Start reading `key` from its source; returns the generation to pass to `set`.
+        """
+        generation, in_flight = self._fills.get(key, (0, 0))
+        self._fills[key] = (generation, in_flight + 1)
+        return generation
+
+    def end_fill(self, key: Hashable) -> None:
+        generation, in_flight = self._fills[key]
+        if in_flight == 1:
+            del self._fills[key]
+        else:
+            self._fills[key] = (generation, in_flight - 1)
+
+    def invalidate(self, key: Hashable) -> None:
+        if key in self._entries:
+            self._remove(key)
+        if key in self._fills:
+            generation, in_flight = self._fills[key]
+            self._fills[key] = (generation + 1, in_flight)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+        self._fills = {key: (generation + 1, in_flight) for key, (generation, in_flight) in self._fills.items()}
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size": self._size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_fills": self.stale_fills,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
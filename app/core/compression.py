@@ -0,0 +1,227 @@
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        # wbits=31 selects the gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encoders() -> Dict[str, type]:
+    """
+    Encoders usable in this environment, in server preference order.
+    """
+    encoders = {}
+    if zstandard is not None:
+        encoders["zstd"] = ZstdEncoder
+    if brotli is not None:
+        encoders["br"] = BrotliEncoder
+    encoders["gzip"] = GzipEncoder
+    return encoders
+
+
+def negotiate_encoding(accept_encoding: str, supported: Iterable[str]) -> Optional[str]:
+    """
+    Pick the first supported encoding (in server preference order) that the
+    client accepts with a non-zero q-value.
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+
+    for encoding in supported:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with zstd, brotli or gzip according to Accept-Encoding.
+
+    Only responses whose content type starts with one of `content_types`,
+    and none of `excluded_content_types`, and whose body is at least
+    `minimum_size` bytes are compressed. Streaming responses are compressed
+    chunk by chunk with a sync flush after every chunk, so clients still
+    receive data as soon as it is produced. Server-sent events are excluded
+    by default: a proxy or client buffering the compressed stream would
+    delay the events.
+
+    Whenever the client accepts an encoding, the ETag of a compressible
+    response is made weak, whether or not this body was compressed, and so
+    is the ETag of a 304: the validator a client sees is then the same on
+    a 200 and on its 304.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        levels: Optional[Dict[str, int]] = None,
+        content_types: Iterable[str] = ("application/json", "application/x-ndjson", "text/"),
+        excluded_content_types: Iterable[str] = ("text/event-stream",),
+        encodings: Optional[List[str]] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": 6, "br": 4, "zstd": 3, **(levels or {})}
+        self.content_types = tuple(content_types)
+        self.excluded_content_types = tuple(excluded_content_types)
+        encoders = available_encoders()
+        self.encoders = {name: encoders[name] for name in (encodings or encoders) if name in encoders}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encoders)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start_message: Optional[Message] = None
+        self.encoder = None
+        self.passthrough = False
+
+    def _should_compress(self, status_code: int, headers: Headers) -> bool:
+        if status_code < 200 or status_code in (204, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(self.middleware.content_types) and not content_type.startswith(
+            self.middleware.excluded_content_types
+        )
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Hold the headers back until the first body chunk decides the encoding
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            compressible = self._should_compress(start["status"], headers)
+            if not compressible or (not more_body and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                if compressible or start["status"] == 304:
+                    # Too small to compress, or not modified: still the validator of a compressed response
+                    _weaken_etag(headers)
+                    headers.add_vary_header("Accept-Encoding")
+                    start = {**start, "headers": headers.raw}
+                await self.downstream(start)
+                await self.downstream(message)
+                return
+
+            self.encoder = self.middleware.encoders[self.encoding](self.middleware.levels[self.encoding])
+            body = self._encode(body, more_body)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            _weaken_etag(headers)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.downstream({**start, "headers": headers.raw})
+        else:
+            body = self._encode(body, more_body)
+
+        await self.downstream({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    def _encode(self, body: bytes, more_body: bool) -> bytes:
+        chunk = self.encoder.compress(body)
+        return chunk + (self.encoder.flush() if more_body else self.encoder.finish())
+
+
+def _weaken_etag(headers: MutableHeaders) -> None:
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        # The compressed bytes differ from the identity representation
+        headers["ETag"] = f"W/{etag}"
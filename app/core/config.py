@@ -1,4 +1,5 @@
 # app/config.py
+from typing import List, Optional
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,10 +8,64 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    TOKEN_CACHE_ENABLED: bool = True
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    USER_COUNT_CACHE_TTL_SECONDS: int = 60
+    USER_BATCH_MAX_IDS: int = 500
+    PASSWORD_HASH_ROUNDS: Optional[int] = None
+    PASSWORD_HASH_TARGET_MS: int = 250
+    # Calibration never picks fewer rounds than passlib's default for new hashes
+    PASSWORD_HASH_MIN_ROUNDS: int = 12
+    PASSWORD_HASH_MAX_ROUNDS: int = 15
     LOG_FILE: str = "app.log"
     USER_COLLECTION: str = "users"
     DOCUMENT_COLLECTION: str = "documents"
     INGESTION_COLLECTION: str = "ingestion"
+    CHUNK_COLLECTION: str = "document_chunks"
+    INGESTION_WORKER_CONCURRENCY: int = 4
+    INGESTION_EMBEDDED_WORKER: bool = False
+    INGESTION_MAX_RETRIES: int = 3
+    INGESTION_RETRY_BASE_SECONDS: float = 2.0
+    INGESTION_RETRY_MAX_SECONDS: float = 300.0
+    INGESTION_DEAD_LETTER_COLLECTION: str = "ingestion_dead_letters"
+    INGESTION_STATUS_BATCHING: bool = True
+    INGESTION_STATUS_BATCH_SIZE: int = 500
+    INGESTION_STATUS_FLUSH_SECONDS: float = 0.1
+    INGESTION_LEASE_SECONDS: int = 60
+    INGESTION_HEARTBEAT_SECONDS: int = 15
+    INGESTION_POLL_INTERVAL_SECONDS: float = 1.0
+    INGESTION_MAX_PENDING_JOBS: int = 1000000
+    INGESTION_MAX_PENDING_PER_USER: int = 250000
+    INGESTION_BATCH_MAX_IDS: int = 100000
+    INGESTION_EVENTS_ENABLED: bool = True
+    INGESTION_EVENTS_COLLECTION: str = "ingestion_events"
+    INGESTION_EVENTS_MAX_BYTES: int = 64 * 1024 * 1024
+    INGESTION_SSE_KEEPALIVE_SECONDS: int = 15
+    INGESTION_CHUNK_TOKENS: int = 256
+    INGESTION_CHUNK_OVERLAP_TOKENS: int = 32
+    INGESTION_CHUNK_WRITE_BATCH: int = 500
+    INGESTION_CPU_WORKERS: Optional[int] = None
+    INGESTION_RETRY_AFTER_SECONDS: int = 5
+    EMBEDDING_DIMS: int = 128
+    VECTOR_INDEX_PATH: str = "vector_index"
+    VECTOR_INDEX_CHECK_SECONDS: float = 5.0
+    SIMILARITY_BATCH_MAX_QUERIES: int = 64
+    SIMILARITY_OVERSAMPLE: int = 4
+    ENSURE_INDEXES_ON_STARTUP: bool = True
+    EXPORT_BATCH_SIZE: int = 1000
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    COMPRESSION_CONTENT_TYPES: List[str] = ["application/json", "application/x-ndjson", "text/"]
+    DOCUMENT_CACHE_ENABLED: bool = True
+    DOCUMENT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    DOCUMENT_CACHE_TTL_SECONDS: int = 60
+    BULK_MAX_OPERATIONS: int = 10000
+    BULK_CHUNK_SIZE: int = 1000
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,36 @@
+import hashlib
+from typing import Any, Iterable, Optional
+
+
+def document_etag(doc_id: Any, version: Optional[int]) -> str:
+    """
+    Strong ETag of a single document, derived from its id and version counter.
+    Documents written before versioning was introduced count as version 0.
+    """
+    return f'"{doc_id}-{version or 0}"'
+
+
+def page_etag(docs: Iterable[dict], next_cursor: Optional[str], variant: str = "") -> str:
+    """
+    Strong ETag of a listing page, derived from the `_id` and `version` of each
+    raw MongoDB document on it, the next cursor and the representation variant
+    (e.g. view and fields), so that only the version fields are needed to compute it.
+    """
+    digest = hashlib.sha1(variant.encode("utf-8"))
+    for doc in docs:
+        digest.update(f"{doc['_id']}:{doc.get('version') or 0};".encode("utf-8"))
+    digest.update(str(next_cursor).encode("utf-8"))
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate an If-None-Match header against the current ETag.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(
+        candidate == "*" or candidate.removeprefix("W/") == etag
+        for candidate in candidates
+    )
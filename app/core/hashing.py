@@ -0,0 +1,112 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, status
+from passlib.hash import bcrypt
+
+CALIBRATION_PASSWORD = "calibration-password"
+
+
+def measure_bcrypt(rounds: int) -> float:
+    """
+    Seconds taken by one bcrypt hash at the given cost on this host.
+    """
+    handler = bcrypt.using(rounds=rounds)
+    started = time.perf_counter()
+    handler.hash(CALIBRATION_PASSWORD)
+    return time.perf_counter() - started
+
+
+def calibrate_bcrypt_rounds(
+    target_ms: float,
+    min_rounds: int,
+    max_rounds: int,
+    measure: Optional[Callable[[int], float]] = None,
+) -> int:
+    """
+    Highest bcrypt cost in [min_rounds, max_rounds] whose hash time fits in
+    `target_ms` on the current host. Never returns less than `min_rounds`,
+    even on hardware too slow to meet the budget at that cost.
+
+    Each extra round doubles the work, so the search stops at the first cost
+    over budget and calibration takes roughly twice the budget in total.
+    """
+    measure = measure or measure_bcrypt
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        if measure(rounds) * 1000 > target_ms:
+            break
+        chosen = rounds
+    return chosen
+
+
+class HashingPool:
+    """
+    Bounded thread pool for CPU-heavy password hashing.
+
+    bcrypt releases the GIL while hashing, so threads run hashes in parallel
+    without blocking the event loop. At most `max_workers + max_queue`
+    operations may be pending; beyond that callers get HTTP 503 straight
+    away instead of piling up behind a login storm.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, retry_after_seconds: int = 1):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after_seconds = retry_after_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+        self.max_run_seconds = 0.0
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, please retry",
+                headers={"Retry-After": str(self.retry_after_seconds)},
+            )
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            return func(*args), started, time.perf_counter()
+
+        self._pending += 1
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self._pending -= 1
+
+        wait, run = started - submitted, finished - started
+        self.completed += 1
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        self.total_run_seconds += run
+        self.max_run_seconds = max(self.max_run_seconds, run)
+        return result
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_queue_wait_ms": round(self.total_wait_seconds / completed * 1000, 3),
+            "max_queue_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            "avg_hash_ms": round(self.total_run_seconds / completed * 1000, 3),
+            "max_hash_ms": round(self.max_run_seconds * 1000, 3),
+        }
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set
+
+
+class BatchLoader:
+    """
+    DataLoader-style coalescer: `load(key)` calls made in the same event-loop
+    tick are merged into a single `batch_fn(keys)` call.
+
+    `batch_fn` receives the distinct keys and returns a mapping of key to
+    value; keys missing from the mapping resolve to None. Nothing is cached
+    between ticks, so results are never stale.
+    """
+
+    def __init__(self, batch_fn: Callable[[list], Awaitable[Dict[Hashable, Any]]], max_batch_size: int = 1000):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        # The event loop only keeps weak references to tasks
+        self._running: Set[asyncio.Task] = set()
+        self.loads = 0
+        self.batches = 0
+
+    async def load(self, key: Hashable) -> Optional[Any]:
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                # First key this tick: dispatch once every caller has had a chance to queue
+                loop.call_soon(self._dispatch)
+            future = self._pending[key] = loop.create_future()
+        # Shielded: the future is shared, so one cancelled caller must not cancel it for the others
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[Hashable]) -> list:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        keys = list(pending)
+        for start in range(0, len(keys), self.max_batch_size):
+            chunk = {key: pending[key] for key in keys[start:start + self.max_batch_size]}
+            task = asyncio.ensure_future(self._run(chunk))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, futures: Dict[Hashable, asyncio.Future]) -> None:
+        self.batches += 1
+        try:
+            results = await self.batch_fn(list(futures))
+        except Exception as exc:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for key, future in futures.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+    def stats(self) -> dict:
+        return {
+            "loads": self.loads,
+            "batches": self.batches,
+            "avg_loads_per_batch": round(self.loads / self.batches, 2) if self.batches else 0.0,
+        }
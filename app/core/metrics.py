@@ -0,0 +1,18 @@
+from typing import Callable, Dict
+
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+
+def register_metrics(name: str, collector: Callable[[], dict]) -> None:
+    """
+    Register a callable returning a snapshot of a component's counters.
+    Registering the same name again replaces the previous collector.
+    """
+    _collectors[name] = collector
+
+
+def collect_metrics() -> Dict[str, dict]:
+    """
+    Snapshot every registered collector, keyed by component name.
+    """
+    return {name: collector() for name, collector in _collectors.items()}
@@ -0,0 +1,44 @@
+import base64
+import json
+from typing import Any, Dict, Optional
+
+from bson import ObjectId, errors
+from fastapi import HTTPException, status
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(last_id: Any) -> str:
+    """
+    Encode the `_id` of the last item of a page into an opaque cursor string.
+    """
+    payload = json.dumps({"id": str(last_id)}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    """
+    Decode an opaque cursor back into the `_id` it was built from.
+
+    Raises HTTP 400 if the cursor was not produced by `encode_cursor`.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, errors.InvalidId):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+
+
+def apply_keyset(query: Dict[str, Any], after: Optional[str]) -> Dict[str, Any]:
+    """
+    Restrict a Mongo filter to the items that come after the given cursor.
+
+    Pages are ordered by `_id` descending (newest first), so the next page is
+    everything with a strictly smaller `_id`. Combined with an index whose
+    last key is `_id` this is a bounded range scan regardless of page depth.
+    """
+    if not after:
+        return query
+    return {**query, "_id": {"$lt": decode_cursor(after)}}
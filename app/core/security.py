@@ -13,6 +13,8 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
     """
     Decode JWT token and return the current user data.
 
+    This is the single authentication dependency shared by all routers;
+    verified tokens are served from the token cache in `app.core.auth`.
     Raises HTTP 401 if token is invalid or expired.
     """
     user = decode_access_token(token)
@@ -25,6 +27,13 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
     return user
 
 
+def get_current_user_id(current_user: TokenData = Depends(get_current_user)) -> str:
+    """
+    Return only the user ID (`sub` claim) of the authenticated user.
+    """
+    return current_user.sub
+
+
 def require_roles(required_roles: List[UserRole]):
     """
     Dependency to enforce role-based access control.
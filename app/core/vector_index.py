@@ -0,0 +1,290 @@
+"""
+Memory-mapped similarity index over chunk embeddings.
+
+An index lives in a directory of immutable generations:
+
+    <root>/CURRENT              name of the live generation
+    <root>/<generation>/vectors.f32    N x dims little-endian float32, one row per chunk
+    <root>/<generation>/meta.npz       document id and chunk index of every row,
+                                       plus each owner's range of rows
+    <root>/<generation>/manifest.json  dims, row count, build time
+
+Rows are grouped by owner, so the rows a non-admin may see are one
+contiguous slice of the file and a filtered search never gathers rows.
+Vectors are L2-normalized, so cosine similarity is a matrix product,
+computed in blocks to bound the temporaries.
+
+A new generation is written next to the live one and published by
+atomically replacing CURRENT, so readers in other processes never see a
+partial index. `VectorIndexStore` picks up new generations as they appear.
+Publishing removes the generations older than the one it replaced; that
+one stays for readers still switching over, and a directory without a
+manifest is a generation still being built and is never removed.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+VECTOR_DTYPE = np.dtype("<f4")
+# ObjectIds are kept as hex: numpy strips trailing NUL bytes from raw bytes,
+# and hex sorts the same way MongoDB sorts ObjectIds
+OBJECT_ID_DTYPE = np.dtype("S24")
+# Owner of chunks stored without one; sorts before every real ObjectId
+NO_OWNER = "0" * 24
+CURRENT_FILE = "CURRENT"
+VECTORS_FILE = "vectors.f32"
+META_FILE = "meta.npz"
+MANIFEST_FILE = "manifest.json"
+# Rows scored per matrix product: 64k rows x 128 dims is 32 MB of float32
+BLOCK_ROWS = 65536
+
+
+class VectorIndexUnavailable(Exception):
+    """
+    Raised when no index has been built yet.
+    """
+
+
+class VectorIndex:
+    def __init__(
+        self,
+        generation: str,
+        vectors: np.ndarray,
+        document_ids: np.ndarray,
+        chunk_indexes: np.ndarray,
+        owners: np.ndarray,
+        owner_starts: np.ndarray,
+    ):
+        self.generation = generation
+        self.vectors = vectors
+        self.document_ids = document_ids
+        self.chunk_indexes = chunk_indexes
+        self.owners = owners
+        self.owner_starts = owner_starts
+
+    @property
+    def dims(self) -> int:
+        return self.vectors.shape[1]
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @classmethod
+    def load(cls, root: str) -> Optional["VectorIndex"]:
+        """
+        Open the live generation under `root`, or return None if there is none.
+        The vectors are memory-mapped read-only and paged in by the OS.
+        """
+        try:
+            with open(os.path.join(root, CURRENT_FILE)) as f:
+                generation = f.read().strip()
+        except FileNotFoundError:
+            return None
+        path = os.path.join(root, generation)
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        count, dims = manifest["count"], manifest["dims"]
+        if count:
+            vectors = np.memmap(os.path.join(path, VECTORS_FILE), dtype=VECTOR_DTYPE, mode="r", shape=(count, dims))
+        else:
+            # mmap can't map an empty file
+            vectors = np.zeros((0, dims), dtype=VECTOR_DTYPE)
+        with np.load(os.path.join(path, META_FILE)) as meta:
+            return cls(
+                generation,
+                vectors,
+                meta["document_ids"],
+                meta["chunk_indexes"],
+                meta["owners"],
+                meta["owner_starts"],
+            )
+
+    def owner_rows(self, owner: str) -> slice:
+        """
+        The rows of the chunks owned by `owner`, an ObjectId in hex.
+        """
+        key = owner.encode("ascii")
+        position = int(np.searchsorted(self.owners, key))
+        if position == len(self.owners) or self.owners[position] != key:
+            return slice(0, 0)
+        return slice(int(self.owner_starts[position]), int(self.owner_starts[position + 1]))
+
+    def search(self, queries: np.ndarray, k: int, rows: slice = slice(None)) -> List[List[Tuple[int, float]]]:
+        """
+        The `k` rows within `rows` most similar to each of `queries`, an
+        array of L2-normalized query vectors, as (row, cosine similarity)
+        pairs, best first. All queries are scored in one pass over the rows.
+        """
+        start, stop, _ = rows.indices(len(self))
+        queries = np.ascontiguousarray(queries, dtype=VECTOR_DTYPE).reshape(-1, self.dims)
+        k = min(k, stop - start)
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        candidate_rows, candidate_scores = [], []
+        for block_start in range(start, stop, BLOCK_ROWS):
+            block_stop = min(block_start + BLOCK_ROWS, stop)
+            # One query per row, so selecting the best of each query reads contiguous memory
+            scores = np.ascontiguousarray((self.vectors[block_start:block_stop] @ queries.T).T)
+            if k < scores.shape[1]:
+                best = np.argpartition(scores, -k, axis=1)[:, -k:]
+                candidate_scores.append(np.take_along_axis(scores, best, axis=1))
+                candidate_rows.append(best + block_start)
+            else:
+                candidate_scores.append(scores)
+                candidate_rows.append(np.broadcast_to(np.arange(block_start, block_stop), scores.shape))
+
+        rows_found = np.concatenate(candidate_rows, axis=1)
+        scores_found = np.concatenate(candidate_scores, axis=1)
+        if k < rows_found.shape[1]:
+            best = np.argpartition(scores_found, -k, axis=1)[:, -k:]
+            rows_found = np.take_along_axis(rows_found, best, axis=1)
+            scores_found = np.take_along_axis(scores_found, best, axis=1)
+        order = np.argsort(-scores_found, axis=1, kind="stable")
+        rows_found = np.take_along_axis(rows_found, order, axis=1)
+        scores_found = np.take_along_axis(scores_found, order, axis=1)
+        return [list(zip(rows.tolist(), scores.tolist())) for rows, scores in zip(rows_found, scores_found)]
+
+    def row(self, row: int) -> Tuple[str, int]:
+        """
+        The document id, in hex, and chunk index stored at `row`.
+        """
+        return self.document_ids[row].decode("ascii"), int(self.chunk_indexes[row])
+
+
+class VectorIndexWriter:
+    """
+    Builds a new generation. Rows must be added grouped by owner, which is
+    what reading the chunks sorted by `owner_id` gives.
+    """
+
+    def __init__(self, root: str, dims: int):
+        self.root = root
+        self.dims = dims
+        self.generation = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        self.path = os.path.join(root, self.generation)
+        os.makedirs(self.path)
+        self._vectors = open(os.path.join(self.path, VECTORS_FILE), "wb")
+        self._document_ids: List[str] = []
+        self._chunk_indexes: List[int] = []
+        self._owners: List[str] = []
+        self._owner_starts: List[int] = []
+
+    def add(self, document_id: str, chunk_index: int, owner: str, embedding: bytes) -> None:
+        if len(embedding) != self.dims * VECTOR_DTYPE.itemsize:
+            raise ValueError(f"Expected a {self.dims}-dimensional embedding, got {len(embedding)} bytes")
+        if not self._owners or self._owners[-1] != owner:
+            if self._owners and owner < self._owners[-1]:
+                raise ValueError("Rows must be added in owner order")
+            self._owners.append(owner)
+            self._owner_starts.append(len(self._document_ids))
+        self._vectors.write(embedding)
+        self._document_ids.append(document_id)
+        self._chunk_indexes.append(chunk_index)
+
+    def __len__(self) -> int:
+        return len(self._document_ids)
+
+    def commit(self) -> str:
+        """
+        Finish the generation, make it the live one and remove the
+        generations older than the one it replaced. Returns the generation's
+        name.
+        """
+        self._vectors.close()
+        np.savez(
+            os.path.join(self.path, META_FILE),
+            document_ids=np.array(self._document_ids, dtype=OBJECT_ID_DTYPE),
+            chunk_indexes=np.array(self._chunk_indexes, dtype=np.int32),
+            owners=np.array(self._owners, dtype=OBJECT_ID_DTYPE),
+            owner_starts=np.array(self._owner_starts + [len(self._document_ids)], dtype=np.int64),
+        )
+        with open(os.path.join(self.path, MANIFEST_FILE), "w") as f:
+            json.dump({"generation": self.generation, "dims": self.dims, "count": len(self._document_ids),
+                       "created_at": datetime.utcnow().isoformat()}, f)
+
+        current = os.path.join(self.root, CURRENT_FILE)
+        try:
+            with open(current) as f:
+                previous = f.read().strip()
+        except FileNotFoundError:
+            previous = None
+        pointer = os.path.join(self.root, f"{CURRENT_FILE}.{self.generation}")
+        with open(pointer, "w") as f:
+            f.write(self.generation)
+        os.replace(pointer, current)
+
+        if previous:
+            # Names start with their UTC build time, to the microsecond, so they sort oldest first.
+            # Readers that still map a removed generation keep their view: unlinked files stay readable while mapped
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name < previous and name != self.generation and os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+                    shutil.rmtree(path, ignore_errors=True)
+        return self.generation
+
+    def abort(self) -> None:
+        self._vectors.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class VectorIndexStore:
+    """
+    The live index of one process. Checks for a newer generation at most
+    every `check_seconds` and swaps it in; searches already running keep the
+    index they started with.
+    """
+
+    def __init__(self, root: str, check_seconds: float = 5.0):
+        self.root = root
+        self.check_seconds = check_seconds
+        self._index: Optional[VectorIndex] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def current(self) -> VectorIndex:
+        """
+        The live index. Raises VectorIndexUnavailable if none has been built.
+        """
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_seconds:
+            with self._lock:
+                if self._checked_at is None or now - self._checked_at >= self.check_seconds:
+                    self._refresh()
+                    self._checked_at = now
+        if self._index is None:
+            raise VectorIndexUnavailable("No vector index has been built yet")
+        return self._index
+
+    def _refresh(self) -> None:
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                generation = f.read().strip()
+        except FileNotFoundError:
+            return
+        if self._index is None or self._index.generation != generation:
+            try:
+                index = VectorIndex.load(self.root)
+            except FileNotFoundError:
+                # Replaced by a newer generation while loading; picked up on the next check
+                return
+            if index is not None:
+                self._index = index
+                self.reloads += 1
+
+    def stats(self) -> dict:
+        index = self._index
+        return {
+            "generation": index.generation if index else None,
+            "rows": len(index) if index else 0,
+            "owners": len(index.owners) if index else 0,
+            "reloads": self.reloads,
+        }
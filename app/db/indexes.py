@@ -0,0 +1,158 @@
+"""
+Declarative registry of the MongoDB indexes the services rely on.
+
+`sync_indexes` compares the registry with what exists in the database,
+creates missing indexes and reports extra or conflicting ones. It runs at
+application startup and can also be run by hand:
+
+    python -m app.db.indexes --dry-run
+"""
+import argparse
+import asyncio
+from typing import Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger()
+
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    settings.USER_COLLECTION: [
+        # Login and registration look users up by email
+        IndexModel([("email", ASCENDING)], name="email_1", unique=True),
+        # Role-filtered, keyset-paginated admin user listing and its counts
+        IndexModel([("role", ASCENDING), ("_id", DESCENDING)], name="role_1__id_-1"),
+    ],
+    settings.DOCUMENT_COLLECTION: [
+        # Owner-scoped, keyset-paginated document listings
+        IndexModel([("owner_id", ASCENDING), ("_id", DESCENDING)], name="owner_id_1__id_-1"),
+        # Full-text document search; titles weigh more than body text
+        IndexModel(
+            [("title", TEXT), ("content", TEXT)],
+            name="title_text_content_text",
+            weights={"title": 10, "content": 1},
+        ),
+    ],
+    settings.INGESTION_COLLECTION: [
+        # Status updates address jobs by their public ingestion_id
+        IndexModel([("ingestion_id", ASCENDING)], name="ingestion_id_1", unique=True, sparse=True),
+        IndexModel([("document_id", ASCENDING)], name="document_id_1"),
+        # Workers claim the oldest pending job, or a processing job whose lease has expired
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_1_created_at_1"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_1_lease_expires_at_1"),
+        # Jobs queued together by a batch trigger are tracked by their batch_id
+        IndexModel([("batch_id", ASCENDING)], name="batch_id_1"),
+        # Per-user admission control counts a user's unfinished jobs
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING)], name="user_id_1_status_1"),
+    ],
+    settings.INGESTION_DEAD_LETTER_COLLECTION: [
+        # Dead-lettering and re-driving address entries by the job's ingestion_id
+        IndexModel([("ingestion_id", ASCENDING)], name="ingestion_id_1", unique=True),
+        # Owner-scoped, keyset-paginated dead-letter listing
+        IndexModel([("user_id", ASCENDING), ("_id", DESCENDING)], name="user_id_1__id_-1"),
+    ],
+    settings.CHUNK_COLLECTION: [
+        # Chunks are replaced and read per document, in order
+        IndexModel([("document_id", ASCENDING), ("index", ASCENDING)], name="document_id_1_index_1", unique=True),
+        # The vector indexer reads every chunk grouped by owner
+        IndexModel(
+            [("owner_id", ASCENDING), ("document_id", ASCENDING), ("index", ASCENDING)],
+            name="owner_id_1_document_id_1_index_1",
+        ),
+    ],
+}
+
+# Options that change an index's behaviour; anything else (v, ns, ...) is ignored when comparing
+_COMPARED_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+def _signature(spec: dict) -> tuple:
+    if "weights" in spec:
+        # Text indexes are stored as _fts/_ftsx keys, so compare their weights instead
+        key = ("text", tuple(sorted(spec["weights"].items())))
+    else:
+        key = tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                    for field, direction in spec["key"].items())
+    options = tuple((option, spec.get(option)) for option in _COMPARED_OPTIONS if spec.get(option))
+    return key, options
+
+
+async def sync_indexes(db: AsyncIOMotorDatabase, dry_run: bool = False, drop_extra: bool = False) -> Dict[str, dict]:
+    """
+    Bring the database in line with `INDEX_REGISTRY`.
+
+    Returns, per collection, the names of indexes that were missing, created,
+    extra (present but not registered) and conflicting (same name, different
+    definition). Conflicting indexes are never touched; extra ones are only
+    dropped when `drop_extra` is set. With `dry_run` nothing is changed.
+    """
+    report = {}
+    for collection_name, models in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        existing.pop("_id_", None)
+        for spec in existing.values():
+            spec["key"] = dict(spec["key"])
+
+        wanted = {model.document["name"]: model for model in models}
+        missing = [name for name in wanted if name not in existing]
+        conflicting = [
+            name for name, model in wanted.items()
+            if name in existing and _signature(existing[name]) != _signature(
+                {**model.document, "key": dict(model.document["key"])}
+            )
+        ]
+        extra = [name for name in existing if name not in wanted]
+
+        created, dropped = [], []
+        if not dry_run:
+            if missing:
+                created = await collection.create_indexes([wanted[name] for name in missing])
+            if drop_extra:
+                for name in extra:
+                    await collection.drop_index(name)
+                    dropped.append(name)
+
+        for name in conflicting:
+            logger.warning(f"Index {collection_name}.{name} differs from the registry; drop it to recreate")
+        for name in extra:
+            if name not in dropped:
+                logger.warning(f"Index {collection_name}.{name} is not in the index registry")
+        if created:
+            logger.info(f"Created indexes on {collection_name}: {', '.join(created)}")
+
+        report[collection_name] = {
+            "missing": missing,
+            "created": created,
+            "extra": extra,
+            "dropped": dropped,
+            "conflicting": conflicting,
+        }
+    return report
+
+
+async def _main(dry_run: bool, drop_extra: bool) -> None:
+    # Imported here because app.db.mongodb imports this module
+    from app.db.mongodb import close_db, connect_db, get_db
+
+    await connect_db()
+    try:
+        report = await sync_indexes(await get_db(), dry_run=dry_run, drop_extra=drop_extra)
+    finally:
+        await close_db()
+    for collection_name, entry in report.items():
+        print(collection_name)
+        for kind, names in entry.items():
+            if names:
+                print(f"  {kind}: {', '.join(names)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and verify the registered MongoDB indexes")
+    parser.add_argument("--dry-run", action="store_true", help="only report differences")
+    parser.add_argument("--drop-extra", action="store_true", help="drop indexes that are not in the registry")
+    args = parser.parse_args()
+    asyncio.run(_main(args.dry_run, args.drop_extra))
@@ -1,6 +1,7 @@
 from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from app.core.config import settings
+from app.db.indexes import sync_indexes
 
 _client: Optional[AsyncIOMotorClient] = None
 _db: Optional[AsyncIOMotorDatabase] = None
@@ -17,6 +18,13 @@ async def connect_db() -> None:
         _db = _client[settings.DB_NAME]
 
 
+async def ensure_indexes(dry_run: bool = False) -> dict:
+    """
+    Apply the index registry (see app.db.indexes). Safe to call repeatedly.
+    """
+    return await sync_indexes(await get_db(), dry_run=dry_run)
+
+
 async def close_db() -> None:
     """
     Close the MongoDB client connection.
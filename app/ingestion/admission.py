@@ -0,0 +1,90 @@
+"""
+Admission control for ingestion triggers.
+
+Every trigger checks how much work is already queued before adding more: up
+to `max_pending` unfinished jobs overall and `max_pending_per_user` per user.
+Above the global limit callers get HTTP 503, above their own limit HTTP 429,
+both with a Retry-After header, so a bulk trigger backs off instead of
+growing the queue without bound.
+"""
+import time
+from typing import Callable
+
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from app.ingestion.queue import INGESTION_STATUS_PENDING, INGESTION_STATUS_PROCESSING
+
+UNFINISHED = {"status": {"$in": [INGESTION_STATUS_PENDING, INGESTION_STATUS_PROCESSING]}}
+
+
+class IngestionAdmission:
+    def __init__(
+        self,
+        max_pending: int,
+        max_pending_per_user: int,
+        retry_after_seconds: int = 5,
+        depth_cache_seconds: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_pending = max_pending
+        self.max_pending_per_user = max_pending_per_user
+        self.retry_after_seconds = retry_after_seconds
+        # The global depth is shared by every trigger, so it is recounted at most once per interval
+        self.depth_cache_seconds = depth_cache_seconds
+        self._clock = clock
+        self._depth = 0
+        self._counted_at = None
+        self.admitted = 0
+        self.rejected_global = 0
+        self.rejected_user = 0
+
+    async def admit(
+        self, collection: AsyncIOMotorCollection, user_id: str, requested: int = 1, charge: bool = True
+    ) -> None:
+        """
+        Raise 503/429 if queueing `requested` more jobs for `user_id` would
+        exceed a limit. Without `charge`, the caller calls `charge` once the
+        jobs are actually queued.
+        """
+        now = self._clock()
+        if self._counted_at is None or now - self._counted_at >= self.depth_cache_seconds:
+            # Counting stops at the limit, so a deep backlog doesn't make the check slower
+            self._depth = await collection.count_documents(UNFINISHED, limit=self.max_pending)
+            self._counted_at = now
+        if self._depth + requested > self.max_pending:
+            self.rejected_global += 1
+            raise self._reject(status.HTTP_503_SERVICE_UNAVAILABLE, "Ingestion queue is full, please retry later")
+
+        user_depth = await collection.count_documents({"user_id": user_id, **UNFINISHED}, limit=self.max_pending_per_user)
+        if user_depth + requested > self.max_pending_per_user:
+            self.rejected_user += 1
+            raise self._reject(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                f"Too many unfinished ingestion jobs (limit {self.max_pending_per_user}), please retry later",
+            )
+
+        if charge:
+            self.charge(requested)
+
+    def charge(self, requested: int = 1) -> None:
+        self.admitted += requested
+        # Count our own jobs until the next recount so a burst can't overshoot the limit
+        self._depth += requested
+
+    def _reject(self, status_code: int, detail: str) -> HTTPException:
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after_seconds)},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._depth,
+            "max_pending": self.max_pending,
+            "max_pending_per_user": self.max_pending_per_user,
+            "admitted": self.admitted,
+            "rejected_global": self.rejected_global,
+            "rejected_user": self.rejected_user,
+        }
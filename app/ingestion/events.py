@@ -0,0 +1,151 @@
+"""
+Push-based ingestion status events.
+
+Workers publish every status transition as a document in a capped
+collection. Each API process tails that collection with a single tailable
+cursor (`IngestionEventRelay`) and fans the events out in memory
+(`IngestionEventBus`) to the clients watching a job or batch. Watchers
+therefore add no database load of their own, however many there are.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import CursorType, DESCENDING
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+
+def job_key(ingestion_id: str) -> str:
+    return f"job:{ingestion_id}"
+
+
+def batch_key(batch_id: str) -> str:
+    return f"batch:{batch_id}"
+
+
+def status_event(job: dict, status: str, error: Optional[str] = None) -> dict:
+    return {
+        "ingestion_id": job["ingestion_id"],
+        "batch_id": job.get("batch_id"),
+        "document_id": job["document_id"],
+        "user_id": job["user_id"],
+        "status": status,
+        "error": error,
+        "at": datetime.utcnow(),
+    }
+
+
+async def ensure_events_collection(db: AsyncIOMotorDatabase, name: str, max_bytes: int) -> None:
+    """
+    Create the capped events collection if it doesn't exist yet.
+    """
+    if name in await db.list_collection_names():
+        return
+    try:
+        await db.create_collection(name, capped=True, size=max_bytes)
+    except CollectionInvalid:
+        # Another process created it first
+        pass
+
+
+class IngestionEventPublisher:
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def publish(self, job: dict, status: str, error: Optional[str] = None) -> None:
+        try:
+            await self.collection.insert_one(status_event(job, status, error))
+        except Exception as e:
+            # Watchers missing an event is better than failing the job over it
+            logger.error(f"Could not publish {status} event for ingestion {job['ingestion_id']}: {e}")
+
+
+class IngestionEventBus:
+    """
+    In-process fan-out of status events to subscribers of a job or batch.
+
+    Every subscriber gets a bounded queue; when a slow client falls behind by
+    `max_queue` events its oldest event is dropped rather than letting the
+    queue grow.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, key: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        self._subscribers[key].add(queue)
+        return queue
+
+    def unsubscribe(self, key: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(key)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[key]
+
+    def publish(self, event: dict) -> None:
+        self.published += 1
+        keys = [job_key(event["ingestion_id"])]
+        if event.get("batch_id"):
+            keys.append(batch_key(event["batch_id"]))
+        for key in keys:
+            for queue in self._subscribers.get(key, ()):
+                if queue.full():
+                    queue.get_nowait()
+                    self.dropped += 1
+                queue.put_nowait(event)
+
+    def stats(self) -> dict:
+        return {
+            "watched_keys": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+class IngestionEventRelay:
+    """
+    Tails the capped events collection and feeds new events into a bus.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, bus: IngestionEventBus, retry_seconds: float = 1.0):
+        self.collection = collection
+        self.bus = bus
+        self.retry_seconds = retry_seconds
+
+    async def run(self) -> None:
+        """
+        Relay events until cancelled. Only events published after startup are relayed.
+        """
+        last_id = None
+        try:
+            newest = await self.collection.find_one({}, sort=[("$natural", DESCENDING)])
+            last_id = newest["_id"] if newest else None
+        except Exception as e:
+            logger.error(f"Could not read the newest ingestion event: {e}")
+
+        while True:
+            try:
+                query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+                cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    # Each getMore waits server-side for new events, so this doesn't spin
+                    async for event in cursor:
+                        last_id = event["_id"]
+                        self.bus.publish(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion event relay failed, retrying: {e}")
+            # The cursor dies when the collection is empty or was dropped
+            await asyncio.sleep(self.retry_seconds)
@@ -0,0 +1,84 @@
+"""
+Builds the similarity index from the stored chunk embeddings.
+
+The index is a snapshot: run the indexer after ingesting, or keep one
+running with `--every`, on a host that shares VECTOR_INDEX_PATH with the
+API processes. They pick up each new generation on their own.
+
+    python -m app.ingestion.indexer
+    python -m app.ingestion.indexer --every 300
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from app.core.config import settings
+from app.core.vector_index import NO_OWNER, VectorIndexWriter
+from app.db.mongodb import connect_db, close_db, get_db
+
+logger = logging.getLogger(__name__)
+
+READ_BATCH = 5000
+
+
+async def build_vector_index(chunk_collection: AsyncIOMotorCollection, root: str, dims: int) -> dict:
+    """
+    Write a new index generation with every chunk embedded with `dims`
+    dimensions and make it the live one. Chunks embedded with a different
+    size are left out until their documents are re-ingested, which
+    re-embeds them (with `force` if the content hasn't changed).
+    """
+    started = time.perf_counter()
+    writer = VectorIndexWriter(root, dims)
+    skipped = 0
+    try:
+        cursor = chunk_collection.find(
+            {"embedding": {"$exists": True}},
+            {"_id": 0, "document_id": 1, "index": 1, "owner_id": 1, "embedding": 1},
+            batch_size=READ_BATCH,
+        ).sort([("owner_id", 1), ("document_id", 1), ("index", 1)])
+        async for chunk in cursor:
+            embedding = bytes(chunk["embedding"])
+            if len(embedding) != dims * 4:
+                skipped += 1
+                continue
+            owner = chunk.get("owner_id")
+            writer.add(str(chunk["document_id"]), chunk["index"], str(owner) if owner else NO_OWNER, embedding)
+        rows = len(writer)
+        generation = writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+    seconds = round(time.perf_counter() - started, 3)
+    logger.info(f"Vector index {generation} built with {rows} chunks in {seconds}s ({skipped} skipped)")
+    return {"generation": generation, "rows": rows, "skipped": skipped, "seconds": seconds}
+
+
+async def _serve(every: Optional[float]) -> None:
+    await connect_db()
+    db = await get_db()
+    try:
+        while True:
+            await build_vector_index(db[settings.CHUNK_COLLECTION], settings.VECTOR_INDEX_PATH, settings.EMBEDDING_DIMS)
+            if not every:
+                return
+            await asyncio.sleep(every)
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the document similarity index")
+    parser.add_argument("--every", type=float, default=None,
+                        help="keep running and rebuild every this many seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve(args.every))
+
+
+if __name__ == "__main__":
+    main()
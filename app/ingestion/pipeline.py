@@ -0,0 +1,133 @@
+"""
+CPU-bound stages of document ingestion: normalization, tokenization,
+chunking and embedding. Everything here is a plain module-level function
+over plain data, so the worker can run it in a process pool.
+"""
+import hashlib
+import re
+import time
+import unicodedata
+import zlib
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# Words (letters, digits, underscore) or single punctuation marks
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Embeddings are stored as raw little-endian float32 bytes
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+
+def content_digest(content: str) -> str:
+    """
+    Digest of a document's raw content, used to tell whether it changed
+    since it was last ingested.
+    """
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Unicode NFKC normalization with whitespace runs collapsed to one space.
+    """
+    return WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def tokenize(text: str) -> List[Tuple[int, int]]:
+    """
+    Character spans (start, end) of the tokens of `text`.
+    """
+    return [match.span() for match in TOKEN_PATTERN.finditer(text)]
+
+
+def split_chunks(text: str, spans: List[Tuple[int, int]], chunk_tokens: int, overlap_tokens: int) -> List[dict]:
+    """
+    Split `text` into windows of `chunk_tokens` tokens, each sharing
+    `overlap_tokens` tokens with the previous one.
+    """
+    if chunk_tokens <= overlap_tokens:
+        raise ValueError("chunk_tokens must be larger than overlap_tokens")
+    chunks = []
+    step = chunk_tokens - overlap_tokens
+    for index, first in enumerate(range(0, max(len(spans) - overlap_tokens, 1), step)):
+        window = spans[first:first + chunk_tokens]
+        if not window:
+            break
+        start, end = window[0][0], window[-1][1]
+        chunk_text = text[start:end]
+        chunks.append({
+            "index": index,
+            "text": chunk_text,
+            "start": start,
+            "end": end,
+            "token_count": len(window),
+            "digest": hashlib.sha256(chunk_text.encode("utf-8")).hexdigest(),
+        })
+    return chunks
+
+
+def _features(text: str) -> List[str]:
+    words = WORD_PATTERN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def embed_texts(texts: Sequence[str], dims: int) -> np.ndarray:
+    """
+    Fixed-size vectors for `texts`, one L2-normalized float32 row each.
+
+    Word unigrams and bigrams are hashed (CRC32, stable across processes)
+    into `dims` signed buckets, which acts as a random projection of the
+    sparse n-gram counts, and counts are damped with log1p. Cosine
+    similarity of two rows is then a plain dot product.
+    """
+    rows, columns, signs = [], [], []
+    for row, text in enumerate(texts):
+        for feature in _features(text):
+            bucket = zlib.crc32(feature.encode("utf-8"))
+            rows.append(row)
+            columns.append(bucket % dims)
+            # The top bit is independent of the bucket for power-of-two sizes
+            signs.append(1.0 if bucket >> 31 else -1.0)
+
+    vectors = np.zeros((len(texts), dims), dtype=np.float32)
+    np.add.at(vectors, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)), np.array(signs, dtype=np.float32))
+    vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors.astype(EMBEDDING_DTYPE, copy=False)
+
+
+def process_content(
+    content: str,
+    chunk_tokens: int,
+    overlap_tokens: int,
+    embedding_dims: int = 128,
+) -> Tuple[List[dict], dict]:
+    """
+    Run every CPU stage on one document's content. Returns the chunks, each
+    with its embedding as raw float32 bytes and the embedding's size, and
+    the time spent in each
+    stage, in milliseconds.
+    """
+    timings = {}
+    started = time.perf_counter()
+    text = normalize_text(content or "")
+    timings["normalize_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    spans = tokenize(text)
+    timings["tokenize_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    chunks = split_chunks(text, spans, chunk_tokens, overlap_tokens)
+    timings["chunk_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    vectors = embed_texts([chunk["text"] for chunk in chunks], embedding_dims)
+    for chunk, vector in zip(chunks, vectors):
+        chunk["embedding"] = vector.tobytes()
+        chunk["embedding_dims"] = embedding_dims
+    timings["embed_ms"] = (time.perf_counter() - started) * 1000
+    return chunks, timings
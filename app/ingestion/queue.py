@@ -0,0 +1,232 @@
+"""
+Durable ingestion job queue stored in the ingestion collection.
+
+Every job is a document in the collection. Workers claim jobs atomically with
+`find_one_and_update`, which gives the claiming worker a lease. While the job
+runs, the worker keeps the lease alive with heartbeats. If a worker dies, its
+lease expires and another worker claims the job again, so a killed process
+never loses work.
+
+A job that should be retried later goes back to pending with a `not_before`
+time and isn't claimed before then. Jobs that can't be completed are copied
+to the dead-letter collection, from where they can be re-driven.
+"""
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, ReturnDocument
+
+from app.ingestion.status_writer import StatusWriter
+
+INGESTION_STATUS_PENDING = "pending"
+INGESTION_STATUS_PROCESSING = "processing"
+INGESTION_STATUS_COMPLETED = "completed"
+INGESTION_STATUS_FAILED = "failed"
+# The document's content was already ingested, so the job had nothing to do
+INGESTION_STATUS_SKIPPED = "skipped"
+
+
+def new_job(
+    user_id: str,
+    document_id: str,
+    batch_id: Optional[str] = None,
+    force: bool = False,
+    status: str = INGESTION_STATUS_PENDING,
+) -> dict:
+    """
+    A fresh job record, ready to be inserted. Jobs are pending unless they
+    are recorded as already finished, like skipped ones. A forced job
+    re-ingests the document even if its content hasn't changed.
+    """
+    now = datetime.utcnow()
+    return {
+        "ingestion_id": str(uuid.uuid4()),
+        "batch_id": batch_id,
+        "user_id": user_id,
+        "document_id": document_id,
+        "status": status,
+        "force": force,
+        "attempts": 0,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "not_before": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def dead_letter_entry(job: dict, error: str, retryable: bool) -> dict:
+    """
+    The dead-letter record of a job that could not be completed.
+    """
+    return {
+        "ingestion_id": job["ingestion_id"],
+        "batch_id": job.get("batch_id"),
+        "user_id": job["user_id"],
+        "document_id": job["document_id"],
+        "force": job.get("force", False),
+        "attempts": job.get("attempts", 0),
+        "error": error,
+        "retryable": retryable,
+        "dead_lettered_at": datetime.utcnow(),
+    }
+
+
+class IngestionQueue:
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        lease_seconds: float = 60,
+        dead_letter_collection: Optional[AsyncIOMotorCollection] = None,
+        status_writer: Optional[StatusWriter] = None,
+    ):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.dead_letter_collection = dead_letter_collection
+        # With a status writer, finishing and rescheduling a job are buffered and
+        # only return, with whether the job was still owned, once they are flushed
+        self.status_writer = status_writer
+
+    async def enqueue(self, user_id: str, document_id: str, force: bool = False) -> dict:
+        job = new_job(user_id, document_id, force=force)
+        await self.collection.insert_one(job)
+        return job
+
+    async def enqueue_many(self, jobs: List[dict]) -> None:
+        """
+        Insert many job records in one unordered round trip.
+        """
+        if jobs:
+            await self.collection.insert_many(jobs, ordered=False)
+
+    async def claim(self, worker_id: str) -> Optional[dict]:
+        """
+        Atomically take the oldest runnable job: a pending one that isn't
+        scheduled for later, or a processing one whose lease has expired
+        because its worker stopped heartbeating.
+        """
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                # `$not: $gt` also matches jobs without a not_before
+                {"status": INGESTION_STATUS_PENDING, "not_before": {"$not": {"$gt": now}}},
+                {"status": INGESTION_STATUS_PROCESSING, "lease_expires_at": {"$lt": now}},
+            ]},
+            {
+                "$set": {
+                    "status": INGESTION_STATUS_PROCESSING,
+                    "lease_owner": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def heartbeat(self, ingestion_id: str, worker_id: str) -> bool:
+        """
+        Extend the lease on a job. Returns False if the worker no longer owns it.
+        """
+        now = datetime.utcnow()
+        result = await self.collection.update_one(
+            self._owned(ingestion_id, worker_id),
+            {"$set": {"lease_expires_at": now + timedelta(seconds=self.lease_seconds), "updated_at": now}},
+        )
+        return result.matched_count == 1
+
+    async def complete(self, ingestion_id: str, worker_id: str, **fields) -> bool:
+        return await self._finish(ingestion_id, worker_id, INGESTION_STATUS_COMPLETED, fields)
+
+    async def skip(self, ingestion_id: str, worker_id: str, **fields) -> bool:
+        return await self._finish(ingestion_id, worker_id, INGESTION_STATUS_SKIPPED, fields)
+
+    async def fail(self, ingestion_id: str, worker_id: str, error: str, **fields) -> bool:
+        return await self._finish(ingestion_id, worker_id, INGESTION_STATUS_FAILED, {"error": error, **fields})
+
+    async def retry_later(self, ingestion_id: str, worker_id: str, error: str, delay_seconds: float) -> bool:
+        """
+        Release a job back to the queue, to be claimed again no earlier than
+        `delay_seconds` from now.
+        """
+        now = datetime.utcnow()
+        return await self._set_owned(ingestion_id, worker_id, {
+            "status": INGESTION_STATUS_PENDING,
+            "not_before": now + timedelta(seconds=delay_seconds),
+            "error": error,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "updated_at": now,
+        })
+
+    async def dead_letter(self, job: dict, worker_id: str, error: str, retryable: bool = False) -> bool:
+        """
+        Fail a job for good and record it in the dead-letter collection.
+        """
+        if self.dead_letter_collection is None:
+            return await self.fail(job["ingestion_id"], worker_id, error, dead_lettered=True)
+        # Recorded first and keyed by ingestion_id, so a crash in between is repaired by the next attempt
+        entry = dead_letter_entry(job, error, retryable)
+        await self.dead_letter_collection.replace_one({"ingestion_id": job["ingestion_id"]}, entry, upsert=True)
+        if await self.fail(job["ingestion_id"], worker_id, error, dead_lettered=True):
+            return True
+        # Another worker took the job over and its attempt decides; withdraw our entry unless it was replaced since
+        await self.dead_letter_collection.delete_one(
+            {"ingestion_id": job["ingestion_id"], "dead_lettered_at": entry["dead_lettered_at"]}
+        )
+        return False
+
+    async def redrive(self, ingestion_id: str) -> bool:
+        """
+        Queue a dead-lettered job again with a fresh set of attempts. Returns
+        False if the job isn't failed (anymore), and then drops its stale
+        dead-letter entry.
+        """
+        started = datetime.utcnow()
+        result = await self.collection.update_one(
+            {"ingestion_id": ingestion_id, "status": INGESTION_STATUS_FAILED},
+            {"$set": {
+                "status": INGESTION_STATUS_PENDING,
+                "attempts": 0,
+                "not_before": None,
+                "error": None,
+                "dead_lettered": False,
+                "updated_at": datetime.utcnow(),
+            }},
+        )
+        if self.dead_letter_collection is None:
+            return result.matched_count == 1
+        if result.matched_count == 0:
+            # A later attempt finished the job (or is still running it); an entry it records from now on is kept
+            await self.dead_letter_collection.delete_one(
+                {"ingestion_id": ingestion_id, "dead_lettered_at": {"$lt": started}}
+            )
+            return False
+        await self.dead_letter_collection.delete_one({"ingestion_id": ingestion_id})
+        return True
+
+    async def _finish(self, ingestion_id: str, worker_id: str, status: str, fields: dict) -> bool:
+        return await self._set_owned(ingestion_id, worker_id, {
+            **fields,
+            "status": status,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "updated_at": datetime.utcnow(),
+        })
+
+    async def _set_owned(self, ingestion_id: str, worker_id: str, fields: dict) -> bool:
+        # Only the lease owner may finish a job; a worker that lost its lease must not overwrite the new owner
+        query = self._owned(ingestion_id, worker_id)
+        if self.status_writer is not None:
+            written = await self.status_writer.update(ingestion_id, query, fields)
+            return await written
+        result = await self.collection.update_one(query, {"$set": fields})
+        return result.matched_count == 1
+
+    @staticmethod
+    def _owned(ingestion_id: str, worker_id: str) -> dict:
+        return {"ingestion_id": ingestion_id, "status": INGESTION_STATUS_PROCESSING, "lease_owner": worker_id}
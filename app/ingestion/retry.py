@@ -0,0 +1,68 @@
+"""
+Retry policy for ingestion jobs.
+
+A failed attempt never waits inside the worker. Retryable failures put the
+job back in the queue with a `not_before` time chosen by exponential backoff
+with jitter, so the worker slot moves on to runnable work and retries of
+jobs that failed together don't hit the database together. Permanent
+failures, and jobs that ran out of attempts, go to the dead-letter
+collection.
+"""
+import asyncio
+import random
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+from bson import errors as bson_errors
+from pymongo.errors import BulkWriteError, ConnectionFailure, ExecutionTimeout, PyMongoError, WriteConcernError
+
+# Failures that a later attempt can reasonably be expected to get past
+RETRYABLE_ERRORS = (
+    ConnectionFailure,  # includes AutoReconnect and network timeouts
+    ExecutionTimeout,
+    WriteConcernError,
+    asyncio.TimeoutError,
+    BrokenProcessPool,
+    OSError,
+)
+TRANSIENT_ERROR_LABELS = ("RetryableWriteError", "TransientTransactionError")
+DUPLICATE_KEY_ERROR = 11000
+
+
+class PermanentIngestionError(Exception):
+    """
+    Raised for failures that retrying can't fix, like a missing document.
+    """
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether another attempt may succeed. Anything not known to be transient
+    is treated as permanent, so a bug fails fast instead of burning retries.
+    """
+    if isinstance(error, (PermanentIngestionError, bson_errors.InvalidId)):
+        return False
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    if isinstance(error, BulkWriteError):
+        # Concurrent upserts of the same chunk can collide on the unique index; the next attempt matches instead
+        write_errors = error.details.get("writeErrors", [])
+        return bool(write_errors) and all(e.get("code") == DUPLICATE_KEY_ERROR for e in write_errors)
+    if isinstance(error, PyMongoError):
+        return any(error.has_error_label(label) for label in TRANSIENT_ERROR_LABELS)
+    return False
+
+
+def backoff_delay(
+    attempt: int,
+    base_seconds: float,
+    max_seconds: float,
+    random_fraction: Callable[[], float] = random.random,
+) -> float:
+    """
+    Seconds to wait before retrying after failed attempt number `attempt`
+    (1-based): `base_seconds * 2 ** (attempt - 1)` capped at `max_seconds`,
+    of which a random half is kept ("equal jitter").
+    """
+    ceiling = min(max_seconds, base_seconds * 2 ** (attempt - 1))
+    return ceiling / 2 + random_fraction() * ceiling / 2
@@ -0,0 +1,160 @@
+"""
+Coalesced, batched job status writes.
+
+Workers finish jobs much faster than one round trip each is worth. Instead
+of an `update_one` per transition, `StatusWriter` buffers the transitions
+and flushes them as one unordered `bulk_write` once `max_batch` jobs are
+waiting or every `flush_interval_seconds`, whichever comes first.
+
+Transitions of the same job are merged while they wait, so a job is written
+at most once per flush, and flushes run one at a time, so a job's writes
+always reach the database in the order they were made. A transition that
+must not be merged (a different filter) flushes the buffer first.
+
+Every buffered transition gets a future that resolves once its flush is
+acknowledged, with whether the write matched its filter, so callers act on
+a status (announce it, count it) only after it is in the database and only
+if they still owned the job. When the acknowledged batch matched fewer jobs
+than it addressed, the jobs it did update are told apart by the flush id
+every write in the batch records.
+
+Claims and heartbeats are not buffered: both need to know right away
+whether they matched.
+"""
+import asyncio
+import logging
+import uuid
+from typing import Dict, List, Set, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Set on every job written by a flush, to tell which jobs a partly matching flush updated
+FLUSH_ID_FIELD = "status_flush_id"
+
+
+class StatusWriter:
+    def __init__(self, collection: AsyncIOMotorCollection, max_batch: int = 500, flush_interval_seconds: float = 0.1):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval_seconds = flush_interval_seconds
+        # ingestion_id -> (filter, fields to $set, futures of the merged transitions), in the order jobs were first buffered
+        self._pending: Dict[str, Tuple[dict, dict, List[asyncio.Future]]] = {}
+        self._flush_lock = asyncio.Lock()
+        self.transitions = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.writes = 0
+        self.errors = 0
+        self.unmatched = 0
+
+    async def update(self, ingestion_id: str, query: dict, fields: dict) -> "asyncio.Future[bool]":
+        """
+        Buffer `$set: fields` on the job matching `query`. Returns a future
+        that resolves, once the write is flushed, to whether it matched.
+        """
+        self.transitions += 1
+        written = asyncio.get_running_loop().create_future()
+        waiting = self._pending.get(ingestion_id)
+        if waiting is not None and waiting[0] != query:
+            await self.flush()
+            waiting = self._pending.get(ingestion_id)
+        if waiting is not None:
+            waiting[1].update(fields)
+            waiting[2].append(written)
+            self.coalesced += 1
+        else:
+            self._pending[ingestion_id] = (query, dict(fields), [written])
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+        return written
+
+    async def flush(self) -> None:
+        """
+        Write every buffered transition. Transitions buffered while a flush
+        is running go out with the next one.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            flush_id = uuid.uuid4().hex
+            requests = [
+                UpdateOne(query, {"$set": {**fields, FLUSH_ID_FIELD: flush_id}})
+                for query, fields, _ in batch.values()
+            ]
+            failed: Set[int] = set()
+            try:
+                result = await self.collection.bulk_write(requests, ordered=False)
+                matched = result.matched_count
+            except BulkWriteError as e:
+                # Individual updates failing won't succeed on a second try either
+                failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                matched = e.details.get("nMatched", 0)
+                self.errors += len(failed)
+                logger.error(f"{len(failed)} of {len(requests)} status writes failed: {e}")
+            except Exception as e:
+                # Nothing was confirmed: put the batch back, behind anything newer for the same job
+                self.errors += 1
+                logger.error(f"Status flush of {len(requests)} jobs failed, will retry: {e}")
+                for ingestion_id, (query, fields, futures) in batch.items():
+                    newer = self._pending.get(ingestion_id)
+                    if newer is None:
+                        self._pending[ingestion_id] = (query, fields, futures)
+                    elif newer[0] == query:
+                        self._pending[ingestion_id] = (query, {**fields, **newer[1]}, futures + newer[2])
+                    else:
+                        self._pending[ingestion_id] = newer
+                        _resolve(futures, False)
+                return
+            self.flushes += 1
+            self.writes += len(requests) - len(failed)
+
+            ids = list(batch)
+            written = {ingestion_id for index, ingestion_id in enumerate(ids) if index not in failed}
+            if matched < len(written):
+                # Some filters matched nothing (a lost lease): the jobs this flush updated carry its id
+                try:
+                    cursor = self.collection.find(
+                        {"ingestion_id": {"$in": list(written)}, FLUSH_ID_FIELD: flush_id}, {"_id": 0, "ingestion_id": 1}
+                    )
+                    written = {job["ingestion_id"] for job in await cursor.to_list(length=len(written))}
+                except Exception as e:
+                    logger.error(f"Could not tell which of {len(written)} status writes matched: {e}")
+                    written = set()
+            self.unmatched += len(ids) - len(failed) - len(written)
+            for ingestion_id, (_, _, futures) in batch.items():
+                _resolve(futures, ingestion_id in written)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """
+        Flush every `flush_interval_seconds` until `stop` is set, then flush
+        whatever is left.
+        """
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._pending),
+            "transitions": self.transitions,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "writes": self.writes,
+            "errors": self.errors,
+            "unmatched": self.unmatched,
+        }
+
+
+def _resolve(futures: List[asyncio.Future], matched: bool) -> None:
+    for future in futures:
+        if not future.done():
+            future.set_result(matched)
@@ -1,83 +1,427 @@
+"""
+Ingestion worker. Claims jobs from the durable queue and processes them.
+
+Run one or more standalone worker processes next to the API:
+
+    python -m app.ingestion.worker --concurrency 8
+"""
+import argparse
 import asyncio
 import logging
-from datetime import datetime
-from typing import Optional
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Awaitable, List, Optional, Set, Tuple
 from bson.objectid import ObjectId
 from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import DeleteMany, ReplaceOne
+
+from app.core.config import settings
+from app.db.mongodb import connect_db, close_db, get_db
+from app.ingestion.pipeline import content_digest, process_content
+from app.ingestion.events import IngestionEventPublisher, ensure_events_collection
+from app.ingestion.queue import (
+    IngestionQueue,
+    INGESTION_STATUS_COMPLETED,
+    INGESTION_STATUS_FAILED,
+    INGESTION_STATUS_PENDING,
+    INGESTION_STATUS_PROCESSING,
+    INGESTION_STATUS_SKIPPED,
+)
+from app.ingestion.retry import PermanentIngestionError, backoff_delay, is_retryable
+from app.ingestion.status_writer import StatusWriter
 
 logger = logging.getLogger(__name__)
 
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
 class IngestionWorker:
     def __init__(
         self,
         ingestion_collection: AsyncIOMotorCollection,
         document_collection: AsyncIOMotorCollection,
+        chunk_collection: AsyncIOMotorCollection,
         max_retries: int = 3,
-        retry_delay_seconds: int = 2,
+        retry_base_seconds: float = 2.0,
+        retry_max_seconds: float = 300.0,
+        dead_letter_collection: Optional[AsyncIOMotorCollection] = None,
+        status_writer: Optional[StatusWriter] = None,
+        concurrency: int = 4,
+        lease_seconds: float = 60,
+        heartbeat_seconds: float = 15,
+        poll_interval_seconds: float = 1.0,
+        worker_id: Optional[str] = None,
+        events: Optional[IngestionEventPublisher] = None,
+        chunk_tokens: int = 256,
+        chunk_overlap_tokens: int = 32,
+        chunk_write_batch: int = 500,
+        embedding_dims: int = 128,
+        cpu_pool: Optional[Executor] = None,
+        cpu_workers: Optional[int] = None,
     ):
         self.ingestion_collection = ingestion_collection
         self.document_collection = document_collection
+        self.chunk_collection = chunk_collection
         self.max_retries = max_retries
-        self.retry_delay_seconds = retry_delay_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.concurrency = concurrency
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.worker_id = worker_id or default_worker_id()
+        self.status_writer = status_writer
+        self.queue = IngestionQueue(
+            ingestion_collection,
+            lease_seconds=lease_seconds,
+            dead_letter_collection=dead_letter_collection,
+            status_writer=status_writer,
+        )
+        self.events = events
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self.chunk_write_batch = chunk_write_batch
+        self.embedding_dims = embedding_dims
+        # CPU-heavy stages run in a process pool, shared by all slots, so they never block the event loop
+        self._cpu_pool = cpu_pool
+        self._owns_cpu_pool = cpu_pool is None
+        self.cpu_workers = cpu_workers
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.retried = 0
+        self.lost_leases = 0
+        # Outcomes waiting for the status flush that records them
+        self._settling: Set[asyncio.Task] = set()
 
-    async def _update_ingestion_status(
-        self,
-        ingestion_id: ObjectId,
-        status: str,
-        error: Optional[str] = None
-    ):
-        update_doc = {
-            "status": status,
-            "updated_at": datetime.utcnow()
-        }
-        if error:
-            update_doc["error"] = error
+    async def run(self, stop: asyncio.Event) -> None:
+        """
+        Process jobs with up to `concurrency` running at once until `stop` is set.
+        Each slot claims its next job only after finishing the previous one, so
+        a worker never holds more than `concurrency` jobs. Jobs already running
+        when `stop` is set are finished, and their buffered status writes
+        flushed, before returning.
+        """
+        logger.info(f"Ingestion worker {self.worker_id} started with concurrency {self.concurrency}")
+        writer_stop = asyncio.Event()
+        writer = asyncio.create_task(self.status_writer.run(writer_stop)) if self.status_writer else None
+        try:
+            await asyncio.gather(*(self._run_slot(stop) for _ in range(self.concurrency)))
+            if self._settling:
+                # The writer keeps flushing until finished jobs are recorded; any still
+                # unrecorded once their leases could have run out are reclaimed anyway
+                _, unsettled = await asyncio.wait(list(self._settling), timeout=self.queue.lease_seconds)
+                for task in unsettled:
+                    task.cancel()
+        finally:
+            if writer is not None:
+                writer_stop.set()
+                await writer
+            self.close()
+        logger.info(f"Ingestion worker {self.worker_id} stopped")
+
+    async def _run_slot(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            try:
+                job = await self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id} could not claim a job: {e}")
+                job = None
+            if job is None:
+                # Queue empty (or database unavailable): wait, but wake up immediately on stop
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.in_flight += 1
+            try:
+                await self.process_document(job)
+            except Exception as e:
+                # Couldn't even record the outcome; the job is reclaimed once its lease expires
+                logger.error(f"Worker {self.worker_id} could not finish ingestion {job['ingestion_id']}: {e}")
+            finally:
+                self.in_flight -= 1
+
+    async def process_document(self, job: dict) -> None:
+        """
+        Make one attempt at a claimed job, keeping its lease alive until it
+        finishes. A failed attempt never waits here: the job is either
+        rescheduled for later or dead-lettered, and the slot moves on.
+        """
+        ingestion_id = job["ingestion_id"]
+        if job.get("attempts", 1) > self.max_retries:
+            # The job was reclaimed after its worker died too many times; don't let it crash more workers
+            await self._settle(self._give_up(job, "Worker lost the job too many times", retryable=True))
+            return
+
+        await self._publish(job, INGESTION_STATUS_PROCESSING)
+        heartbeat = asyncio.create_task(self._heartbeat(ingestion_id))
+        try:
+            status, fields = await self._ingest(job)
+        except Exception as e:
+            outcome = self._handle_failure(job, e)
+        else:
+            outcome = self._finish(job, status, fields)
+        finally:
+            heartbeat.cancel()
+        await self._settle(outcome)
+
+    async def _settle(self, outcome: Awaitable[None]) -> None:
+        """
+        Record a job's outcome. With a status writer the status only lands
+        with the next flush, and is announced after that, so the outcome is
+        awaited beside the slot, which moves on to its next job.
+        """
+        if self.status_writer is None:
+            await outcome
+            return
+        task = asyncio.create_task(self._settled(outcome))
+        self._settling.add(task)
+        task.add_done_callback(self._settling.discard)
+
+    async def _settled(self, outcome: Awaitable[None]) -> None:
+        try:
+            await outcome
+        except Exception as e:
+            # Couldn't even record the outcome; the job is reclaimed once its lease expires
+            logger.error(f"Worker {self.worker_id} could not record an ingestion outcome: {e}")
+
+    async def _finish(self, job: dict, status: str, fields: dict) -> None:
+        finish = self.queue.skip if status == INGESTION_STATUS_SKIPPED else self.queue.complete
+        if not await finish(job["ingestion_id"], self.worker_id, **fields):
+            self._lost(job)
+            return
+        if status == INGESTION_STATUS_SKIPPED:
+            self.skipped += 1
+        else:
+            self.completed += 1
+        await self._publish(job, status)
+        logger.info(f"Ingestion {status} for document {job['document_id']}")
+
+    async def _handle_failure(self, job: dict, error: Exception) -> None:
+        attempt = job.get("attempts", 1)
+        message = str(error) or type(error).__name__
+        retryable = is_retryable(error)
+        logger.error(f"Error processing ingestion for document {job['document_id']}, attempt {attempt}: {message}")
+        if not retryable or attempt >= self.max_retries:
+            await self._give_up(job, message, retryable)
+            return
+        delay = backoff_delay(attempt, self.retry_base_seconds, self.retry_max_seconds)
+        if not await self.queue.retry_later(job["ingestion_id"], self.worker_id, message, delay):
+            self._lost(job)
+            return
+        await self._publish(job, INGESTION_STATUS_PENDING, message)
+        self.retried += 1
+        logger.info(f"Ingestion {job['ingestion_id']} will be retried in {delay:.1f}s")
 
-        await self.ingestion_collection.update_one(
-            {"_id": ingestion_id},
-            {"$set": update_doc}
+    async def _give_up(self, job: dict, error: str, retryable: bool) -> None:
+        if not await self.queue.dead_letter(job, self.worker_id, error, retryable):
+            self._lost(job)
+            return
+        await self._publish(job, INGESTION_STATUS_FAILED, error)
+        self.failed += 1
+        logger.error(f"Ingestion {job['ingestion_id']} dead-lettered after {job.get('attempts', 1)} attempts: {error}")
+
+    def _lost(self, job: dict) -> None:
+        # Another worker reclaimed the job after our lease expired (or the write was rejected and
+        # the job is reclaimed once it does); that attempt's outcome is the one that counts
+        self.lost_leases += 1
+        logger.warning(f"Worker {self.worker_id} no longer owns ingestion {job['ingestion_id']}; outcome discarded")
+
+    async def _ingest(self, job: dict) -> Tuple[str, dict]:
+        """
+        Chunk one document and store the chunks that changed. Returns the
+        job's final status and the fields to record on it: the digest of the
+        ingested content, the number of chunks written and the time spent in
+        each stage, in milliseconds.
+
+        A document whose content is the one it was last ingested with is
+        skipped, unless the job was forced.
+        """
+        ingestion_id, document_id = job["ingestion_id"], job["document_id"]
+        timings = {}
+        started = time.perf_counter()
+        document = await self.document_collection.find_one(
+            {"_id": ObjectId(document_id)}, {"content": 1, "version": 1, "owner_id": 1, "ingested_digest": 1}
         )
+        if document is None:
+            raise PermanentIngestionError(f"Document with id {document_id} not found")
+        # Computed from the content actually read, so a concurrent update is never recorded as ingested
+        digest = content_digest(document.get("content", ""))
+        timings["fetch_ms"] = (time.perf_counter() - started) * 1000
+
+        if not job.get("force") and document.get("ingested_digest") == digest:
+            timings["total_ms"] = timings["fetch_ms"]
+            return INGESTION_STATUS_SKIPPED, {"content_digest": digest, "chunks_written": 0, "timings": _rounded(timings)}
 
-    async def process_document(self, document_id: str, user_id: str):
+        chunks, cpu_timings = await asyncio.get_running_loop().run_in_executor(
+            self.cpu_pool(),
+            process_content,
+            document.get("content", ""),
+            self.chunk_tokens,
+            self.chunk_overlap_tokens,
+            self.embedding_dims,
+        )
+        timings.update(cpu_timings)
+
+        started = time.perf_counter()
+        written = await self._write_chunks(document["_id"], document.get("owner_id"), ingestion_id, chunks)
+        await self.document_collection.update_one(
+            {"_id": document["_id"]},
+            {"$set": {
+                "indexed": True,
+                "chunk_count": len(chunks),
+                "ingested_digest": digest,
+                "ingested_version": document.get("version", 0),
+            }}
+        )
+        timings["write_ms"] = (time.perf_counter() - started) * 1000
+        timings["total_ms"] = sum(timings.values())
+        return INGESTION_STATUS_COMPLETED, {"content_digest": digest, "chunks_written": written, "timings": _rounded(timings)}
+
+    async def _write_chunks(
+        self, document_id: ObjectId, owner_id: Optional[ObjectId], ingestion_id: str, chunks: List[dict]
+    ) -> int:
         """
-        Process the ingestion for a given document and user.
+        Bring the stored chunks of a document in line with `chunks`, writing
+        in batches to bound request size. Chunks stored at the same index with
+        the same digest and offsets, embedded with the same size, are left
+        alone. Returns the number of chunks written.
 
-        Inserts a new ingestion record, simulates processing,
-        updates document status and ingestion status accordingly.
+        Every chunk is written as an upsert keyed by (document_id, index), so
+        two jobs racing on the same document both succeed instead of one
+        failing on the unique index. Chunks carry the document's owner so the
+        vector index can be built from the chunk collection alone.
         """
-        ingestion_record = {
-            "document_id": document_id,
-            "user_id": user_id,
-            "status": "processing",
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
-            "error": None,
-        }
+        stored = await self.chunk_collection.find(
+            {"document_id": document_id}, {"_id": 0, "index": 1, "digest": 1, "start": 1, "end": 1, "embedding_dims": 1}
+        ).to_list(length=None)
+        stored_keys = {chunk["index"]: _chunk_key(chunk) for chunk in stored}
+        requests = [
+            ReplaceOne(
+                {"document_id": document_id, "index": chunk["index"]},
+                {**chunk, "document_id": document_id, "owner_id": owner_id, "ingestion_id": ingestion_id},
+                upsert=True,
+            )
+            for chunk in chunks
+            if stored_keys.get(chunk["index"]) != _chunk_key(chunk)
+        ]
+        written = len(requests)
+        if len(stored_keys) > len(chunks):
+            # The document got shorter: drop the chunks past its new end
+            requests.append(DeleteMany({"document_id": document_id, "index": {"$gte": len(chunks)}}))
+        for offset in range(0, len(requests), self.chunk_write_batch):
+            await self.chunk_collection.bulk_write(requests[offset:offset + self.chunk_write_batch], ordered=False)
+        return written
 
-        result = await self.ingestion_collection.insert_one(ingestion_record)
-        ingestion_id = result.inserted_id
+    def cpu_pool(self) -> Executor:
+        if self._cpu_pool is None:
+            # Spawned, not forked: the embedded worker runs inside the API process, and a child forked
+            # while Motor's or bcrypt's threads hold a lock would inherit it held and deadlock
+            self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._cpu_pool
 
-        for attempt in range(1, self.max_retries + 1):
-            try:
-                # Simulate a long-running ingestion process
-                await asyncio.sleep(2)
+    def close(self) -> None:
+        if self._owns_cpu_pool and self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False)
+            self._cpu_pool = None
 
-                # Update the document status after ingestion (example: mark as indexed)
-                update_result = await self.document_collection.update_one(
-                    {"_id": ObjectId(document_id)},
-                    {"$set": {"indexed": True}}
-                )
-                if update_result.matched_count == 0:
-                    raise ValueError(f"Document with id {document_id} not found")
+    async def _publish(self, job: dict, status: str, error: Optional[str] = None) -> None:
+        if self.events is not None:
+            await self.events.publish(job, status, error)
 
-                await self._update_ingestion_status(ingestion_id, "completed")
-                logger.info(f"Ingestion completed for document {document_id}")
-                return
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "retried": self.retried,
+            "lost_leases": self.lost_leases,
+            "status_writer": self.status_writer.stats() if self.status_writer else None,
+        }
 
+    async def _heartbeat(self, ingestion_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                if not await self.queue.heartbeat(ingestion_id, self.worker_id):
+                    logger.warning(f"Worker {self.worker_id} lost the lease on ingestion {ingestion_id}")
+                    return
             except Exception as e:
-                logger.error(f"Error processing ingestion for document {document_id}, attempt {attempt}: {e}")
-                if attempt == self.max_retries:
-                    await self._update_ingestion_status(ingestion_id, "failed", error=str(e))
-                    logger.error(f"Ingestion failed permanently for document {document_id}")
-                else:
-                    await asyncio.sleep(self.retry_delay_seconds * attempt)
+                logger.error(f"Heartbeat for ingestion {ingestion_id} failed: {e}")
+
+
+def _rounded(timings: dict) -> dict:
+    return {stage: round(ms, 3) for stage, ms in timings.items()}
+
+
+def _chunk_key(chunk: dict) -> tuple:
+    # Chunks stored without an embedding, or embedded with another size, compare as changed
+    return chunk["digest"], chunk.get("start"), chunk.get("end"), chunk.get("embedding_dims")
+
+
+def build_worker(db, concurrency: Optional[int] = None) -> IngestionWorker:
+    return IngestionWorker(
+        db[settings.INGESTION_COLLECTION],
+        db[settings.DOCUMENT_COLLECTION],
+        db[settings.CHUNK_COLLECTION],
+        max_retries=settings.INGESTION_MAX_RETRIES,
+        retry_base_seconds=settings.INGESTION_RETRY_BASE_SECONDS,
+        retry_max_seconds=settings.INGESTION_RETRY_MAX_SECONDS,
+        dead_letter_collection=db[settings.INGESTION_DEAD_LETTER_COLLECTION],
+        status_writer=StatusWriter(
+            db[settings.INGESTION_COLLECTION],
+            max_batch=settings.INGESTION_STATUS_BATCH_SIZE,
+            flush_interval_seconds=settings.INGESTION_STATUS_FLUSH_SECONDS,
+        ) if settings.INGESTION_STATUS_BATCHING else None,
+        concurrency=concurrency or settings.INGESTION_WORKER_CONCURRENCY,
+        lease_seconds=settings.INGESTION_LEASE_SECONDS,
+        heartbeat_seconds=settings.INGESTION_HEARTBEAT_SECONDS,
+        poll_interval_seconds=settings.INGESTION_POLL_INTERVAL_SECONDS,
+        events=IngestionEventPublisher(db[settings.INGESTION_EVENTS_COLLECTION]) if settings.INGESTION_EVENTS_ENABLED else None,
+        chunk_tokens=settings.INGESTION_CHUNK_TOKENS,
+        chunk_overlap_tokens=settings.INGESTION_CHUNK_OVERLAP_TOKENS,
+        chunk_write_batch=settings.INGESTION_CHUNK_WRITE_BATCH,
+        embedding_dims=settings.EMBEDDING_DIMS,
+        cpu_workers=settings.INGESTION_CPU_WORKERS,
+    )
+
+
+async def _serve(concurrency: Optional[int]) -> None:
+    await connect_db()
+    db = await get_db()
+    if settings.INGESTION_EVENTS_ENABLED:
+        await ensure_events_collection(db, settings.INGESTION_EVENTS_COLLECTION, settings.INGESTION_EVENTS_MAX_BYTES)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Stop claiming on shutdown; running jobs finish, anything cut off is reclaimed after its lease
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await build_worker(db, concurrency).run(stop)
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run an ingestion worker process")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="jobs processed at once (default: INGESTION_WORKER_CONCURRENCY)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,22 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware  # <-- import CORS middleware
 
-from app.api import user_routes, document_routes, ingestion_routes
+from app.api import user_routes, document_routes, ingestion_routes, metrics_routes
 from app.core.config import settings
-from app.db.mongodb import connect_db, close_db
+from app.db.mongodb import connect_db, close_db, ensure_indexes, get_db
+from app.ingestion.worker import build_worker
+from app.ingestion.events import IngestionEventRelay, ensure_events_collection
+from app.services.ingestion_service import ingestion_events
+from app.core.metrics import register_metrics
 from fastapi import Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi import status
 from app.core.custom_exception_handler import add_exception_handlers
+from app.core.compression import CompressionMiddleware
+from app.core.auth import password_pool, configure_password_hashing
 
 app = FastAPI(title="Document Management and Ingestion System")
 
@@ -27,17 +35,55 @@ app.add_middleware(
     allow_headers=["*"],    # allow all headers
 )
 
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        levels={
+            "gzip": settings.COMPRESSION_GZIP_LEVEL,
+            "br": settings.COMPRESSION_BROTLI_QUALITY,
+            "zstd": settings.COMPRESSION_ZSTD_LEVEL,
+        },
+        content_types=settings.COMPRESSION_CONTENT_TYPES,
+    )
+
 app.include_router(user_routes.router, prefix="/api/v1/users", tags=["Users"])
 app.include_router(document_routes.router, prefix="/api/v1/documents", tags=["Documents"])
 app.include_router(ingestion_routes.router, prefix="/api/v1/ingestion", tags=["Ingestion"])
+app.include_router(metrics_routes.router, prefix="/api/v1/metrics", tags=["Metrics"])
+
+# Tails the status events published by ingestion workers, for SSE watchers
+event_relay_task = None
+# Single-process deployments can run an ingestion worker inside the API process
+embedded_worker_stop = asyncio.Event()
+embedded_worker_task = None
 
 @app.on_event("startup")
 async def startup():
+    global embedded_worker_task, event_relay_task
     await connect_db()
+    await configure_password_hashing()
+    if settings.ENSURE_INDEXES_ON_STARTUP:
+        await ensure_indexes()
+    if settings.INGESTION_EVENTS_ENABLED:
+        db = await get_db()
+        await ensure_events_collection(db, settings.INGESTION_EVENTS_COLLECTION, settings.INGESTION_EVENTS_MAX_BYTES)
+        relay = IngestionEventRelay(db[settings.INGESTION_EVENTS_COLLECTION], ingestion_events)
+        event_relay_task = asyncio.create_task(relay.run())
+    if settings.INGESTION_EMBEDDED_WORKER:
+        worker = build_worker(await get_db())
+        register_metrics("ingestion_worker", worker.stats)
+        embedded_worker_task = asyncio.create_task(worker.run(embedded_worker_stop))
 
 @app.on_event("shutdown")
 async def shutdown():
+    if embedded_worker_task:
+        embedded_worker_stop.set()
+        await embedded_worker_task
+    if event_relay_task:
+        event_relay_task.cancel()
     await close_db()
+    password_pool.shutdown()
 
 @app.get("/")
 def root():
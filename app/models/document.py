@@ -1,6 +1,11 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Extra, Field
+from typing import List, Optional, Union
 from datetime import datetime
+from enum import Enum
+
+class DocumentView(str, Enum):
+    full = "full"
+    summary = "summary"
 
 class DocumentBase(BaseModel):
     title: str = Field(..., example="HR Policy", description="Title of the document")
@@ -15,11 +20,37 @@ class DocumentUpdate(BaseModel):
     title: Optional[str] = Field(None, example="Updated HR Policy")
     content: Optional[str] = Field(None, example="Updated document content...")
 
+class DocumentBulkUpdateItem(DocumentBase):
+    """Single replacement inside a bulk request"""
+    id: str = Field(..., example="60d21b4667d0d8992e610c85", description="ID of the document to update")
+
+class DocumentBulkRequest(BaseModel):
+    """Creates, updates and deletes applied in one call; operations are independent of each other"""
+    create: List[DocumentCreate] = Field(default_factory=list, description="Documents to create")
+    update: List[DocumentBulkUpdateItem] = Field(default_factory=list, description="Documents to replace")
+    delete: List[str] = Field(default_factory=list, description="IDs of documents to delete")
+
+class DocumentBulkItemResult(BaseModel):
+    """Outcome of one operation of a bulk request"""
+    operation: str = Field(..., example="create", description="create, update or delete")
+    index: int = Field(..., example=0, description="Position of the item in its request list")
+    id: Optional[str] = Field(None, example="60d21b4667d0d8992e610c85", description="Document ID, when known")
+    status: int = Field(..., example=201, description="HTTP-style status of this operation")
+    error: Optional[str] = Field(None, description="Error message if the operation failed")
+
+class DocumentBulkResponse(BaseModel):
+    """Per-item results of a bulk request plus success counters"""
+    created: int = Field(0, description="Number of documents created")
+    updated: int = Field(0, description="Number of documents updated")
+    deleted: int = Field(0, description="Number of documents deleted")
+    results: List[DocumentBulkItemResult] = Field(default_factory=list)
+
 class DocumentInDB(DocumentBase):
     id: str = Field(..., alias="_id", description="Document unique identifier")
     owner_id: str = Field(..., description="ID of the user who owns the document")
     created_at: Optional[datetime] = Field(None, description="Creation timestamp")
     updated_at: Optional[datetime] = Field(None, description="Last update timestamp")
+    version: int = Field(0, description="Incremented on every update, used for ETags")
 
     class Config:
         orm_mode = True
@@ -31,10 +62,55 @@ class DocumentInDB(DocumentBase):
                 "title": "HR Policy",
                 "content": "This document contains HR guidelines...",
                 "created_at": "2023-01-01T12:00:00Z",
-                "updated_at": "2023-01-02T12:00:00Z"
+                "updated_at": "2023-01-02T12:00:00Z",
+                "version": 2
             }
         }
 
 class DocumentResponse(DocumentInDB):
     """Response schema returned by API endpoints"""
     pass
+
+class DocumentSummary(BaseModel):
+    """Projected document returned by `view=summary` or `fields=` listings; only requested fields are present"""
+    id: str = Field(..., alias="_id", description="Document unique identifier")
+    title: Optional[str] = Field(None, example="HR Policy")
+    content: Optional[str] = Field(None, example="This document contains HR guidelines...")
+    owner_id: Optional[str] = Field(None, description="ID of the user who owns the document")
+    created_at: Optional[datetime] = Field(None, description="Creation timestamp")
+    updated_at: Optional[datetime] = Field(None, description="Last update timestamp")
+    version: Optional[int] = Field(None, description="Incremented on every update, used for ETags")
+    content_length: Optional[int] = Field(None, example=39, description="Length of the content in characters")
+    preview: Optional[str] = Field(None, example="This document contains HR", description="Leading characters of the content")
+
+    class Config:
+        allow_population_by_field_name = True
+
+class DocumentPageItem(DocumentInDB):
+    """Full document in a listing; rejects unknown fields so projections with computed fields fall through to DocumentSummary"""
+    class Config:
+        extra = Extra.forbid
+
+class DocumentPage(BaseModel):
+    """One page of a document listing with the cursor for the next page"""
+    # pydantic 1.x tries Union members in order: full documents must be matched before the all-optional summary
+    items: List[Union[DocumentPageItem, DocumentSummary]] = Field(..., description="Documents on this page")
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next page, null on the last page")
+
+class DocumentSearchHit(DocumentSummary):
+    """Search result, ranked by relevance"""
+    score: float = Field(..., example=1.25, description="Text search relevance score")
+
+class DocumentSearchPage(BaseModel):
+    """One page of search results with the offset of the next page"""
+    items: List[DocumentSearchHit] = Field(..., description="Matching documents, most relevant first")
+    next_offset: Optional[int] = Field(None, description="Offset of the next page, null on the last page")
+
+class DocumentSimilarHit(DocumentSummary):
+    """Similarity search result, ranked by its best matching chunk"""
+    score: float = Field(..., example=0.82, description="Cosine similarity of the best matching chunk")
+    chunk_index: int = Field(..., example=3, description="Index of the best matching chunk within the document")
+
+class DocumentSimilarPage(BaseModel):
+    """Documents most similar to a query"""
+    items: List[DocumentSimilarHit] = Field(..., description="Similar documents, most similar first")
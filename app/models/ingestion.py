@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, root_validator
+from typing import Dict, List, Optional
 from datetime import datetime
 
 
@@ -8,6 +8,7 @@ class IngestionRequest(BaseModel):
     Schema for requesting ingestion processing of a document.
     """
     document_id: str = Field(..., example="60d21b4667d0d8992e610c85", description="ID of the document to ingest")
+    force: bool = Field(False, description="Re-ingest the document even if its content hasn't changed since its last ingestion")
 
 
 class IngestionResponse(BaseModel):
@@ -19,17 +20,86 @@ class IngestionResponse(BaseModel):
     message: Optional[str] = Field(None, example="Ingestion started", description="Optional informational message")
 
 
+class IngestionBatchRequest(BaseModel):
+    """
+    Schema for queueing ingestion of many documents at once, either by ID or
+    by owner. Exactly one of `document_ids` and `owner_id` must be given.
+    """
+    document_ids: Optional[List[str]] = Field(None, example=["60d21b4667d0d8992e610c85"], description="IDs of the documents to ingest")
+    owner_id: Optional[str] = Field(None, example="60d21b4667d0d8992e610c80", description="Ingest every document owned by this user")
+    force: bool = Field(False, description="Re-ingest documents even if their content hasn't changed since their last ingestion")
+
+    @root_validator
+    def one_selector(cls, values):
+        if (values.get("document_ids") is None) == (values.get("owner_id") is None):
+            raise ValueError("Provide exactly one of document_ids or owner_id")
+        return values
+
+
+class IngestionBatchResponse(BaseModel):
+    """
+    Response after queueing a batch of ingestion jobs.
+    """
+    batch_id: str = Field(..., example="2b1f5c7e-3d4a-4f7e-9a51-0c2d6e8f9a10", description="Identifier shared by every job of the batch")
+    status: str = Field(..., example="pending", description="Status of the queued jobs")
+    queued: int = Field(..., example=1000, description="Number of jobs queued")
+    skipped: int = Field(0, example=0, description="Number of documents skipped because their content hasn't changed since their last ingestion")
+    missing: List[str] = Field(default_factory=list, description="Requested document IDs that don't exist or aren't visible to the caller")
+
+
 class IngestionStatus(BaseModel):
     """
     Detailed ingestion status report.
     """
     ingestion_id: str = Field(..., example="610b0f4e1234567890abcdef")
+    batch_id: Optional[str] = Field(None, example="2b1f5c7e-3d4a-4f7e-9a51-0c2d6e8f9a10", description="Batch the job was queued in, if any")
     document_id: str = Field(..., example="60d21b4667d0d8992e610c85")
     user_id: str = Field(..., example="user123")
     status: str = Field(..., example="completed")
+    attempts: int = Field(0, example=1, description="Number of times a worker has picked up the job")
     created_at: datetime = Field(..., example="2023-01-01T12:00:00Z")
     updated_at: datetime = Field(..., example="2023-01-01T12:30:00Z")
     error: Optional[str] = Field(None, example="Timeout error", description="Error message if ingestion failed")
+    not_before: Optional[datetime] = Field(None, example="2023-01-01T12:31:00Z", description="When a job waiting to be retried becomes runnable again")
+    dead_lettered: bool = Field(False, description="Whether the failed job was moved to the dead-letter collection")
+    timings: Optional[Dict[str, float]] = Field(
+        None,
+        example={"fetch_ms": 1.2, "normalize_ms": 0.4, "tokenize_ms": 2.1, "chunk_ms": 0.8, "write_ms": 5.3, "total_ms": 9.8},
+        description="Milliseconds spent in each ingestion stage, once completed",
+    )
+    content_digest: Optional[str] = Field(None, description="Digest of the content the job ingested")
+    chunks_written: Optional[int] = Field(None, example=3, description="Chunks that changed and were rewritten; unchanged chunks are kept as they are")
 
     class Config:
         orm_mode = True
+
+
+class IngestionDeadLetter(BaseModel):
+    """
+    A job that could not be completed and was moved to the dead-letter collection.
+    """
+    ingestion_id: str = Field(..., example="610b0f4e1234567890abcdef")
+    batch_id: Optional[str] = Field(None, example="2b1f5c7e-3d4a-4f7e-9a51-0c2d6e8f9a10")
+    document_id: str = Field(..., example="60d21b4667d0d8992e610c85")
+    user_id: str = Field(..., example="user123")
+    attempts: int = Field(..., example=3, description="Attempts made before the job was dead-lettered")
+    error: str = Field(..., example="Document with id 60d21b4667d0d8992e610c85 not found", description="Error of the last attempt")
+    retryable: bool = Field(..., example=False, description="Whether the last error was transient, i.e. the job ran out of attempts")
+    dead_lettered_at: datetime = Field(..., example="2023-01-01T12:30:00Z")
+
+
+class IngestionDeadLetterPage(BaseModel):
+    """
+    One page of dead-lettered jobs with the cursor for the next page.
+    """
+    items: List[IngestionDeadLetter] = Field(..., description="Dead-lettered jobs, most recent first")
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next page, null on the last page")
+
+
+class IngestionBatchStatus(BaseModel):
+    """
+    Progress of a batch of ingestion jobs.
+    """
+    batch_id: str = Field(..., example="2b1f5c7e-3d4a-4f7e-9a51-0c2d6e8f9a10")
+    total: int = Field(..., example=1000, description="Number of jobs in the batch")
+    counts: Dict[str, int] = Field(..., example={"pending": 10, "processing": 4, "completed": 986}, description="Number of jobs per status")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 class UserRole(str, Enum):
@@ -23,6 +23,21 @@ class UserInDB(UserBase):
     class Config:
         orm_mode = True
 
+class UserPage(BaseModel):
+    """One page of the admin user listing"""
+    items: List[UserInDB] = Field(..., description="Users on this page")
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next page, null on the last page")
+    total: int = Field(..., description="Number of matching users; may lag behind by up to a minute")
+
+class UserBatchRequest(BaseModel):
+    """IDs of the users to resolve in one call"""
+    ids: List[str] = Field(..., example=["60d21b4667d0d8992e610c85"], description="User IDs; duplicates are ignored")
+
+class UserBatchResponse(BaseModel):
+    """Users found for a batch lookup"""
+    items: List[UserInDB] = Field(..., description="Users that exist, in request order")
+    missing: List[str] = Field(default_factory=list, description="Requested IDs that are invalid or unknown")
+
 class Token(BaseModel):
     access_token: str = Field(..., description="JWT access token")
     token_type: str = Field(..., example="bearer", description="Token type")
@@ -1,12 +1,79 @@
+import asyncio
+from datetime import datetime
 from fastapi import HTTPException, status
-from typing import List, Optional, Union
+from typing import AsyncIterator, List, Optional, Union
 from bson import ObjectId, errors
-from app.models.document import DocumentCreate, DocumentInDB
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from app.models.document import DocumentBulkRequest, DocumentCreate, DocumentInDB, DocumentView
 from app.db.mongodb import get_db
 from app.models.user import UserRole
 from app.core.config import settings
+from app.core.pagination import DEFAULT_PAGE_SIZE, apply_keyset, encode_cursor
+from app.core.cache import LRUCache
+from app.core.loader import BatchLoader
+from app.core.metrics import register_metrics
+from app.core.etag import document_etag, page_etag
+from app.core.vector_index import VectorIndexStore, VectorIndexUnavailable
+from app.ingestion.pipeline import content_digest, embed_texts, normalize_text
 
-MAX_DOCS_RETURN = 100
+PREVIEW_LENGTH = 200
+
+# Read-through cache for get_document, sized by the length of the cached text.
+# Writes from this process invalidate their entries; writes from other
+# replicas are picked up once the TTL expires.
+document_cache = LRUCache(
+    max_size=settings.DOCUMENT_CACHE_MAX_BYTES,
+    ttl_seconds=settings.DOCUMENT_CACHE_TTL_SECONDS,
+)
+register_metrics("document_cache", document_cache.stats)
+
+def _cache_size(doc: dict) -> int:
+    # Rough footprint: the text fields dominate, plus a fixed per-entry overhead
+    return len(doc["content"]) + len(doc["title"]) + 256
+
+def _invalidate_cached(doc_id) -> None:
+    if settings.DOCUMENT_CACHE_ENABLED:
+        document_cache.invalidate(str(doc_id))
+
+# Fields that can be requested through `fields=`. Computed fields are evaluated
+# by MongoDB inside the find() projection, so `content` never leaves the server.
+PROJECTABLE_FIELDS = {
+    "title": 1,
+    "content": 1,
+    "owner_id": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "version": 1,
+    "content_length": {"$strLenCP": "$content"},
+    "preview": {"$substrCP": ["$content", 0, PREVIEW_LENGTH]},
+}
+
+SUMMARY_FIELDS = ["title", "owner_id", "created_at", "updated_at", "content_length", "preview"]
+
+def build_projection(
+    view: Union[DocumentView, str] = DocumentView.full,
+    fields: Optional[List[str]] = None,
+) -> Optional[dict]:
+    """
+    Translates a listing's `view` / `fields` into a Mongo projection.
+
+    Returns None for the full view. An explicit `fields` list takes
+    precedence over `view`; unknown field names are rejected with HTTP 400.
+    `version` is always projected since listing ETags are built from it.
+    """
+    if fields:
+        unknown = sorted(set(fields) - PROJECTABLE_FIELDS.keys())
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown document fields: {', '.join(unknown)}"
+            )
+    elif DocumentView(view) == DocumentView.summary:
+        fields = SUMMARY_FIELDS
+    else:
+        return None
+    return {**{field: PROJECTABLE_FIELDS[field] for field in fields}, "version": 1}
 
 def document_helper(doc: dict) -> dict:
     """
@@ -19,8 +86,45 @@ def document_helper(doc: dict) -> dict:
         "owner_id": str(doc["owner_id"]),
         "created_at": doc.get("created_at"),
         "updated_at": doc.get("updated_at"),
+        "version": doc.get("version", 0),
     }
 
+def projected_document_helper(doc: dict) -> dict:
+    """
+    Converts a projected MongoDB document, keeping only the fields it contains.
+    """
+    result = {key: value for key, value in doc.items() if key != "_id"}
+    result["id"] = str(doc["_id"])
+    if "owner_id" in result:
+        result["owner_id"] = str(result["owner_id"])
+    return result
+
+def visibility_filter(user_id: str, role: Union[UserRole, str]) -> dict:
+    """
+    Builds the Mongo filter for the documents a user may see:
+    admins see everything, everyone else only their own documents.
+    """
+    # Normalize role if string
+    role = UserRole(role) if isinstance(role, str) else role
+
+    if role == UserRole.admin:
+        return {}
+    try:
+        return {"owner_id": ObjectId(user_id)}
+    except errors.InvalidId:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user ID")
+
+async def _raise_not_found_or_forbidden(doc_collection, obj_id: ObjectId) -> None:
+    """
+    Explains why an ownership-filtered write matched nothing.
+
+    Only runs on the failure path: a projected `_id` lookup tells a missing
+    document (404) apart from one owned by someone else (403).
+    """
+    if await doc_collection.find_one({"_id": obj_id}, {"_id": 1}):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Unauthorized")
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
 async def create_document(doc: DocumentCreate, user_id: str) -> dict:
     db = await get_db()
     doc_collection = db[settings.DOCUMENT_COLLECTION]
@@ -31,42 +135,166 @@ async def create_document(doc: DocumentCreate, user_id: str) -> dict:
     except errors.InvalidId:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user ID")
 
+    now = datetime.utcnow()
+    doc_dict["created_at"] = now
+    doc_dict["updated_at"] = now
+    doc_dict["version"] = 1
+    # Lets ingestion skip documents whose content hasn't changed since they were last ingested
+    doc_dict["content_digest"] = content_digest(doc_dict["content"])
+
+    # The inserted dict is exactly what was stored, no need to read it back
     result = await doc_collection.insert_one(doc_dict)
-    created_doc = await doc_collection.find_one({"_id": result.inserted_id})
-    return document_helper(created_doc)
+    doc_dict["_id"] = result.inserted_id
+    return document_helper(doc_dict)
 
 async def get_document(doc_id: str) -> Optional[dict]:
+    try:
+        obj_id = ObjectId(doc_id)
+    except errors.InvalidId:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid document ID")
+
+    if not settings.DOCUMENT_CACHE_ENABLED:
+        return await _load_document(obj_id)
+    cached = document_cache.get(str(obj_id))
+    if cached is not None:
+        return dict(cached)
+
+    # A write that lands while the document is read invalidates it, and the fill is then dropped
+    generation = document_cache.begin_fill(str(obj_id))
+    try:
+        result = await _load_document(obj_id)
+        document_cache.set(str(obj_id), dict(result), size=_cache_size(result), generation=generation)
+    finally:
+        document_cache.end_fill(str(obj_id))
+    return result
+
+async def _load_document(obj_id: ObjectId) -> dict:
     db = await get_db()
     doc_collection = db[settings.DOCUMENT_COLLECTION]
 
+    doc = await doc_collection.find_one({"_id": obj_id})
+    if doc:
+        return document_helper(doc)
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+
+async def get_document_etag(doc_id: str) -> str:
+    """
+    Returns the current ETag of a document without loading its content:
+    from the cache when possible, otherwise from a projected `version` lookup.
+    """
     try:
         obj_id = ObjectId(doc_id)
     except errors.InvalidId:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid document ID")
 
-    doc = await doc_collection.find_one({"_id": obj_id})
+    if settings.DOCUMENT_CACHE_ENABLED:
+        cached = document_cache.get(str(obj_id))
+        if cached is not None:
+            return document_etag(obj_id, cached["version"])
+
+    db = await get_db()
+    doc_collection = db[settings.DOCUMENT_COLLECTION]
+
+    doc = await doc_collection.find_one({"_id": obj_id}, {"version": 1})
     if doc:
-        return document_helper(doc)
+        return document_etag(obj_id, doc.get("version"))
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
 
-async def get_all_documents(user_id: str, role: Union[UserRole, str]) -> List[dict]:
+async def _fetch_page(doc_collection, query: dict, after: Optional[str], limit: int, projection: Optional[dict]):
+    # Fetch one extra document to find out whether another page exists
+    cursor = doc_collection.find(apply_keyset(query, after), projection).sort("_id", -1).limit(limit + 1)
+    docs = await cursor.to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["_id"])
+    return docs, next_cursor
+
+def _page_variant(view: Union[DocumentView, str], fields: Optional[List[str]]) -> str:
+    return f"{DocumentView(view).value}|{','.join(fields or [])}"
+
+async def get_documents_page_etag(
+    user_id: str,
+    role: Union[UserRole, str],
+    limit: int = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+    view: Union[DocumentView, str] = DocumentView.full,
+    fields: Optional[List[str]] = None,
+) -> str:
+    """
+    Computes the ETag `get_all_documents` would return for the same page,
+    reading only `_id` and `version` of the documents on it.
+    """
     db = await get_db()
     doc_collection = db[settings.DOCUMENT_COLLECTION]
+    build_projection(view, fields)  # validates `fields` like the listing does
+    docs, next_cursor = await _fetch_page(
+        doc_collection, visibility_filter(user_id, role), after, limit, {"version": 1}
+    )
+    return page_etag(docs, next_cursor, _page_variant(view, fields))
 
-    # Normalize role if string
-    role = UserRole(role) if isinstance(role, str) else role
+async def get_all_documents(
+    user_id: str,
+    role: Union[UserRole, str],
+    limit: int = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+    view: Union[DocumentView, str] = DocumentView.full,
+    fields: Optional[List[str]] = None,
+) -> dict:
+    """
+    Returns one page of the documents visible to the user, newest first.
 
-    if role == UserRole.admin:
-        cursor = doc_collection.find({})
-    else:
-        try:
-            owner_obj_id = ObjectId(user_id)
-        except errors.InvalidId:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user ID")
-        cursor = doc_collection.find({"owner_id": owner_obj_id})
+    Uses keyset pagination on `_id` so every page is an index range scan,
+    and `next_cursor` is None once the last page has been reached.
+    With a summary view or a `fields` selection only the projected fields
+    are read from MongoDB. The returned `etag` identifies the page contents.
+    """
+    db = await get_db()
+    doc_collection = db[settings.DOCUMENT_COLLECTION]
+    query = visibility_filter(user_id, role)
+    projection = build_projection(view, fields)
+    helper = document_helper if projection is None else projected_document_helper
+
+    docs, next_cursor = await _fetch_page(doc_collection, query, after, limit, projection)
+
+    return {
+        "items": [helper(doc) for doc in docs],
+        "next_cursor": next_cursor,
+        "etag": page_etag(docs, next_cursor, _page_variant(view, fields)),
+    }
+
+async def export_documents(
+    user_id: str,
+    role: Union[UserRole, str],
+    batch_size: int = settings.EXPORT_BATCH_SIZE,
+) -> AsyncIterator[str]:
+    """
+    Returns an async iterator of newline-delimited JSON for every document
+    visible to the user, each in the `DocumentInDB` shape the JSON
+    endpoints return.
+
+    The visibility filter is resolved eagerly so bad input still surfaces as
+    an HTTP error; the documents themselves are pulled from the Motor cursor
+    one batch at a time and emitted as one chunk per batch, so memory is
+    bounded by `batch_size` rather than by the size of the export.
+    """
+    db = await get_db()
+    doc_collection = db[settings.DOCUMENT_COLLECTION]
+    cursor = doc_collection.find(visibility_filter(user_id, role)).sort("_id", 1).batch_size(batch_size)
 
-    docs = await cursor.to_list(length=MAX_DOCS_RETURN)
-    return [document_helper(doc) for doc in docs]
+    async def ndjson_chunks() -> AsyncIterator[str]:
+        lines = []
+        async for doc in cursor:
+            # Serialized like the JSON endpoints, `_id` included, so exported records match the API's schema
+            lines.append(DocumentInDB(**document_helper(doc)).json(by_alias=True))
+            if len(lines) >= batch_size:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    return ndjson_chunks()
 
 async def update_document(
     doc_id: str,
@@ -82,19 +310,19 @@ async def update_document(
     except errors.InvalidId:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid document ID")
 
-    existing = await doc_collection.find_one({"_id": obj_id})
-    if not existing:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
-
-    role = UserRole(role) if isinstance(role, str) else role
-
-    if role != UserRole.admin and str(existing["owner_id"]) != user_id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Unauthorized")
-
     updated_data = updated_doc.dict()
-    await doc_collection.update_one({"_id": obj_id}, {"$set": updated_data})
+    updated_data["updated_at"] = datetime.utcnow()
+    updated_data["content_digest"] = content_digest(updated_data["content"])
 
-    new_doc = await doc_collection.find_one({"_id": obj_id})
+    # Ownership is part of the filter, so the check and the write are one atomic operation
+    new_doc = await doc_collection.find_one_and_update(
+        {"_id": obj_id, **visibility_filter(user_id, role)},
+        {"$set": updated_data, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not new_doc:
+        await _raise_not_found_or_forbidden(doc_collection, obj_id)
+    _invalidate_cached(obj_id)
     return document_helper(new_doc)
 
 async def delete_document(doc_id: str, user_id: str, role: Union[UserRole, str]) -> bool:
@@ -106,14 +334,270 @@ async def delete_document(doc_id: str, user_id: str, role: Union[UserRole, str])
     except errors.InvalidId:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid document ID")
 
-    existing = await doc_collection.find_one({"_id": obj_id})
-    if not existing:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+    result = await doc_collection.delete_one({"_id": obj_id, **visibility_filter(user_id, role)})
+    if result.deleted_count == 0:
+        await _raise_not_found_or_forbidden(doc_collection, obj_id)
+    _invalidate_cached(obj_id)
+    return True
 
-    role = UserRole(role) if isinstance(role, str) else role
+async def search_documents(
+    user_id: str,
+    role: Union[UserRole, str],
+    q: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    offset: int = 0,
+    view: Union[DocumentView, str] = DocumentView.summary,
+    fields: Optional[List[str]] = None,
+) -> dict:
+    """
+    Full-text search over title and content, most relevant first.
 
-    if role != UserRole.admin and str(existing["owner_id"]) != user_id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Unauthorized")
+    Matches come from the `$text` index and are narrowed by the same
+    visibility rules as the listing. Relevance is only known once every
+    match is scored, so paging is offset based over the ranked matches.
+    """
+    db = await get_db()
+    doc_collection = db[settings.DOCUMENT_COLLECTION]
+    query = {"$text": {"$search": q}, **visibility_filter(user_id, role)}
+    projection = {**(build_projection(view, fields) or {}), "score": {"$meta": "textScore"}}
 
-    await doc_collection.delete_one({"_id": obj_id})
-    return True
+    cursor = (
+        doc_collection.find(query, projection)
+        .sort([("score", {"$meta": "textScore"}), ("_id", -1)])
+        .skip(offset)
+        .limit(limit + 1)
+    )
+    docs = await cursor.to_list(length=limit + 1)
+
+    next_offset = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_offset = offset + limit
+
+    return {"items": [projected_document_helper(doc) for doc in docs], "next_offset": next_offset}
+
+# Built offline by app.ingestion.indexer; new generations are picked up as they appear
+vector_index_store = VectorIndexStore(settings.VECTOR_INDEX_PATH, settings.VECTOR_INDEX_CHECK_SECONDS)
+register_metrics("vector_index", vector_index_store.stats)
+
+def _similar_chunks(keys: list) -> dict:
+    """
+    Scores a batch of (query, owner, k) keys, most similar chunks first.
+
+    Queries over the same rows share one pass over the index. Runs in a
+    thread; NumPy releases the GIL while it multiplies.
+    """
+    index = vector_index_store.current()
+    vectors = embed_texts([normalize_text(q) for q, _, _ in keys], index.dims)
+    groups = {}
+    for position, (_, owner, _) in enumerate(keys):
+        rows = index.owner_rows(owner) if owner else slice(0, len(index))
+        groups.setdefault((rows.start, rows.stop), []).append(position)
+
+    results = {}
+    for (start, stop), positions in groups.items():
+        found = index.search(vectors[positions], max(keys[p][2] for p in positions), slice(start, stop))
+        for position, hits in zip(positions, found):
+            key = keys[position]
+            results[key] = [(*index.row(row), score) for row, score in hits[:key[2]]]
+    return results
+
+async def _load_similar_chunks(keys: list) -> dict:
+    return await asyncio.get_running_loop().run_in_executor(None, _similar_chunks, keys)
+
+# Similarity queries arriving in the same event-loop tick are scored together
+similarity_loader = BatchLoader(_load_similar_chunks, max_batch_size=settings.SIMILARITY_BATCH_MAX_QUERIES)
+register_metrics("similarity_loader", similarity_loader.stats)
+
+async def similar_documents(
+    user_id: str,
+    role: Union[UserRole, str],
+    q: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> dict:
+    """
+    Documents closest in meaning to `q`, most similar first.
+
+    Chunks are ranked by cosine similarity in the vector index, searching
+    only the caller's own chunks unless they are an admin, and each document
+    is scored by its best chunk. Several chunks of one document can rank
+    high, so more chunks than `limit` are fetched. The index is a snapshot,
+    so the documents are read back through the visibility filter, which
+    drops any deleted since it was built.
+    """
+    visibility = visibility_filter(user_id, role)
+    owner = str(visibility["owner_id"]) if visibility else None
+    try:
+        chunks = await similarity_loader.load((q, owner, limit * settings.SIMILARITY_OVERSAMPLE))
+    except VectorIndexUnavailable:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Similarity index is not built yet")
+
+    best = {}
+    for document_id, chunk_index, score in chunks:
+        if document_id not in best:
+            best[document_id] = (score, chunk_index)
+            if len(best) == limit:
+                break
+    if not best:
+        return {"items": []}
+
+    db = await get_db()
+    cursor = db[settings.DOCUMENT_COLLECTION].find(
+        {"_id": {"$in": [ObjectId(document_id) for document_id in best]}, **visibility},
+        build_projection(DocumentView.summary),
+    )
+    docs = {str(doc["_id"]): doc for doc in await cursor.to_list(length=len(best))}
+    return {
+        "items": [
+            {**projected_document_helper(docs[document_id]), "score": score, "chunk_index": chunk_index}
+            for document_id, (score, chunk_index) in best.items()
+            if document_id in docs
+        ]
+    }
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+def _bulk_result(operation: str, index: int, status_code: int, doc_id=None, error: Optional[str] = None) -> dict:
+    return {
+        "operation": operation,
+        "index": index,
+        "id": str(doc_id) if doc_id is not None else None,
+        "status": status_code,
+        "error": error,
+    }
+
+async def _bulk_insert(doc_collection, docs: List[DocumentCreate], owner_id: ObjectId, chunk_size: int) -> List[dict]:
+    results = []
+    for offset, chunk in _chunks(docs, chunk_size):
+        now = datetime.utcnow()
+        doc_dicts = [
+            {
+                **doc.dict(),
+                "owner_id": owner_id,
+                "created_at": now,
+                "updated_at": now,
+                "version": 1,
+                "content_digest": content_digest(doc.content),
+            }
+            for doc in chunk
+        ]
+        failed = {}
+        try:
+            # insert_many assigns the _id of every dict before sending the batch
+            await doc_collection.insert_many(doc_dicts, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+        for i, doc_dict in enumerate(doc_dicts):
+            if i in failed:
+                results.append(_bulk_result("create", offset + i, status.HTTP_500_INTERNAL_SERVER_ERROR, error=failed[i]))
+            else:
+                results.append(_bulk_result("create", offset + i, status.HTTP_201_CREATED, doc_dict["_id"]))
+    return results
+
+async def _bulk_modify(
+    doc_collection,
+    operation: str,
+    items: List[tuple],
+    user_id: str,
+    role: Union[UserRole, str],
+    chunk_size: int,
+) -> List[dict]:
+    """
+    Applies (raw_id, update_or_None) pairs as one unordered bulk_write per chunk.
+
+    A single projected `$in` lookup per chunk resolves 404/403 up front; the
+    writes themselves still carry the ownership filter.
+    """
+    owner_filter = visibility_filter(user_id, role)
+    results = []
+    for offset, chunk in _chunks(items, chunk_size):
+        parsed = {}
+        for i, (raw_id, _) in enumerate(chunk):
+            if ObjectId.is_valid(raw_id):
+                parsed[i] = ObjectId(raw_id)
+            else:
+                results.append(_bulk_result(operation, offset + i, status.HTTP_400_BAD_REQUEST, raw_id, "Invalid document ID"))
+
+        found = {}
+        if parsed:
+            cursor = doc_collection.find({"_id": {"$in": list(parsed.values())}}, {"owner_id": 1})
+            found = {doc["_id"]: doc.get("owner_id") for doc in await cursor.to_list(length=len(parsed))}
+
+        requests, positions = [], []
+        for i, obj_id in parsed.items():
+            if obj_id not in found:
+                results.append(_bulk_result(operation, offset + i, status.HTTP_404_NOT_FOUND, obj_id, "Document not found"))
+            elif owner_filter and found[obj_id] != owner_filter["owner_id"]:
+                results.append(_bulk_result(operation, offset + i, status.HTTP_403_FORBIDDEN, obj_id, "Unauthorized"))
+            else:
+                update = chunk[i][1]
+                query = {"_id": obj_id, **owner_filter}
+                requests.append(UpdateOne(query, {"$set": update, "$inc": {"version": 1}}) if update is not None else DeleteOne(query))
+                positions.append((i, obj_id))
+
+        failed = {}
+        if requests:
+            try:
+                await doc_collection.bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                failed = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+            finally:
+                # After the write, so a concurrent read can't re-cache the old version; also after a
+                # failure, since an unordered bulk may have applied part of the chunk
+                for _, obj_id in positions:
+                    _invalidate_cached(obj_id)
+        for request_index, (i, obj_id) in enumerate(positions):
+            if request_index in failed:
+                results.append(_bulk_result(
+                    operation, offset + i, status.HTTP_500_INTERNAL_SERVER_ERROR, obj_id, failed[request_index]
+                ))
+            else:
+                results.append(_bulk_result(operation, offset + i, status.HTTP_200_OK, obj_id))
+    results.sort(key=lambda result: result["index"])
+    return results
+
+async def bulk_write_documents(
+    request: DocumentBulkRequest,
+    user_id: str,
+    role: Union[UserRole, str],
+    chunk_size: int = settings.BULK_CHUNK_SIZE,
+) -> dict:
+    """
+    Applies a batch of creates, updates and deletes.
+
+    Creates go through unordered `insert_many`, updates and deletes through
+    unordered `bulk_write`, each in chunks of `chunk_size`. A failing item
+    never aborts the others; every item gets its own result entry.
+    """
+    db = await get_db()
+    doc_collection = db[settings.DOCUMENT_COLLECTION]
+
+    try:
+        owner_id = ObjectId(user_id)
+    except errors.InvalidId:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user ID")
+
+    now = datetime.utcnow()
+    updates = [
+        (item.id, {
+            "title": item.title,
+            "content": item.content,
+            "updated_at": now,
+            "content_digest": content_digest(item.content),
+        })
+        for item in request.update
+    ]
+    deletes = [(doc_id, None) for doc_id in request.delete]
+
+    results = await _bulk_insert(doc_collection, request.create, owner_id, chunk_size)
+    results += await _bulk_modify(doc_collection, "update", updates, user_id, role, chunk_size)
+    results += await _bulk_modify(doc_collection, "delete", deletes, user_id, role, chunk_size)
+
+    return {
+        "created": sum(1 for r in results if r["operation"] == "create" and r["status"] == status.HTTP_201_CREATED),
+        "updated": sum(1 for r in results if r["operation"] == "update" and r["status"] == status.HTTP_200_OK),
+        "deleted": sum(1 for r in results if r["operation"] == "delete" and r["status"] == status.HTTP_200_OK),
+        "results": results,
+    }
@@ -1,91 +1,355 @@
-from fastapi import BackgroundTasks
-from typing import Union
-from app.models.ingestion import IngestionRequest, IngestionResponse
-from app.db.mongodb import get_db
-from datetime import datetime
+import asyncio
+import json
 import uuid
+from typing import AsyncIterator, Optional, Union
+
+from bson import ObjectId, errors
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+
+from app.models.ingestion import (
+    IngestionRequest,
+    IngestionResponse,
+    IngestionBatchRequest,
+    IngestionBatchResponse,
+    IngestionStatus,
+    IngestionBatchStatus,
+    IngestionDeadLetterPage,
+)
+from app.models.user import UserRole
+from app.db.mongodb import get_db
+from app.services.document_service import visibility_filter
+from app.ingestion.queue import (
+    IngestionQueue,
+    new_job,
+    INGESTION_STATUS_PENDING,
+    INGESTION_STATUS_PROCESSING,
+    INGESTION_STATUS_COMPLETED,
+    INGESTION_STATUS_FAILED,
+    INGESTION_STATUS_SKIPPED,
+)
+from app.ingestion.admission import IngestionAdmission
+from app.ingestion.events import IngestionEventBus, batch_key, job_key
 from app.core.logger import get_logger
 from app.core.config import settings
+from app.core.metrics import register_metrics
+from app.core.pagination import DEFAULT_PAGE_SIZE, apply_keyset, encode_cursor
 
 logger = get_logger()
 
-# Ingestion statuses as constants or could be an Enum if you prefer
-INGESTION_STATUS_PENDING = "pending"
-INGESTION_STATUS_PROCESSING = "processing"
-INGESTION_STATUS_COMPLETED = "completed"
-INGESTION_STATUS_FAILED = "failed"
+ingestion_admission = IngestionAdmission(
+    max_pending=settings.INGESTION_MAX_PENDING_JOBS,
+    max_pending_per_user=settings.INGESTION_MAX_PENDING_PER_USER,
+    retry_after_seconds=settings.INGESTION_RETRY_AFTER_SECONDS,
+)
+register_metrics("ingestion_admission", ingestion_admission.stats)
 
+# Enough of a document to tell whether its current content was already ingested
+DIGEST_PROJECTION = {"content_digest": 1, "ingested_digest": 1}
 
-async def trigger_ingestion(
-    request: IngestionRequest,
-    user_id: str,
-    background_tasks: BackgroundTasks
-) -> IngestionResponse:
+
+def is_unchanged(doc: dict) -> bool:
     """
-    Initiates an ingestion process by creating a record and scheduling the worker.
+    True if the document's current content is the content it was last
+    ingested with. Documents written before digests were stored never are.
     """
-    db = await anext(get_db())
+    return doc.get("content_digest") is not None and doc.get("ingested_digest") == doc["content_digest"]
+
+
+# Status events relayed from the workers, fanned out to SSE watchers in this process
+ingestion_events = IngestionEventBus()
+register_metrics("ingestion_events", ingestion_events.stats)
+
+TERMINAL_STATUSES = {INGESTION_STATUS_COMPLETED, INGESTION_STATUS_FAILED, INGESTION_STATUS_SKIPPED}
+SSE_KEEPALIVE = ": keep-alive\n\n"
+
+
+async def trigger_ingestion(request: IngestionRequest, user_id: str, role: Union[UserRole, str]) -> IngestionResponse:
+    """
+    Queues an ingestion job. Jobs are picked up by ingestion worker processes
+    (`python -m app.ingestion.worker`), not by the API process. Raises 503/429
+    when the queue or the user's share of it is full.
+
+    Unless `force` is set, a document whose content hasn't changed since its
+    last ingestion isn't queued: its job is recorded as skipped right away.
+    Only documents the user may see are checked, so the shortcut never tells
+    whether someone else's document exists or was ingested.
+    """
+    db = await get_db()
     ingestion_collection = db[settings.INGESTION_COLLECTION]
 
-    ingestion_id = str(uuid.uuid4())
-    ingestion_record = {
-        "ingestion_id": ingestion_id,
-        "user_id": user_id,
-        "document_id": request.document_id,
-        "status": INGESTION_STATUS_PENDING,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow(),
-    }
+    if not request.force and ObjectId.is_valid(request.document_id):
+        doc = await db[settings.DOCUMENT_COLLECTION].find_one(
+            {"_id": ObjectId(request.document_id), **visibility_filter(user_id, role)}, DIGEST_PROJECTION
+        )
+        if doc is not None and is_unchanged(doc):
+            job = new_job(user_id, request.document_id, status=INGESTION_STATUS_SKIPPED)
+            await ingestion_collection.insert_one(job)
+            logger.info(f"Ingestion record created: {job['ingestion_id']} (skipped, content unchanged)")
+            return IngestionResponse(
+                ingestion_id=job["ingestion_id"],
+                status=INGESTION_STATUS_SKIPPED,
+                message="Document unchanged since its last ingestion."
+            )
 
-    await ingestion_collection.insert_one(ingestion_record)
-    logger.info(f"Ingestion record created: {ingestion_id}")
+    await ingestion_admission.admit(ingestion_collection, user_id)
 
-    background_tasks.add_task(run_ingestion_worker, ingestion_id)
+    queue = IngestionQueue(ingestion_collection, lease_seconds=settings.INGESTION_LEASE_SECONDS)
+    job = await queue.enqueue(user_id, request.document_id, force=request.force)
+    logger.info(f"Ingestion record created: {job['ingestion_id']}")
 
     return IngestionResponse(
-        ingestion_id=ingestion_id,
+        ingestion_id=job["ingestion_id"],
+        status=INGESTION_STATUS_PENDING,
+        message="Ingestion queued."
+    )
+
+
+async def trigger_ingestion_batch(
+    request: IngestionBatchRequest,
+    user_id: str,
+    role: Union[UserRole, str],
+    chunk_size: int = settings.BULK_CHUNK_SIZE,
+) -> IngestionBatchResponse:
+    """
+    Queues one ingestion job per document, for a list of IDs or for every
+    document of an owner. Existence and visibility are checked with a single
+    query, and the jobs are inserted with unordered `insert_many` in chunks of
+    `chunk_size`. All jobs share a batch id that identifies the group.
+
+    Unless `force` is set, documents whose content hasn't changed since their
+    last ingestion get a skipped job instead of a queued one, so re-indexing
+    mostly unchanged documents costs little more than the lookup.
+    """
+    db = await get_db()
+    ingestion_collection = db[settings.INGESTION_COLLECTION]
+    doc_collection = db[settings.DOCUMENT_COLLECTION]
+    visible = visibility_filter(user_id, role)
+
+    requested = []
+    if request.document_ids is not None:
+        requested = list(dict.fromkeys(request.document_ids))
+        object_ids = [ObjectId(doc_id) for doc_id in requested if ObjectId.is_valid(doc_id)]
+        query = {"_id": {"$in": object_ids}, **visible}
+    else:
+        try:
+            owner_id = ObjectId(request.owner_id)
+        except errors.InvalidId:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid owner ID")
+        if visible and visible["owner_id"] != owner_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to ingest these documents")
+        query = {"owner_id": owner_id}
+
+    found = await doc_collection.find(query, {"_id": 1, **DIGEST_PROJECTION}).to_list(length=None)
+    found_ids = {str(doc["_id"]) for doc in found}
+    missing = [doc_id for doc_id in requested if doc_id not in found_ids]
+    document_ids, unchanged_ids = [], []
+    for doc in found:
+        (unchanged_ids if not request.force and is_unchanged(doc) else document_ids).append(str(doc["_id"]))
+
+    # Skipped jobs never wait in the queue, so only the queued ones count against its limits
+    await ingestion_admission.admit(ingestion_collection, user_id, requested=len(document_ids))
+
+    batch_id = str(uuid.uuid4())
+    queue = IngestionQueue(ingestion_collection, lease_seconds=settings.INGESTION_LEASE_SECONDS)
+    jobs = [new_job(user_id, doc_id, batch_id=batch_id, force=request.force) for doc_id in document_ids]
+    jobs += [new_job(user_id, doc_id, batch_id=batch_id, status=INGESTION_STATUS_SKIPPED) for doc_id in unchanged_ids]
+    for offset in range(0, len(jobs), chunk_size):
+        await queue.enqueue_many(jobs[offset:offset + chunk_size])
+    logger.info(
+        f"Ingestion batch {batch_id} queued {len(document_ids)} jobs, skipped {len(unchanged_ids)} unchanged, "
+        f"{len(missing)} documents missing"
+    )
+
+    return IngestionBatchResponse(
+        batch_id=batch_id,
         status=INGESTION_STATUS_PENDING,
-        message="Ingestion started in background."
+        queued=len(document_ids),
+        skipped=len(unchanged_ids),
+        missing=missing,
     )
 
 
-async def run_ingestion_worker(ingestion_id: str) -> None:
+def _owner_filter(user_id: str, role: Union[UserRole, str]) -> dict:
     """
-    Worker function that processes the document ingestion asynchronously.
+    Admins see every job, everyone else only the jobs they triggered.
     """
-    # Import here to avoid circular imports if any
-    from app.ingestion.worker import process_document
+    role = UserRole(role) if isinstance(role, str) else role
+    return {} if role == UserRole.admin else {"user_id": user_id}
+
+
+async def get_ingestion_status(ingestion_id: str, user_id: str, role: Union[UserRole, str]) -> IngestionStatus:
+    db = await get_db()
+    job = await db[settings.INGESTION_COLLECTION].find_one(
+        {"ingestion_id": ingestion_id, **_owner_filter(user_id, role)}, {"_id": 0}
+    )
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ingestion job not found")
+    return IngestionStatus(**job)
 
-    db = await anext(get_db())
+
+async def get_batch_status(batch_id: str, user_id: str, role: Union[UserRole, str]) -> IngestionBatchStatus:
+    db = await get_db()
+    pipeline = [
+        {"$match": {"batch_id": batch_id, **_owner_filter(user_id, role)}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+    ]
+    groups = await db[settings.INGESTION_COLLECTION].aggregate(pipeline).to_list(length=None)
+    if not groups:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ingestion batch not found")
+    counts = {group["_id"]: group["count"] for group in groups}
+    return IngestionBatchStatus(batch_id=batch_id, total=sum(counts.values()), counts=counts)
+
+
+async def list_dead_letters(
+    user_id: str,
+    role: Union[UserRole, str],
+    limit: int = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+) -> IngestionDeadLetterPage:
+    """
+    One page of the dead-lettered jobs visible to the caller, most recently
+    dead-lettered first, using keyset pagination on `_id`.
+    """
+    db = await get_db()
+    cursor = (
+        db[settings.INGESTION_DEAD_LETTER_COLLECTION]
+        .find(apply_keyset(_owner_filter(user_id, role), after))
+        .sort("_id", -1)
+        .limit(limit + 1)
+    )
+    entries = await cursor.to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(entries[-1]["_id"])
+    return IngestionDeadLetterPage(items=entries, next_cursor=next_cursor)
+
+
+async def redrive_dead_letter(ingestion_id: str, user_id: str, role: Union[UserRole, str]) -> IngestionResponse:
+    """
+    Queues a dead-lettered job again with a fresh set of attempts. Subject to
+    the same admission control as a new trigger by the job's owner.
+    """
+    db = await get_db()
     ingestion_collection = db[settings.INGESTION_COLLECTION]
+    dead_letters = db[settings.INGESTION_DEAD_LETTER_COLLECTION]
+    entry = await dead_letters.find_one({"ingestion_id": ingestion_id, **_owner_filter(user_id, role)}, {"user_id": 1})
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dead-lettered ingestion job not found")
 
-    # Update status to processing
-    await ingestion_collection.update_one(
-        {"ingestion_id": ingestion_id},
-        {"$set": {"status": INGESTION_STATUS_PROCESSING, "updated_at": datetime.utcnow()}}
+    # Charged only once the job is queued again: a redrive that conflicts adds nothing to the queue
+    await ingestion_admission.admit(ingestion_collection, entry["user_id"], charge=False)
+    queue = IngestionQueue(
+        ingestion_collection, lease_seconds=settings.INGESTION_LEASE_SECONDS, dead_letter_collection=dead_letters
     )
-    logger.info(f"Ingestion {ingestion_id} status updated to processing")
+    if not await queue.redrive(ingestion_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Ingestion job is no longer failed")
+    ingestion_admission.charge()
+    logger.info(f"Ingestion {ingestion_id} re-driven from the dead-letter collection")
 
+    return IngestionResponse(
+        ingestion_id=ingestion_id,
+        status=INGESTION_STATUS_PENDING,
+        message="Ingestion re-queued."
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    data = {key: value for key, value in data.items() if key != "_id"}
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+async def _next_event(queue: asyncio.Queue, keepalive_seconds: float):
+    """
+    The next relayed event, or None if nothing arrived within `keepalive_seconds`.
+    """
     try:
-        await process_document(ingestion_id)
-    except Exception as e:
-        # Log error and update status to failed with error message
-        logger.error(f"Ingestion {ingestion_id} failed: {str(e)}", exc_info=True)
-        await ingestion_collection.update_one(
-            {"ingestion_id": ingestion_id},
-            {
-                "$set": {
-                    "status": INGESTION_STATUS_FAILED,
-                    "error": str(e),
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
-        return
+        return await asyncio.wait_for(queue.get(), timeout=keepalive_seconds)
+    except asyncio.TimeoutError:
+        return None
 
-    # Update status to completed
-    await ingestion_collection.update_one(
-        {"ingestion_id": ingestion_id},
-        {"$set": {"status": INGESTION_STATUS_COMPLETED, "updated_at": datetime.utcnow()}}
-    )
-    logger.info(f"Ingestion {ingestion_id} completed successfully")
+
+async def open_job_events(
+    ingestion_id: str,
+    user_id: str,
+    role: Union[UserRole, str],
+    keepalive_seconds: float = settings.INGESTION_SSE_KEEPALIVE_SECONDS,
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events stream of one job's status: the current status first,
+    then every transition published by the workers, ending after a terminal
+    status. Raises 404 before streaming if the job isn't visible to the caller.
+    """
+    key = job_key(ingestion_id)
+    # Subscribe before reading the current status so no transition falls in between
+    queue = ingestion_events.subscribe(key)
+    try:
+        job = await get_ingestion_status(ingestion_id, user_id, role)
+    except Exception:
+        ingestion_events.unsubscribe(key, queue)
+        raise
+
+    async def stream():
+        try:
+            yield _sse("status", job.dict())
+            current = job.status
+            while current not in TERMINAL_STATUSES:
+                event = await _next_event(queue, keepalive_seconds)
+                if event is None:
+                    yield SSE_KEEPALIVE
+                    continue
+                current = event["status"]
+                yield _sse("status", event)
+        finally:
+            ingestion_events.unsubscribe(key, queue)
+
+    return stream()
+
+
+async def open_batch_events(
+    batch_id: str,
+    user_id: str,
+    role: Union[UserRole, str],
+    keepalive_seconds: float = settings.INGESTION_SSE_KEEPALIVE_SECONDS,
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events stream of a batch: a `status` event for every job
+    transition and a `progress` event whenever a job finishes, ending once
+    every job of the batch has finished.
+    """
+    key = batch_key(batch_id)
+    queue = ingestion_events.subscribe(key)
+    try:
+        db = await get_db()
+        jobs = await db[settings.INGESTION_COLLECTION].find(
+            {"batch_id": batch_id, **_owner_filter(user_id, role)}, {"_id": 0, "ingestion_id": 1, "status": 1}
+        ).to_list(length=None)
+        if not jobs:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ingestion batch not found")
+    except Exception:
+        ingestion_events.unsubscribe(key, queue)
+        raise
+
+    remaining = {job["ingestion_id"] for job in jobs if job["status"] not in TERMINAL_STATUSES}
+
+    def progress() -> str:
+        return _sse("progress", {"batch_id": batch_id, "total": len(jobs), "remaining": len(remaining)})
+
+    async def stream():
+        try:
+            yield progress()
+            while remaining:
+                event = await _next_event(queue, keepalive_seconds)
+                if event is None:
+                    yield SSE_KEEPALIVE
+                    continue
+                yield _sse("status", event)
+                if event["status"] in TERMINAL_STATUSES and event["ingestion_id"] in remaining:
+                    remaining.discard(event["ingestion_id"])
+                    yield progress()
+        finally:
+            ingestion_events.unsubscribe(key, queue)
+
+    return stream()
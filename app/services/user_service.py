@@ -1,18 +1,39 @@
 from fastapi import HTTPException, status
-from app.models.user import UserCreate, UserInDB, TokenData
+from app.models.user import UserCreate, UserInDB, TokenData, UserRole
 from app.db.mongodb import get_db
-from app.core.auth import hash_password, verify_password, create_access_token
+from app.core.auth import hash_password_async, verify_and_update_password_async, create_access_token
 from bson.objectid import ObjectId
 from app.core.logger import get_logger
-from typing import List, Optional
+from typing import Dict, List, Optional
 from app.core.config import settings
+from app.core.cache import LRUCache
+from app.core.metrics import register_metrics
+from app.core.loader import BatchLoader
+from app.core.pagination import DEFAULT_PAGE_SIZE, apply_keyset, encode_cursor
 
 logger = get_logger()
 
+# Fields returned to clients; hashed_password is never read from the database
+USER_PROJECTION = {"email": 1, "full_name": 1, "role": 1}
+
+# Recent user counts per role filter, so the listing never counts on every page
+user_count_cache = LRUCache(max_size=64, ttl_seconds=settings.USER_COUNT_CACHE_TTL_SECONDS)
+register_metrics("user_count_cache", user_count_cache.stats)
+
+
+def user_helper(user: dict) -> dict:
+    return {
+        "id": str(user["_id"]),
+        "email": user["email"],
+        "full_name": user.get("full_name"),
+        "role": user["role"],
+    }
+
+
 async def register_user(user: UserCreate) -> dict:
     try:
         logger.info(f"Trying to register user: {user.email}")
-        db = await anext(get_db())
+        db = await get_db()
         user_collection = db[settings.USER_COLLECTION]
 
         existing_user = await user_collection.find_one({"email": user.email})
@@ -20,13 +41,15 @@ async def register_user(user: UserCreate) -> dict:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
         user_dict = user.dict()
-        user_dict["hashed_password"] = hash_password(user.password)
+        user_dict["hashed_password"] = await hash_password_async(user.password)
         del user_dict["password"]
 
         result = await user_collection.insert_one(user_dict)
         logger.info(f"User successfully registered with id: {result.inserted_id}")
 
         return {"id": str(result.inserted_id), "email": user.email, "role": user.role.value}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in registration: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -34,11 +57,18 @@ async def register_user(user: UserCreate) -> dict:
 
 async def authenticate_user(email: str, password: str) -> dict:
     try:
-        db = await anext(get_db())
+        db = await get_db()
         user_collection = db[settings.USER_COLLECTION]
         user = await user_collection.find_one({"email": email})
-        if not user or not verify_password(password, user.get("hashed_password")):
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
+        valid, new_hash = await verify_and_update_password_async(password, user.get("hashed_password"))
+        if not valid:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
+        if new_hash:
+            # The stored hash predates the current cost policy; upgrade it while we have the password
+            await user_collection.update_one({"_id": user["_id"]}, {"$set": {"hashed_password": new_hash}})
+            logger.info(f"Re-hashed password for user {user['_id']} with the current policy")
 
         token_data = {"sub": str(user["_id"]), "role": user["role"]}
         token = create_access_token(token_data)
@@ -50,30 +80,75 @@ async def authenticate_user(email: str, password: str) -> dict:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
 
-async def get_all_users() -> List[UserInDB]:
-    db = await anext(get_db())
+async def count_users(user_collection, role: Optional[UserRole] = None) -> int:
+    """
+    Number of users, optionally for one role, cached for a short while.
+
+    Without a filter this is the collection's metadata count; with a role it
+    is counted on the (role, _id) index.
+    """
+    key = role.value if role else "*"
+    total = user_count_cache.get(key)
+    if total is None:
+        if role:
+            total = await user_collection.count_documents({"role": role.value})
+        else:
+            total = await user_collection.estimated_document_count()
+        user_count_cache.set(key, total)
+    return total
+
+
+async def get_all_users(
+    limit: int = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+    role: Optional[UserRole] = None,
+) -> dict:
+    """
+    Returns one page of users, newest first, optionally filtered by role.
+    """
+    db = await get_db()
     user_collection = db[settings.USER_COLLECTION]
-    users_cursor = user_collection.find({})
-    users = await users_cursor.to_list(length=10)  # limit to 10 max or implement pagination
-    
-    result = []
-    for user in users:
-        user['id'] = str(user['_id'])
-        del user['_id']
-        result.append(UserInDB(**user))
-    return result
 
+    query = {"role": role.value} if role else {}
+    cursor = user_collection.find(apply_keyset(query, after), USER_PROJECTION).sort("_id", -1).limit(limit + 1)
+    users = await cursor.to_list(length=limit + 1)
 
-async def get_user_by_id(user_id: str) -> Optional[UserInDB]:
-    db = await anext(get_db())
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1]["_id"])
+
+    return {
+        "items": [user_helper(user) for user in users],
+        "next_cursor": next_cursor,
+        "total": await count_users(user_collection, role),
+    }
+
+
+async def get_users_by_ids(user_ids: List[str]) -> Dict[str, dict]:
+    """
+    Looks up many users with a single `$in` query. Returns a mapping of id to
+    user for the ids that exist; invalid and unknown ids are simply absent.
+    """
+    object_ids = list({ObjectId(user_id) for user_id in user_ids if ObjectId.is_valid(user_id)})
+    if not object_ids:
+        return {}
+
+    db = await get_db()
     user_collection = db[settings.USER_COLLECTION]
+    cursor = user_collection.find({"_id": {"$in": object_ids}}, USER_PROJECTION)
+    users = await cursor.to_list(length=len(object_ids))
+    return {str(user["_id"]): user_helper(user) for user in users}
 
+
+# Concurrent get_user_by_id calls in the same event-loop tick share one query
+user_loader = BatchLoader(get_users_by_ids, max_batch_size=settings.USER_BATCH_MAX_IDS)
+register_metrics("user_loader", user_loader.stats)
+
+
+async def get_user_by_id(user_id: str) -> Optional[UserInDB]:
     if not ObjectId.is_valid(user_id):
         return None
 
-    user = await user_collection.find_one({"_id": ObjectId(user_id)})
-    if user:
-        user['id'] = str(user['_id'])
-        del user['_id']
-        return UserInDB(**user)
-    return None
+    user = await user_loader.load(user_id)
+    return UserInDB(**user) if user else None
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import pytest
+from datetime import timedelta
+from fastapi import HTTPException
+
+from app.core import auth
+from app.core.auth import (
+    create_access_token,
+    decode_access_token,
+    token_cache,
+    hash_password_async,
+    verify_password_async,
+    verify_and_update_password_async,
+)
+from app.core.hashing import HashingPool, calibrate_bcrypt_rounds
+from app.core.security import get_current_user
+from tests.constants import TEST_USER_ID, TEST_USER_ROLE
+
+
+@pytest.fixture(autouse=True)
+def empty_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+def test_verified_token_is_cached(mocker):
+    token = create_access_token({"sub": TEST_USER_ID, "role": TEST_USER_ROLE})
+    jwt_decode = mocker.spy(auth.jwt, "decode")
+
+    first = decode_access_token(token)
+    second = decode_access_token(token)
+
+    assert first.sub == TEST_USER_ID
+    assert second is first
+    assert jwt_decode.call_count == 1
+    assert token_cache.stats()["hits"] == 1
+
+
+def test_token_cache_can_be_disabled(mocker, monkeypatch):
+    monkeypatch.setattr(auth.settings, "TOKEN_CACHE_ENABLED", False)
+    token = create_access_token({"sub": TEST_USER_ID, "role": TEST_USER_ROLE})
+    jwt_decode = mocker.spy(auth.jwt, "decode")
+
+    decode_access_token(token)
+    decode_access_token(token)
+
+    assert jwt_decode.call_count == 2
+    assert len(token_cache) == 0
+
+
+def test_invalid_and_expired_tokens_are_rejected_and_not_cached():
+    expired = create_access_token({"sub": TEST_USER_ID, "role": TEST_USER_ROLE}, expires_delta=timedelta(seconds=-1))
+    missing_role = create_access_token({"sub": TEST_USER_ID})
+
+    assert decode_access_token("not-a-jwt") is None
+    assert decode_access_token(expired) is None
+    assert decode_access_token(missing_role) is None
+    assert len(token_cache) == 0
+
+
+def test_token_cache_entry_expires_with_token():
+    token = create_access_token({"sub": TEST_USER_ID, "role": TEST_USER_ROLE}, expires_delta=timedelta(seconds=30))
+    decode_access_token(token)
+
+    _, _, expires_at = next(iter(token_cache._entries.values()))
+    assert 0 < expires_at - token_cache._clock() <= 30
+
+
+def test_get_current_user_rejects_invalid_token():
+    with pytest.raises(HTTPException) as exc_info:
+        get_current_user("not-a-jwt")
+    assert exc_info.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_hashing_pool_runs_off_the_event_loop():
+    pool = HashingPool(max_workers=1, max_queue=0)
+    main_thread = threading.get_ident()
+
+    worker_thread = await pool.run(threading.get_ident)
+
+    assert worker_thread != main_thread
+    assert pool.stats()["completed"] == 1
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hashing_pool_rejects_when_saturated():
+    pool = HashingPool(max_workers=1, max_queue=1, retry_after_seconds=2)
+    release = threading.Event()
+    running = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await pool.run(release.wait)
+
+    release.set()
+    await asyncio.gather(*running)
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "2"
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["pending"] == 0
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_async_password_helpers_round_trip():
+    hashed = await hash_password_async("password123")
+    assert await verify_password_async("password123", hashed)
+    assert not await verify_password_async("wrong-password", hashed)
+
+
+def test_calibrate_bcrypt_rounds_fits_budget():
+    timings = {10: 0.06, 11: 0.12, 12: 0.24, 13: 0.48}
+
+    assert calibrate_bcrypt_rounds(250, 10, 13, measure=timings.__getitem__) == 12
+    assert calibrate_bcrypt_rounds(10, 10, 13, measure=timings.__getitem__) == 10
+    assert calibrate_bcrypt_rounds(1000, 10, 13, measure=timings.__getitem__) == 13
+
+
+@pytest.mark.asyncio
+async def test_weaker_hashes_are_upgraded_on_verify():
+    original = dict(auth.password_policy)
+    weak_hash = auth.pwd_context.hash("password123", rounds=4)
+    try:
+        auth.apply_password_policy(5, "test")
+        valid, new_hash = await verify_and_update_password_async("password123", weak_hash)
+        assert valid
+        assert new_hash.startswith("$2b$05$")
+
+        strong_hash = auth.pwd_context.hash("password123", rounds=6)
+        valid, new_hash = await verify_and_update_password_async("password123", strong_hash)
+        assert valid and new_hash is None
+        assert auth.password_policy["rounds"] == 5
+    finally:
+        auth.pwd_context.update(bcrypt__rounds=12, bcrypt__min_rounds=4, bcrypt__max_rounds=31)
+        auth.password_policy.update(original)
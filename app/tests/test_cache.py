@@ -0,0 +1,77 @@
+from app.core.cache import LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_hit_and_miss_counters():
+    cache = LRUCache(max_size=100, ttl_seconds=10)
+    assert cache.get("a") is None
+    cache.set("a", "value", size=5)
+    assert cache.get("a") == "value"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_evicts_least_recently_used_by_size():
+    cache = LRUCache(max_size=10, ttl_seconds=10)
+    cache.set("a", 1, size=4)
+    cache.set("b", 2, size=4)
+    cache.get("a")
+    cache.set("c", 3, size=4)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["size"] == 8
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_skips_oversized_values():
+    cache = LRUCache(max_size=10, ttl_seconds=10)
+    cache.set("a", 1, size=4)
+    cache.set("big", 2, size=11)
+
+    assert cache.get("big") is None
+    assert cache.get("a") == 1
+
+
+def test_cache_entries_expire():
+    clock = FakeClock()
+    cache = LRUCache(max_size=10, ttl_seconds=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_invalidate():
+    cache = LRUCache(max_size=10, ttl_seconds=5)
+    cache.set("a", 1, size=3)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_cache_drops_fill_invalidated_while_in_flight():
+    cache = LRUCache(max_size=10, ttl_seconds=5)
+    stale = cache.begin_fill("a")
+    cache.invalidate("a")
+    fresh = cache.begin_fill("a")
+    cache.set("a", "old", generation=stale)
+    cache.end_fill("a")
+    assert cache.get("a") is None
+
+    cache.set("a", "new", generation=fresh)
+    cache.end_fill("a")
+    assert cache.get("a") == "new"
+    assert cache.stats()["stale_fills"] == 1
+    assert cache._fills == {}
@@ -0,0 +1,115 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from httpx import AsyncClient, ASGITransport
+
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+
+LARGE_TEXT = "This document contains HR guidelines. " * 200
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=500, encodings=["gzip"])
+
+
+@app.get("/large")
+def large():
+    return PlainTextResponse(LARGE_TEXT, headers={"ETag": '"doc-1"'})
+
+
+@app.get("/small")
+def small():
+    return PlainTextResponse("short")
+
+
+@app.get("/binary")
+def binary():
+    return Response(LARGE_TEXT.encode(), media_type="application/octet-stream")
+
+
+@app.get("/not-modified")
+def not_modified():
+    return Response(status_code=304, headers={"ETag": '"doc-1"'})
+
+
+@app.get("/events")
+def events():
+    def stream():
+        yield "event: status\ndata: {}\n\n" * 100
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.get("/stream")
+def stream():
+    def lines():
+        for i in range(3):
+            yield f'{{"line": {i}}}\n'
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+transport = ASGITransport(app=app)
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, br", ["zstd", "br", "gzip"]) == "br"
+    assert negotiate_encoding("br;q=0, gzip;q=0.5", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("*", ["gzip"]) == "gzip"
+    assert negotiate_encoding("identity", ["gzip"]) is None
+    assert negotiate_encoding("", ["gzip"]) is None
+
+
+@pytest.mark.asyncio
+async def test_large_response_is_compressed():
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.headers["etag"] == 'W/"doc-1"'
+    assert int(response.headers["content-length"]) < len(LARGE_TEXT)
+    assert response.text == LARGE_TEXT
+
+
+@pytest.mark.asyncio
+async def test_small_and_disallowed_responses_are_not_compressed():
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        small_response = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        binary_response = await client.get("/binary", headers={"Accept-Encoding": "gzip"})
+        identity_response = await client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in small_response.headers
+    assert "content-encoding" not in binary_response.headers
+    assert "content-encoding" not in identity_response.headers
+    assert identity_response.headers["etag"] == '"doc-1"'
+
+
+@pytest.mark.asyncio
+async def test_not_modified_carries_the_same_validator_as_the_compressed_response():
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/not-modified", headers={"Accept-Encoding": "gzip"})
+        identity_response = await client.get("/not-modified", headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == 'W/"doc-1"'
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert identity_response.headers["etag"] == '"doc-1"'
+
+
+@pytest.mark.asyncio
+async def test_event_streams_are_not_compressed():
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/events", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.text.startswith("event: status")
+
+
+@pytest.mark.asyncio
+async def test_streaming_response_is_compressed():
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.splitlines() == [
+        '{"line": 0}', '{"line": 1}', '{"line": 2}'
+    ]
@@ -1,9 +1,30 @@
 import pytest
-from unittest.mock import patch, AsyncMock
+import json
+from unittest.mock import patch, AsyncMock, MagicMock
+from bson import ObjectId
+from fastapi import HTTPException
 from httpx import AsyncClient, ASGITransport
 from app.main import app
 from app.core.security import get_current_user
-from app.models.document import DocumentInDB
+from app.core.pagination import encode_cursor, decode_cursor, apply_keyset
+from app.models.document import DocumentInDB, DocumentPage, DocumentSummary
+from app.services.document_service import (
+    export_documents,
+    build_projection,
+    create_document,
+    update_document,
+    delete_document,
+    bulk_write_documents,
+    search_documents,
+    get_document,
+    document_cache,
+    get_document_etag,
+    similar_documents,
+)
+from app.core.etag import etag_matches
+from app.core.vector_index import VectorIndexStore, VectorIndexWriter
+from app.ingestion.pipeline import embed_texts
+from app.models.document import DocumentCreate, DocumentBulkRequest
 
 from tests.constants import (
     API_BASE_URL,
@@ -18,7 +39,7 @@ from tests.constants import (
 def override_get_current_user():
     class FakeUser:
         def __init__(self):
-            self._id = TEST_USER_ID
+            self.sub = TEST_USER_ID
             self.role = "viewer"
     return FakeUser()
 
@@ -30,6 +51,14 @@ transport = ASGITransport(app=app)
 def test_document():
     return TEST_DOCUMENT.copy()
 
+@pytest.fixture
+def mock_doc_collection():
+    collection = MagicMock()
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = collection
+    with patch("app.services.document_service.get_db", new=AsyncMock(return_value=mock_db)):
+        yield collection
+
 @pytest.mark.asyncio
 async def test_create_document(test_document):
     doc_create = {
@@ -50,13 +79,15 @@ async def test_create_document(test_document):
 @pytest.mark.asyncio
 async def test_get_document_by_id(test_document):
     with patch("app.api.document_routes.get_document", new_callable=AsyncMock) as mock_get:
-        mock_get.return_value = DocumentInDB(**test_document)
+        mock_get.return_value = DocumentInDB(**test_document).dict()
 
         async with AsyncClient(transport=transport, base_url=API_BASE_URL) as ac:
             response = await ac.get(f"/documents/{test_document['_id']}")
 
         assert response.status_code == 200
         assert response.json()["_id"] == test_document["_id"]
+        # The client accepts gzip, so the validator is weak even though this body is too small to compress
+        assert response.headers["etag"] == f'W/"{test_document["_id"]}-0"'
 
 @pytest.mark.asyncio
 async def test_get_document_not_found():
@@ -71,14 +102,38 @@ async def test_get_document_not_found():
 @pytest.mark.asyncio
 async def test_list_all_documents(test_document):
     with patch("app.api.document_routes.get_all_documents", new_callable=AsyncMock) as mock_list:
-        mock_list.return_value = [DocumentInDB(**test_document)]
+        mock_list.return_value = {"items": [DocumentInDB(**test_document)], "next_cursor": None}
 
         async with AsyncClient(transport=transport, base_url=API_BASE_URL) as ac:
             response = await ac.get("/documents/")
 
         assert response.status_code == 200
-        assert isinstance(response.json(), list)
-        assert response.json()[0]["_id"] == test_document["_id"]
+        assert isinstance(response.json()["items"], list)
+        assert response.json()["items"][0]["_id"] == test_document["_id"]
+        assert response.json()["next_cursor"] is None
+
+@pytest.mark.asyncio
+async def test_list_documents_passes_cursor(test_document):
+    cursor = encode_cursor(ObjectId())
+    with patch("app.api.document_routes.get_all_documents", new_callable=AsyncMock) as mock_list:
+        mock_list.return_value = {"items": [DocumentInDB(**test_document)], "next_cursor": cursor}
+
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as ac:
+            response = await ac.get("/documents/", params={"limit": 1, "after": cursor})
+
+        assert response.status_code == 200
+        assert response.json()["next_cursor"] == cursor
+        mock_list.assert_awaited_once_with(TEST_USER_ID, "viewer", limit=1, after=cursor, view="full", fields=None)
+
+def test_pagination_cursor_round_trip():
+    last_id = ObjectId()
+    assert decode_cursor(encode_cursor(last_id)) == last_id
+    assert apply_keyset({"owner_id": 1}, encode_cursor(last_id)) == {"owner_id": 1, "_id": {"$lt": last_id}}
+
+def test_pagination_rejects_invalid_cursor():
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor("not-a-cursor")
+    assert exc_info.value.status_code == 400
 
 @pytest.mark.asyncio
 async def test_update_document(test_document):
@@ -106,3 +161,391 @@ async def test_delete_document(test_document):
 
         assert response.status_code == 200
         assert response.json()["message"] == "Document deleted successfully"
+
+@pytest.mark.asyncio
+async def test_export_documents_streams_ndjson(test_document):
+    async def chunks():
+        yield json.dumps(test_document) + "\n"
+        yield json.dumps({**test_document, "_id": "doc456"}) + "\n"
+
+    with patch("app.api.document_routes.export_documents", new_callable=AsyncMock) as mock_export:
+        mock_export.return_value = chunks()
+
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as ac:
+            response = await ac.get("/documents/export", params={"batch_size": 2})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = response.text.splitlines()
+        assert [json.loads(line)["_id"] for line in lines] == [TEST_DOCUMENT_ID, "doc456"]
+        mock_export.assert_awaited_once_with(TEST_USER_ID, "viewer", batch_size=2)
+
+@pytest.mark.asyncio
+async def test_export_documents_emits_one_chunk_per_batch():
+    owner_id = ObjectId(TEST_USER_ID)
+    stored = [{"_id": ObjectId(), "title": f"Doc {i}", "content": "text", "owner_id": owner_id} for i in range(5)]
+
+    class FakeCursor:
+        def sort(self, *args):
+            return self
+
+        def batch_size(self, size):
+            return self
+
+        async def __aiter__(self):
+            for doc in stored:
+                yield doc
+
+    mock_collection = MagicMock()
+    mock_collection.find.return_value = FakeCursor()
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    with patch("app.services.document_service.get_db", new=AsyncMock(return_value=mock_db)):
+        chunks = [chunk async for chunk in await export_documents(TEST_USER_ID, "viewer", batch_size=2)]
+
+    assert len(chunks) == 3
+    assert mock_collection.find.call_args[0][0] == {"owner_id": owner_id}
+    exported = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    assert [doc["_id"] for doc in exported] == [str(doc["_id"]) for doc in stored]
+    assert DocumentInDB(**exported[0]).dict(by_alias=True) == exported[0]
+
+@pytest.mark.asyncio
+async def test_list_documents_summary_view():
+    summary = {
+        "id": TEST_DOCUMENT_ID,
+        "title": "Test Document",
+        "owner_id": TEST_USER_ID,
+        "content_length": 24,
+        "preview": "This is a test document.",
+    }
+    with patch("app.api.document_routes.get_all_documents", new_callable=AsyncMock) as mock_list:
+        mock_list.return_value = {"items": [summary], "next_cursor": None}
+
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as ac:
+            response = await ac.get("/documents/", params={"view": "summary"})
+
+        assert response.status_code == 200
+        item = response.json()["items"][0]
+        assert "content" not in item
+        assert item["content_length"] == 24
+        assert mock_list.call_args.kwargs["view"] == "summary"
+
+@pytest.mark.asyncio
+async def test_list_documents_with_fields():
+    with patch("app.api.document_routes.get_all_documents", new_callable=AsyncMock) as mock_list:
+        mock_list.return_value = {"items": [{"id": TEST_DOCUMENT_ID, "title": "Test Document"}], "next_cursor": None}
+
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as ac:
+            response = await ac.get("/documents/", params={"fields": "title, updated_at"})
+
+        assert response.status_code == 200
+        assert response.json()["items"][0] == {"_id": TEST_DOCUMENT_ID, "title": "Test Document"}
+        assert mock_list.call_args.kwargs["fields"] == ["title", "updated_at"]
+
+def test_document_page_keeps_full_documents_and_computed_fields():
+    full = DocumentInDB(**TEST_DOCUMENT, version=3)
+    projected = {"id": TEST_DOCUMENT_ID, "title": "T", "content": "C", "owner_id": TEST_USER_ID, "preview": "C"}
+
+    page = DocumentPage(items=[full, projected])
+
+    assert isinstance(page.items[0], DocumentInDB) and page.items[0].version == 3
+    assert page.items[0].content == TEST_DOCUMENT["content"]
+    assert isinstance(page.items[1], DocumentSummary) and page.items[1].preview == "C"
+
+def test_build_projection():
+    assert build_projection("full") is None
+    summary = build_projection("summary")
+    assert "content" not in summary
+    assert summary["content_length"] == {"$strLenCP": "$content"}
+    assert build_projection("full", ["title"]) == {"title": 1, "version": 1}
+    with pytest.raises(HTTPException) as exc_info:
+        build_projection("full", ["title", "password"])
+    assert exc_info.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_create_document_single_round_trip(mock_doc_collection):
+    inserted_id = ObjectId()
+    mock_doc_collection.insert_one = AsyncMock(return_value=MagicMock(inserted_id=inserted_id))
+    mock_doc_collection.find_one = AsyncMock()
+
+    created = await create_document(DocumentCreate(**UPDATED_DOCUMENT_DATA), TEST_USER_ID)
+
+    assert created["id"] == str(inserted_id)
+    assert created["owner_id"] == TEST_USER_ID
+    assert created["created_at"] is not None
+    mock_doc_collection.find_one.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_update_document_filters_by_owner(mock_doc_collection):
+    doc_id = ObjectId()
+    stored = {"_id": doc_id, **UPDATED_DOCUMENT_DATA, "owner_id": ObjectId(TEST_USER_ID)}
+    mock_doc_collection.find_one_and_update = AsyncMock(return_value=stored)
+    mock_doc_collection.find_one = AsyncMock()
+
+    updated = await update_document(str(doc_id), DocumentCreate(**UPDATED_DOCUMENT_DATA), TEST_USER_ID, "viewer")
+
+    assert updated["title"] == UPDATED_DOCUMENT_DATA["title"]
+    query = mock_doc_collection.find_one_and_update.call_args[0][0]
+    assert query == {"_id": doc_id, "owner_id": ObjectId(TEST_USER_ID)}
+    mock_doc_collection.find_one.assert_not_awaited()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("exists, expected_status", [(True, 403), (False, 404)])
+async def test_update_document_not_matched(mock_doc_collection, exists, expected_status):
+    doc_id = ObjectId()
+    mock_doc_collection.find_one_and_update = AsyncMock(return_value=None)
+    mock_doc_collection.find_one = AsyncMock(return_value={"_id": doc_id} if exists else None)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await update_document(str(doc_id), DocumentCreate(**UPDATED_DOCUMENT_DATA), TEST_USER_ID, "viewer")
+    assert exc_info.value.status_code == expected_status
+
+@pytest.mark.asyncio
+async def test_delete_document_admin_skips_owner_filter(mock_doc_collection):
+    doc_id = ObjectId()
+    mock_doc_collection.delete_one = AsyncMock(return_value=MagicMock(deleted_count=1))
+
+    assert await delete_document(str(doc_id), TEST_USER_ID, "admin") is True
+    mock_doc_collection.delete_one.assert_awaited_once_with({"_id": doc_id})
+
+@pytest.mark.asyncio
+async def test_bulk_documents_route():
+    bulk_result = {
+        "created": 1,
+        "updated": 0,
+        "deleted": 0,
+        "results": [{"operation": "create", "index": 0, "id": TEST_DOCUMENT_ID, "status": 201}],
+    }
+    with patch("app.api.document_routes.bulk_write_documents", new_callable=AsyncMock) as mock_bulk:
+        mock_bulk.return_value = bulk_result
+
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as ac:
+            response = await ac.post("/documents/bulk", json={"create": [UPDATED_DOCUMENT_DATA]})
+
+        assert response.status_code == 200
+        assert response.json()["created"] == 1
+        assert response.json()["results"][0]["status"] == 201
+
+@pytest.mark.asyncio
+async def test_bulk_documents_per_item_results(mock_doc_collection):
+    own_id, other_id, missing_id = ObjectId(), ObjectId(), ObjectId()
+
+    async def insert_many(docs, ordered):
+        for doc in docs:
+            doc["_id"] = ObjectId()
+    mock_doc_collection.insert_many = AsyncMock(side_effect=insert_many)
+
+    async def lookup(length):
+        return [{"_id": own_id, "owner_id": ObjectId(TEST_USER_ID)}, {"_id": other_id, "owner_id": ObjectId()}]
+    mock_doc_collection.find.return_value.to_list = lookup
+    mock_doc_collection.bulk_write = AsyncMock()
+
+    request = DocumentBulkRequest(
+        create=[DocumentCreate(**UPDATED_DOCUMENT_DATA)] * 3,
+        update=[{"id": str(own_id), **UPDATED_DOCUMENT_DATA}, {"id": str(other_id), **UPDATED_DOCUMENT_DATA}],
+        delete=[str(missing_id), "not-an-id"],
+    )
+    result = await bulk_write_documents(request, TEST_USER_ID, "viewer", chunk_size=2)
+
+    assert (result["created"], result["updated"], result["deleted"]) == (3, 1, 0)
+    assert mock_doc_collection.insert_many.await_count == 2
+    statuses = [(r["operation"], r["status"]) for r in result["results"]]
+    assert statuses[3:] == [("update", 200), ("update", 403), ("delete", 404), ("delete", 400)]
+    mock_doc_collection.bulk_write.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_bulk_update_invalidates_cache_after_the_write(mock_doc_collection):
+    doc_id = ObjectId()
+    mock_doc_collection.find.return_value.to_list = AsyncMock(return_value=[{"_id": doc_id, "owner_id": ObjectId(TEST_USER_ID)}])
+    document_cache.clear()
+
+    async def bulk_write(requests, ordered):
+        # A read racing the write caches the version it saw
+        document_cache.set(str(doc_id), {"content": "old"})
+    mock_doc_collection.bulk_write = AsyncMock(side_effect=bulk_write)
+
+    request = DocumentBulkRequest(update=[{"id": str(doc_id), **UPDATED_DOCUMENT_DATA}])
+    await bulk_write_documents(request, TEST_USER_ID, "viewer")
+
+    assert document_cache.get(str(doc_id)) is None
+
+@pytest.mark.asyncio
+async def test_search_documents_route():
+    hit = {"id": TEST_DOCUMENT_ID, "title": "Test Document", "score": 1.5}
+    with patch("app.api.document_routes.search_documents", new_callable=AsyncMock) as mock_search:
+        mock_search.return_value = {"items": [hit], "next_offset": 20}
+
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as ac:
+            response = await ac.get("/documents/search", params={"q": "test", "limit": 20})
+
+        assert response.status_code == 200
+        assert response.json()["items"][0]["score"] == 1.5
+        assert response.json()["next_offset"] == 20
+        assert mock_search.call_args[0][2] == "test"
+
+@pytest.mark.asyncio
+async def test_search_documents_uses_text_index_and_visibility(mock_doc_collection):
+    stored = [{"_id": ObjectId(), "title": f"Doc {i}", "score": 2.0 - i} for i in range(3)]
+    cursor = mock_doc_collection.find.return_value
+    cursor.sort.return_value = cursor
+    cursor.skip.return_value = cursor
+    cursor.limit.return_value = cursor
+    cursor.to_list = AsyncMock(return_value=stored)
+
+    result = await search_documents(TEST_USER_ID, "viewer", "policy", limit=2)
+
+    query, projection = mock_doc_collection.find.call_args[0]
+    assert query == {"$text": {"$search": "policy"}, "owner_id": ObjectId(TEST_USER_ID)}
+    assert projection["score"] == {"$meta": "textScore"}
+    assert "content" not in projection
+    assert [item["title"] for item in result["items"]] == ["Doc 0", "Doc 1"]
+    assert result["next_offset"] == 2
+
+@pytest.mark.asyncio
+async def test_similar_documents_route():
+    hit = {"id": TEST_DOCUMENT_ID, "title": "Test Document", "score": 0.82, "chunk_index": 3}
+    with patch("app.api.document_routes.similar_documents", new_callable=AsyncMock) as mock_similar:
+        mock_similar.return_value = {"items": [hit]}
+
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as ac:
+            response = await ac.get("/documents/similar", params={"q": "leave policy", "limit": 5})
+
+        assert response.status_code == 200
+        assert response.json()["items"][0]["chunk_index"] == 3
+        assert mock_similar.call_args[0][2] == "leave policy"
+        assert mock_similar.call_args[1]["limit"] == 5
+
+@pytest.mark.asyncio
+async def test_similar_documents_searches_own_chunks_and_ranks_by_best_chunk(mock_doc_collection, tmp_path, monkeypatch):
+    mine, other, theirs = ObjectId(), ObjectId(), ObjectId()
+    texts = {
+        (mine, 0): "annual leave policy for employees",
+        (mine, 1): "quarterly sales figures",
+        (other, 0): "office parking rules",
+        (theirs, 0): "annual leave policy for contractors",
+    }
+    owners = {mine: TEST_USER_ID, other: TEST_USER_ID, theirs: str(ObjectId())}
+    writer = VectorIndexWriter(str(tmp_path), dims=128)
+    for (doc_id, index), text in sorted(texts.items(), key=lambda item: owners[item[0][0]]):
+        writer.add(str(doc_id), index, owners[doc_id], embed_texts([text], 128)[0].tobytes())
+    writer.commit()
+    monkeypatch.setattr("app.services.document_service.vector_index_store", VectorIndexStore(str(tmp_path)))
+
+    cursor = mock_doc_collection.find.return_value
+    cursor.to_list = AsyncMock(return_value=[{"_id": other, "title": "Parking"}, {"_id": mine, "title": "Leave"}])
+
+    result = await similar_documents(TEST_USER_ID, "viewer", "leave policy", limit=2)
+
+    assert [(item["title"], item["chunk_index"]) for item in result["items"]] == [("Leave", 0), ("Parking", 0)]
+    assert result["items"][0]["score"] > result["items"][1]["score"]
+    query, projection = mock_doc_collection.find.call_args[0]
+    assert query["owner_id"] == ObjectId(TEST_USER_ID)
+    assert set(query["_id"]["$in"]) == {mine, other}
+    assert "content" not in projection
+
+@pytest.mark.asyncio
+async def test_similar_documents_without_an_index_is_unavailable(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.document_service.vector_index_store", VectorIndexStore(str(tmp_path)))
+    with pytest.raises(HTTPException) as exc:
+        await similar_documents(TEST_USER_ID, "viewer", "leave policy")
+    assert exc.value.status_code == 503
+
+@pytest.mark.asyncio
+async def test_get_document_is_cached_until_updated(mock_doc_collection):
+    doc_id = ObjectId()
+    stored = {"_id": doc_id, **UPDATED_DOCUMENT_DATA, "owner_id": ObjectId(TEST_USER_ID)}
+    mock_doc_collection.find_one = AsyncMock(return_value=stored)
+    mock_doc_collection.find_one_and_update = AsyncMock(return_value=stored)
+    document_cache.clear()
+
+    first = await get_document(str(doc_id))
+    second = await get_document(str(doc_id))
+    assert first == second
+    assert mock_doc_collection.find_one.await_count == 1
+
+    await update_document(str(doc_id), DocumentCreate(**UPDATED_DOCUMENT_DATA), TEST_USER_ID, "viewer")
+    await get_document(str(doc_id))
+    assert mock_doc_collection.find_one.await_count == 2
+
+@pytest.mark.asyncio
+async def test_get_document_does_not_cache_a_read_overtaken_by_an_update(mock_doc_collection):
+    doc_id = ObjectId()
+    old = {"_id": doc_id, **UPDATED_DOCUMENT_DATA, "owner_id": ObjectId(TEST_USER_ID), "version": 1}
+    new = {**old, "version": 2}
+    document_cache.clear()
+
+    async def slow_find_one(query):
+        # The update lands and invalidates while the old version is on its way back
+        await update_document(str(doc_id), DocumentCreate(**UPDATED_DOCUMENT_DATA), TEST_USER_ID, "viewer")
+        mock_doc_collection.find_one.side_effect = None
+        mock_doc_collection.find_one.return_value = new
+        return old
+    mock_doc_collection.find_one = AsyncMock(side_effect=slow_find_one)
+    mock_doc_collection.find_one_and_update = AsyncMock(return_value=new)
+
+    assert (await get_document(str(doc_id)))["version"] == 1
+    assert document_cache.get(str(doc_id)) is None
+    assert (await get_document(str(doc_id)))["version"] == 2
+    assert document_cache.get(str(doc_id))["version"] == 2
+
+@pytest.mark.asyncio
+async def test_get_document_cache_can_be_disabled(mock_doc_collection, monkeypatch):
+    doc_id = ObjectId()
+    stored = {"_id": doc_id, **UPDATED_DOCUMENT_DATA, "owner_id": ObjectId(TEST_USER_ID)}
+    mock_doc_collection.find_one = AsyncMock(return_value=stored)
+    monkeypatch.setattr("app.services.document_service.settings.DOCUMENT_CACHE_ENABLED", False)
+    document_cache.clear()
+
+    await get_document(str(doc_id))
+    await get_document(str(doc_id))
+    assert mock_doc_collection.find_one.await_count == 2
+    assert len(document_cache) == 0
+
+@pytest.mark.asyncio
+async def test_get_document_not_modified(test_document):
+    etag = f'"{TEST_DOCUMENT_ID}-3"'
+    with patch("app.api.document_routes.get_document_etag", new_callable=AsyncMock) as mock_etag, \
+            patch("app.api.document_routes.get_document", new_callable=AsyncMock) as mock_get:
+        mock_etag.return_value = etag
+
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as ac:
+            response = await ac.get(f"/documents/{TEST_DOCUMENT_ID}", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == f"W/{etag}"
+        assert response.content == b""
+        mock_get.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_list_documents_etag_round_trip(test_document):
+    etag = '"page-etag"'
+    with patch("app.api.document_routes.get_all_documents", new_callable=AsyncMock) as mock_list, \
+            patch("app.api.document_routes.get_documents_page_etag", new_callable=AsyncMock) as mock_etag:
+        mock_list.return_value = {"items": [DocumentInDB(**test_document)], "next_cursor": None, "etag": etag}
+        mock_etag.return_value = etag
+
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as ac:
+            first = await ac.get("/documents/")
+            second = await ac.get("/documents/", headers={"If-None-Match": first.headers["etag"]})
+
+        assert first.status_code == 200
+        assert "etag" not in first.json()
+        assert second.status_code == 304
+        assert mock_list.await_count == 1
+
+@pytest.mark.asyncio
+async def test_get_document_etag_uses_projected_lookup(mock_doc_collection):
+    doc_id = ObjectId()
+    mock_doc_collection.find_one = AsyncMock(return_value={"_id": doc_id, "version": 4})
+    document_cache.clear()
+
+    assert await get_document_etag(str(doc_id)) == f'"{doc_id}-4"'
+    mock_doc_collection.find_one.assert_awaited_once_with({"_id": doc_id}, {"version": 1})
+
+def test_etag_matches():
+    assert etag_matches('"a-1"', '"a-1"')
+    assert etag_matches('"x", W/"a-1"', '"a-1"')
+    assert etag_matches("*", '"a-1"')
+    assert not etag_matches('"a-0"', '"a-1"')
+    assert not etag_matches(None, '"a-1"')
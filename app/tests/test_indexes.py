@@ -0,0 +1,69 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.core.config import settings
+from app.db.indexes import INDEX_REGISTRY, sync_indexes
+
+
+def make_db(existing_by_collection):
+    collections = {}
+    for name in INDEX_REGISTRY:
+        collection = MagicMock()
+        existing = {"_id_": {"key": [("_id", 1)]}, **existing_by_collection.get(name, {})}
+        collection.index_information = AsyncMock(return_value={k: dict(v) for k, v in existing.items()})
+        collection.create_indexes = AsyncMock(side_effect=lambda models: [m.document["name"] for m in models])
+        collection.drop_index = AsyncMock()
+        collections[name] = collection
+
+    mock_db = MagicMock()
+    mock_db.__getitem__.side_effect = collections.__getitem__
+    return mock_db, collections
+
+
+@pytest.mark.asyncio
+async def test_sync_indexes_creates_missing():
+    mock_db, collections = make_db({})
+
+    report = await sync_indexes(mock_db)
+
+    documents = report[settings.DOCUMENT_COLLECTION]
+    assert documents["created"] == ["owner_id_1__id_-1", "title_text_content_text"]
+    assert collections[settings.USER_COLLECTION].create_indexes.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_sync_indexes_dry_run_reports_only():
+    mock_db, collections = make_db({
+        settings.USER_COLLECTION: {
+            "email_1": {"key": [("email", 1)], "unique": True},
+            "legacy_1": {"key": [("legacy", 1)]},
+        },
+        settings.DOCUMENT_COLLECTION: {
+            "owner_id_1__id_-1": {"key": [("owner_id", 1)]},
+            "title_text_content_text": {
+                "key": [("_fts", "text"), ("_ftsx", 1)],
+                "weights": {"title": 10, "content": 1},
+            },
+        },
+    })
+
+    report = await sync_indexes(mock_db, dry_run=True)
+
+    assert report[settings.USER_COLLECTION]["missing"] == ["role_1__id_-1"]
+    assert report[settings.USER_COLLECTION]["extra"] == ["legacy_1"]
+    assert report[settings.DOCUMENT_COLLECTION]["conflicting"] == ["owner_id_1__id_-1"]
+    assert report[settings.INGESTION_COLLECTION]["missing"] == [
+        index.document["name"] for index in INDEX_REGISTRY[settings.INGESTION_COLLECTION]
+    ]
+    for collection in collections.values():
+        collection.create_indexes.assert_not_awaited()
+        collection.drop_index.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_sync_indexes_drops_extra_when_asked():
+    mock_db, collections = make_db({settings.USER_COLLECTION: {"legacy_1": {"key": [("legacy", 1)]}}})
+
+    report = await sync_indexes(mock_db, drop_extra=True)
+
+    assert report[settings.USER_COLLECTION]["dropped"] == ["legacy_1"]
+    collections[settings.USER_COLLECTION].drop_index.assert_awaited_once_with("legacy_1")
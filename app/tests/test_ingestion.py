@@ -1,7 +1,35 @@
+import asyncio
+import json
 import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
 from unittest.mock import AsyncMock, MagicMock
 from httpx import AsyncClient
+from fastapi import HTTPException
 from app.main import app  # Adjust import if needed
+from app.core.security import get_current_user, get_current_user_id
+from bson import ObjectId
+from app.core.config import settings
+from app.ingestion.admission import IngestionAdmission
+from app.ingestion.events import IngestionEventBus, job_key, status_event
+from app.models.user import TokenData
+from app.models.ingestion import IngestionBatchRequest, IngestionRequest
+from app.services.ingestion_service import (
+    ingestion_events,
+    open_batch_events,
+    open_job_events,
+    trigger_ingestion,
+    trigger_ingestion_batch,
+)
+from app.ingestion.indexer import build_vector_index
+from app.ingestion.pipeline import content_digest, embed_texts, process_content
+from app.core.vector_index import NO_OWNER, VectorIndex
+from app.ingestion.retry import PermanentIngestionError, backoff_delay, is_retryable
+from app.ingestion.status_writer import StatusWriter
+from pymongo.errors import AutoReconnect, BulkWriteError
+from app.ingestion.queue import IngestionQueue
+from app.ingestion.worker import IngestionWorker
 from httpx import ASGITransport
 from tests.constants import (
     API_BASE_URL,
@@ -21,24 +49,38 @@ transport = ASGITransport(app=app)
 def test_token():
     return TEST_TOKEN
 
+@pytest.fixture(autouse=True)
+def authenticated_user():
+    previous = app.dependency_overrides.get(get_current_user)
+    app.dependency_overrides[get_current_user] = lambda: TokenData(sub=MOCK_DECODED_TOKEN_PAYLOAD["sub"], role="user")
+    app.dependency_overrides[get_current_user_id] = lambda: MOCK_DECODED_TOKEN_PAYLOAD["sub"]
+    yield
+    app.dependency_overrides.pop(get_current_user_id, None)
+    if previous:
+        app.dependency_overrides[get_current_user] = previous
+    else:
+        app.dependency_overrides.pop(get_current_user, None)
+
+@pytest.fixture(autouse=True)
+def fresh_admission(mocker):
+    # Admission control caches the queue depth; don't let it leak between tests
+    admission = IngestionAdmission(max_pending=100, max_pending_per_user=10, retry_after_seconds=7)
+    mocker.patch("app.services.ingestion_service.ingestion_admission", new=admission)
+    return admission
+
 @pytest.mark.asyncio
 async def test_trigger_ingestion_success(mocker, test_token):
     mock_insert_one = AsyncMock()
 
     mock_collection = MagicMock()
     mock_collection.insert_one = mock_insert_one
+    mock_collection.find_one = AsyncMock(return_value=None)
+    mock_collection.count_documents = AsyncMock(return_value=0)
 
     mock_db = MagicMock()
     mock_db.__getitem__.return_value = mock_collection
 
-    async def mock_get_db():
-        yield mock_db
-    mocker.patch("app.services.ingestion_service.get_db", new=mock_get_db)
-
-    mock_bg_task = AsyncMock()
-    mocker.patch("app.services.ingestion_service.run_ingestion_worker", new=mock_bg_task)
-
-    mocker.patch("app.api.ingestion_routes.decode_access_token", return_value=MOCK_DECODED_TOKEN_PAYLOAD)
+    mocker.patch("app.services.ingestion_service.get_db", new=AsyncMock(return_value=mock_db))
 
     headers = {"Authorization": AUTH_HEADER_TEMPLATE.format(test_token)}
 
@@ -50,6 +92,9 @@ async def test_trigger_ingestion_success(mocker, test_token):
         )
 
     assert response.status_code == HTTP_202_ACCEPTED
+    queued = mock_insert_one.call_args[0][0]
+    assert queued["status"] == "pending"
+    assert queued["ingestion_id"] == response.json()["ingestion_id"]
 
 
 @pytest.mark.asyncio
@@ -58,15 +103,13 @@ async def test_trigger_ingestion_db_failure(mocker, test_token):
     async def insert_one_fail(*args, **kwargs):
         raise Exception("DB failure")
     mock_collection.insert_one = AsyncMock(side_effect=insert_one_fail)
+    mock_collection.find_one = AsyncMock(return_value=None)
+    mock_collection.count_documents = AsyncMock(return_value=0)
 
     mock_db = MagicMock()
     mock_db.__getitem__.return_value = mock_collection
 
-    async def mock_get_db():
-        yield mock_db
-    mocker.patch("app.services.ingestion_service.get_db", new=mock_get_db)
-
-    mocker.patch("app.api.ingestion_routes.decode_access_token", return_value=MOCK_DECODED_TOKEN_PAYLOAD)
+    mocker.patch("app.services.ingestion_service.get_db", new=AsyncMock(return_value=mock_db))
 
     headers = {"Authorization": AUTH_HEADER_TEMPLATE.format(test_token)}
 
@@ -78,3 +121,659 @@ async def test_trigger_ingestion_db_failure(mocker, test_token):
         )
 
     assert response.status_code == HTTP_500_INTERNAL_SERVER_ERROR
+
+
+@pytest.mark.asyncio
+async def test_claim_takes_pending_or_expired_lease_atomically():
+    mock_collection = MagicMock()
+    mock_collection.find_one_and_update = AsyncMock(return_value={"ingestion_id": "job-1", "attempts": 1})
+
+    job = await IngestionQueue(mock_collection, lease_seconds=30).claim("worker-a")
+
+    assert job["ingestion_id"] == "job-1"
+    query, update = mock_collection.find_one_and_update.call_args[0]
+    assert any(clause.get("status") == "pending" and "not_before" in clause for clause in query["$or"])
+    assert any("lease_expires_at" in clause for clause in query["$or"])
+    assert update["$set"]["lease_owner"] == "worker-a"
+    assert update["$inc"] == {"attempts": 1}
+
+
+STORED_DOCUMENT = {
+    "_id": ObjectId("60d21b4667d0d8992e610c85"),
+    "owner_id": ObjectId("60d21b4667d0d8992e610c86"),
+    "content": "Leave policy. " * 300,
+}
+
+
+def make_worker(document: Optional[dict] = STORED_DOCUMENT, stored_chunks: Optional[list] = None, **kwargs):
+    ingestion_collection = MagicMock()
+    ingestion_collection.update_one = AsyncMock(return_value=MagicMock(matched_count=1))
+    document_collection = MagicMock()
+    document_collection.find_one = AsyncMock(return_value=document)
+    document_collection.update_one = AsyncMock(return_value=MagicMock(matched_count=1))
+    chunk_collection = MagicMock()
+    chunk_collection.find.return_value.to_list = AsyncMock(return_value=stored_chunks or [])
+    chunk_collection.insert_many = AsyncMock()
+    chunk_collection.bulk_write = AsyncMock()
+    kwargs.setdefault("cpu_pool", ThreadPoolExecutor(max_workers=1))
+    worker = IngestionWorker(ingestion_collection, document_collection, chunk_collection, worker_id="worker-a", **kwargs)
+    return worker, ingestion_collection
+
+
+@pytest.mark.asyncio
+async def test_worker_completes_claimed_job_without_inserting(mocker):
+    worker, ingestion_collection = make_worker()
+
+    await worker.process_document({"ingestion_id": "job-1", "document_id": "60d21b4667d0d8992e610c85", "attempts": 1})
+
+    ingestion_collection.insert_one.assert_not_called()
+    query, update = ingestion_collection.update_one.call_args[0]
+    assert query == {"ingestion_id": "job-1", "status": "processing", "lease_owner": "worker-a"}
+    assert update["$set"]["status"] == "completed"
+
+
+def test_worker_spawns_its_cpu_pool_instead_of_forking():
+    worker, _ = make_worker(cpu_pool=None, cpu_workers=1)
+    try:
+        assert worker.cpu_pool()._mp_context.get_start_method() == "spawn"
+    finally:
+        worker.close()
+
+
+@pytest.mark.asyncio
+async def test_worker_dead_letters_permanent_failure_without_retrying():
+    dead_letters = MagicMock()
+    dead_letters.replace_one = AsyncMock()
+    worker, ingestion_collection = make_worker(document=None, max_retries=3, dead_letter_collection=dead_letters)
+
+    await worker.process_document({**STORED_JOB, "attempts": 1})
+
+    update = ingestion_collection.update_one.call_args[0][1]
+    assert update["$set"]["status"] == "failed"
+    assert update["$set"]["dead_lettered"] is True
+    assert "not found" in update["$set"]["error"]
+    entry = dead_letters.replace_one.call_args[0][1]
+    assert (entry["ingestion_id"], entry["retryable"]) == ("job-1", False)
+
+
+@pytest.mark.asyncio
+async def test_worker_reschedules_retryable_failure_with_backoff(mocker):
+    # The default jitter source is bound when backoff_delay is defined, so pin it through the worker's reference
+    mocker.patch(
+        "app.ingestion.worker.backoff_delay",
+        side_effect=lambda attempt, base, cap: backoff_delay(attempt, base, cap, lambda: 1.0),
+    )
+    worker, ingestion_collection = make_worker(max_retries=5, retry_base_seconds=2, retry_max_seconds=60)
+    worker.document_collection.find_one = AsyncMock(side_effect=AutoReconnect("connection reset"))
+
+    before = datetime.utcnow()
+    await worker.process_document({**STORED_JOB, "attempts": 3})
+
+    update = ingestion_collection.update_one.call_args[0][1]["$set"]
+    assert update["status"] == "pending" and update["lease_owner"] is None
+    # Third attempt: 2 * 2**2 = 8 seconds at most
+    assert 7.9 <= (update["not_before"] - before).total_seconds() <= 8.5
+    assert worker.stats()["retried"] == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_dead_letters_retryable_failure_out_of_attempts():
+    worker, ingestion_collection = make_worker(max_retries=2)
+    worker.document_collection.find_one = AsyncMock(side_effect=AutoReconnect("connection reset"))
+
+    await worker.process_document({**STORED_JOB, "attempts": 2})
+
+    assert ingestion_collection.update_one.call_args[0][1]["$set"]["status"] == "failed"
+
+
+def test_backoff_grows_exponentially_with_jitter_and_is_capped():
+    assert [backoff_delay(attempt, 2, 30, lambda: 1.0) for attempt in (1, 2, 3, 4, 5)] == [2, 4, 8, 16, 30]
+    assert backoff_delay(3, 2, 30, lambda: 0.0) == 4
+    assert is_retryable(AutoReconnect()) and not is_retryable(PermanentIngestionError()) and not is_retryable(KeyError())
+    duplicate = BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "E11000 duplicate key"}]})
+    assert is_retryable(duplicate)
+    assert not is_retryable(BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}, {"index": 1, "code": 121}]}))
+
+
+@pytest.mark.asyncio
+async def test_worker_run_drains_queue_until_stopped():
+    worker, _ = make_worker(concurrency=2, poll_interval_seconds=0.01)
+    jobs = [{"ingestion_id": f"job-{i}", "document_id": "d", "attempts": 1} for i in range(5)]
+    processed = []
+    worker.queue.claim = AsyncMock(side_effect=lambda worker_id: jobs.pop() if jobs else None)
+
+    async def process(job):
+        processed.append(job["ingestion_id"])
+    worker.process_document = process
+
+    stop = asyncio.Event()
+    runner = asyncio.create_task(worker.run(stop))
+    await asyncio.sleep(0.05)
+    stop.set()
+    await asyncio.wait_for(runner, timeout=1)
+
+    assert sorted(processed) == [f"job-{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_trigger_ingestion_rejects_user_over_limit(mocker, test_token, fresh_admission):
+    mock_collection = MagicMock()
+    mock_collection.insert_one = AsyncMock()
+    mock_collection.find_one = AsyncMock(return_value=None)
+    mock_collection.count_documents = AsyncMock(side_effect=[5, fresh_admission.max_pending_per_user])
+
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+    mocker.patch("app.services.ingestion_service.get_db", new=AsyncMock(return_value=mock_db))
+
+    async with AsyncClient(transport=transport, base_url=API_BASE_URL) as client:
+        response = await client.post(
+            INGESTION_TRIGGER_ENDPOINT,
+            headers={"Authorization": AUTH_HEADER_TEMPLATE.format(test_token)},
+            json=REQUEST_DATA_INGESTION_TRIGGER
+        )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    mock_collection.insert_one.assert_not_called()
+    assert fresh_admission.stats()["rejected_user"] == 1
+
+
+@pytest.mark.asyncio
+async def test_admission_rejects_when_queue_full_and_recounts_after_interval():
+    now = [0.0]
+    admission = IngestionAdmission(max_pending=3, max_pending_per_user=10, depth_cache_seconds=1, clock=lambda: now[0])
+    collection = MagicMock()
+    collection.count_documents = AsyncMock(return_value=1)
+
+    await admission.admit(collection, "u1")
+    await admission.admit(collection, "u1")
+    with pytest.raises(HTTPException) as exc:
+        await admission.admit(collection, "u1")
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "5"
+
+    # One global count per interval; jobs admitted in between are tracked locally
+    global_counts = [c for c in collection.count_documents.call_args_list if "user_id" not in c.args[0]]
+    assert len(global_counts) == 1
+
+    now[0] = 2.0
+    await admission.admit(collection, "u1")
+    assert admission.stats() == {
+        "queue_depth": 2,
+        "max_pending": 3,
+        "max_pending_per_user": 10,
+        "admitted": 3,
+        "rejected_global": 1,
+        "rejected_user": 0,
+    }
+
+
+def make_batch_db(found_ids, unchanged_ids=()):
+    ingestion_collection = MagicMock()
+    ingestion_collection.insert_many = AsyncMock()
+    ingestion_collection.count_documents = AsyncMock(return_value=0)
+    doc_collection = MagicMock()
+    found = [{"_id": ObjectId(i), "content_digest": "new"} for i in found_ids]
+    found += [{"_id": ObjectId(i), "content_digest": "same", "ingested_digest": "same"} for i in unchanged_ids]
+    doc_collection.find.return_value.to_list = AsyncMock(return_value=found)
+    collections = {settings.INGESTION_COLLECTION: ingestion_collection, settings.DOCUMENT_COLLECTION: doc_collection}
+    mock_db = MagicMock()
+    mock_db.__getitem__.side_effect = collections.__getitem__
+    return mock_db, ingestion_collection, doc_collection
+
+
+@pytest.mark.asyncio
+async def test_trigger_ingestion_batch_checks_existence_once_and_inserts_in_chunks(mocker):
+    found = [str(ObjectId()) for _ in range(3)]
+    unknown = str(ObjectId())
+    mock_db, ingestion_collection, doc_collection = make_batch_db(found)
+    mocker.patch("app.services.ingestion_service.get_db", new=AsyncMock(return_value=mock_db))
+
+    request = IngestionBatchRequest(document_ids=found + [unknown, "not-an-id", found[0]])
+    response = await trigger_ingestion_batch(request, MOCK_DECODED_TOKEN_PAYLOAD["sub"], "admin", chunk_size=2)
+
+    assert response.queued == 3
+    assert response.missing == [unknown, "not-an-id"]
+    doc_collection.find.assert_called_once()
+    assert len(doc_collection.find.call_args[0][0]["_id"]["$in"]) == 4
+    inserted = [job for call in ingestion_collection.insert_many.call_args_list for job in call[0][0]]
+    assert ingestion_collection.insert_many.await_count == 2
+    assert [job["document_id"] for job in inserted] == found
+    assert {job["batch_id"] for job in inserted} == {response.batch_id}
+
+
+@pytest.mark.asyncio
+async def test_trigger_ingestion_batch_by_owner_is_limited_to_own_documents(mocker):
+    mock_db, _, _ = make_batch_db([])
+    mocker.patch("app.services.ingestion_service.get_db", new=AsyncMock(return_value=mock_db))
+
+    request = IngestionBatchRequest(owner_id=str(ObjectId()))
+    with pytest.raises(HTTPException) as exc:
+        await trigger_ingestion_batch(request, str(ObjectId()), "user")
+
+    assert exc.value.status_code == 403
+
+
+def test_ingestion_batch_request_needs_exactly_one_selector():
+    with pytest.raises(ValueError):
+        IngestionBatchRequest()
+    with pytest.raises(ValueError):
+        IngestionBatchRequest(document_ids=["a"], owner_id="b")
+
+
+def make_status_db(job):
+    mock_collection = MagicMock()
+    mock_collection.find_one = AsyncMock(return_value=job)
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+    return mock_db, mock_collection
+
+
+STORED_JOB = {
+    "ingestion_id": "job-1",
+    "batch_id": None,
+    "document_id": "60d21b4667d0d8992e610c85",
+    "user_id": MOCK_DECODED_TOKEN_PAYLOAD["sub"],
+    "status": "processing",
+    "attempts": 1,
+    "created_at": datetime(2024, 1, 1),
+    "updated_at": datetime(2024, 1, 1),
+}
+
+
+@pytest.mark.asyncio
+async def test_get_ingestion_status_is_scoped_to_owner(mocker, test_token):
+    mock_db, mock_collection = make_status_db(STORED_JOB)
+    mocker.patch("app.services.ingestion_service.get_db", new=AsyncMock(return_value=mock_db))
+
+    async with AsyncClient(transport=transport, base_url=API_BASE_URL) as client:
+        response = await client.get("/ingestion/job-1", headers={"Authorization": AUTH_HEADER_TEMPLATE.format(test_token)})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "processing"
+    assert mock_collection.find_one.call_args[0][0] == {"ingestion_id": "job-1", "user_id": MOCK_DECODED_TOKEN_PAYLOAD["sub"]}
+
+    mock_collection.find_one.return_value = None
+    async with AsyncClient(transport=transport, base_url=API_BASE_URL) as client:
+        response = await client.get("/ingestion/job-2", headers={"Authorization": AUTH_HEADER_TEMPLATE.format(test_token)})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_job_event_stream_pushes_published_transitions(mocker):
+    mock_db, mock_collection = make_status_db(STORED_JOB)
+    mocker.patch("app.services.ingestion_service.get_db", new=AsyncMock(return_value=mock_db))
+
+    stream = await open_job_events("job-1", MOCK_DECODED_TOKEN_PAYLOAD["sub"], "user", keepalive_seconds=0.01)
+    first = await stream.__anext__()
+    assert first.startswith("event: status\n") and '"processing"' in first
+
+    assert await stream.__anext__() == ": keep-alive\n\n"
+    ingestion_events.publish({**status_event(STORED_JOB, "completed"), "_id": ObjectId()})
+    last = await stream.__anext__()
+    assert json.loads(last.split("data: ", 1)[1])["status"] == "completed"
+
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+    # The only database read was the initial status
+    mock_collection.find_one.assert_awaited_once()
+    assert ingestion_events.stats()["subscribers"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_event_stream_ends_when_every_job_finished(mocker):
+    jobs = [{"ingestion_id": "a", "status": "completed"}, {"ingestion_id": "b", "status": "pending"}]
+    mock_collection = MagicMock()
+    mock_collection.find.return_value.to_list = AsyncMock(return_value=jobs)
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+    mocker.patch("app.services.ingestion_service.get_db", new=AsyncMock(return_value=mock_db))
+
+    stream = await open_batch_events("batch-1", "admin-id", "admin")
+    assert '"remaining": 1' in await stream.__anext__()
+
+    job_b = {**STORED_JOB, "ingestion_id": "b", "batch_id": "batch-1"}
+    ingestion_events.publish(status_event(job_b, "processing"))
+    ingestion_events.publish(status_event(job_b, "failed", "boom"))
+    chunks = [chunk async for chunk in stream]
+
+    assert [chunk.split("\n", 1)[0] for chunk in chunks] == ["event: status", "event: status", "event: progress"]
+    assert '"remaining": 0' in chunks[-1]
+
+
+def test_event_bus_drops_oldest_event_for_slow_subscribers():
+    bus = IngestionEventBus(max_queue=2)
+    queue = bus.subscribe(job_key("job-1"))
+    other = bus.subscribe(job_key("job-2"))
+    for status in ("pending", "processing", "completed"):
+        bus.publish(status_event(STORED_JOB, status))
+
+    assert [queue.get_nowait()["status"] for _ in range(queue.qsize())] == ["processing", "completed"]
+    assert other.empty()
+    assert bus.stats()["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_publishes_status_transitions(mocker):
+    publisher = MagicMock()
+    publisher.publish = AsyncMock()
+    worker, _ = make_worker(events=publisher)
+
+    await worker.process_document({**STORED_JOB, "ingestion_id": "job-1"})
+
+    assert [c.args[1] for c in publisher.publish.await_args_list] == ["processing", "completed"]
+
+
+@pytest.mark.asyncio
+async def test_worker_writes_chunks_in_batches_and_records_timings():
+    worker, ingestion_collection = make_worker(cpu_pool=None, chunk_tokens=50, chunk_overlap_tokens=10, chunk_write_batch=4)
+    try:
+        await worker.process_document({**STORED_JOB, "document_id": str(STORED_DOCUMENT["_id"])})
+    finally:
+        worker.close()
+
+    # 900 tokens in windows of 50 with a step of 40: 23 chunks, 6 batches of up to 4
+    requests = [request for call in worker.chunk_collection.bulk_write.call_args_list for request in call[0][0]]
+    assert worker.chunk_collection.bulk_write.await_count == 6
+    # Upserts even for a never-ingested document, so a second job racing on it can't hit the unique index
+    assert all(type(request).__name__ == "ReplaceOne" and request._upsert for request in requests)
+    inserted = [request._doc for request in requests]
+    assert [chunk["index"] for chunk in inserted] == list(range(23))
+    assert all(chunk["document_id"] == STORED_DOCUMENT["_id"] for chunk in inserted)
+    # Owner and embedding are stored with every chunk, so the vector index is built from chunks alone
+    assert all(chunk["owner_id"] == STORED_DOCUMENT["owner_id"] for chunk in inserted)
+    assert all(len(chunk["embedding"]) == worker.embedding_dims * 4 for chunk in inserted)
+    worker.chunk_collection.insert_many.assert_not_called()
+
+    update = ingestion_collection.update_one.call_args[0][1]
+    assert update["$set"]["status"] == "completed"
+    assert update["$set"]["chunks_written"] == 23
+    assert set(update["$set"]["timings"]) == {"fetch_ms", "normalize_ms", "tokenize_ms", "chunk_ms", "embed_ms", "write_ms", "total_ms"}
+    document_update = worker.document_collection.update_one.call_args[0][1]["$set"]
+    assert document_update["ingested_digest"] == content_digest(STORED_DOCUMENT["content"])
+    assert document_update["ingested_digest"] == update["$set"]["content_digest"]
+
+
+@pytest.mark.asyncio
+async def test_worker_skips_document_with_unchanged_content_unless_forced():
+    document = {**STORED_DOCUMENT, "ingested_digest": content_digest(STORED_DOCUMENT["content"])}
+    worker, ingestion_collection = make_worker(document=document)
+
+    await worker.process_document({**STORED_JOB, "document_id": str(STORED_DOCUMENT["_id"])})
+
+    assert ingestion_collection.update_one.call_args[0][1]["$set"]["status"] == "skipped"
+    worker.chunk_collection.bulk_write.assert_not_called()
+    worker.document_collection.update_one.assert_not_called()
+
+    await worker.process_document({**STORED_JOB, "document_id": str(STORED_DOCUMENT["_id"]), "force": True})
+    assert ingestion_collection.update_one.call_args[0][1]["$set"]["status"] == "completed"
+    assert worker.stats()["skipped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_rewrites_only_changed_chunks():
+    text = " ".join(f"w{i}" for i in range(10))
+    chunks, _ = process_content(text, chunk_tokens=4, overlap_tokens=1)
+    # Stored: the first chunk unchanged, the second one stale, the third embedded with another size,
+    # plus one past the new end
+    stored = [
+        {key: chunks[0][key] for key in ("index", "digest", "start", "end", "embedding_dims")},
+        {**{key: chunks[1][key] for key in ("index", "start", "end", "embedding_dims")}, "digest": "stale"},
+        {**{key: chunks[2][key] for key in ("index", "digest", "start", "end")}, "embedding_dims": 64},
+        {"index": 3, "digest": "gone", "start": 0, "end": 0},
+    ]
+    worker, ingestion_collection = make_worker(
+        document={"_id": STORED_DOCUMENT["_id"], "content": text}, stored_chunks=stored,
+        chunk_tokens=4, chunk_overlap_tokens=1,
+    )
+
+    await worker.process_document({**STORED_JOB, "document_id": str(STORED_DOCUMENT["_id"])})
+
+    requests = worker.chunk_collection.bulk_write.call_args[0][0]
+    assert [type(request).__name__ for request in requests] == ["ReplaceOne", "ReplaceOne", "DeleteMany"]
+    assert [request._filter["index"] for request in requests[:2]] == [1, 2]
+    assert requests[1]._doc["embedding_dims"] == worker.embedding_dims
+    worker.chunk_collection.insert_many.assert_not_called()
+    assert ingestion_collection.update_one.call_args[0][1]["$set"]["chunks_written"] == 2
+
+
+@pytest.mark.asyncio
+async def test_trigger_ingestion_records_unchanged_document_as_skipped(mocker):
+    mock_collection = MagicMock()
+    mock_collection.insert_one = AsyncMock()
+    mock_collection.find_one = AsyncMock(return_value={"_id": ObjectId(), "content_digest": "d", "ingested_digest": "d"})
+    mock_collection.count_documents = AsyncMock(return_value=0)
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+    mocker.patch("app.services.ingestion_service.get_db", new=AsyncMock(return_value=mock_db))
+
+    user_id = str(ObjectId())
+    response = await trigger_ingestion(IngestionRequest(document_id=str(ObjectId())), user_id, "user")
+
+    assert response.status == "skipped"
+    assert mock_collection.insert_one.call_args[0][0]["status"] == "skipped"
+    # The digest is only read for documents the user may see
+    assert mock_collection.find_one.call_args[0][0]["owner_id"] == ObjectId(user_id)
+    # Skipped jobs take no queue capacity
+    mock_collection.count_documents.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_trigger_ingestion_batch_skips_unchanged_documents(mocker):
+    changed, unchanged = [str(ObjectId())], [str(ObjectId()) for _ in range(2)]
+    mock_db, ingestion_collection, _ = make_batch_db(changed, unchanged)
+    mocker.patch("app.services.ingestion_service.get_db", new=AsyncMock(return_value=mock_db))
+
+    response = await trigger_ingestion_batch(
+        IngestionBatchRequest(document_ids=changed + unchanged), MOCK_DECODED_TOKEN_PAYLOAD["sub"], "admin"
+    )
+
+    assert (response.queued, response.skipped) == (1, 2)
+    inserted = ingestion_collection.insert_many.call_args[0][0]
+    assert {job["document_id"]: job["status"] for job in inserted} == {
+        changed[0]: "pending", unchanged[0]: "skipped", unchanged[1]: "skipped",
+    }
+
+    forced = await trigger_ingestion_batch(
+        IngestionBatchRequest(document_ids=changed + unchanged, force=True), MOCK_DECODED_TOKEN_PAYLOAD["sub"], "admin"
+    )
+    assert (forced.queued, forced.skipped) == (3, 0)
+
+
+@pytest.mark.asyncio
+async def test_redrive_requeues_dead_lettered_job(mocker, fresh_admission):
+    ingestion_collection = MagicMock()
+    ingestion_collection.count_documents = AsyncMock(return_value=0)
+    ingestion_collection.update_one = AsyncMock(return_value=MagicMock(matched_count=1))
+    dead_letters = MagicMock()
+    dead_letters.find_one = AsyncMock(return_value={"user_id": MOCK_DECODED_TOKEN_PAYLOAD["sub"]})
+    dead_letters.delete_one = AsyncMock()
+    collections = {settings.INGESTION_COLLECTION: ingestion_collection, settings.INGESTION_DEAD_LETTER_COLLECTION: dead_letters}
+    mock_db = MagicMock()
+    mock_db.__getitem__.side_effect = collections.__getitem__
+    mocker.patch("app.services.ingestion_service.get_db", new=AsyncMock(return_value=mock_db))
+
+    async with AsyncClient(transport=transport, base_url=API_BASE_URL) as client:
+        response = await client.post("/ingestion/dead-letters/job-1/redrive", headers={"Authorization": AUTH_HEADER_TEMPLATE.format(TEST_TOKEN)})
+
+    assert response.status_code == 202
+    assert dead_letters.find_one.call_args[0][0] == {"ingestion_id": "job-1", "user_id": MOCK_DECODED_TOKEN_PAYLOAD["sub"]}
+    query, update = ingestion_collection.update_one.call_args[0]
+    assert query == {"ingestion_id": "job-1", "status": "failed"}
+    assert update["$set"]["status"] == "pending" and update["$set"]["attempts"] == 0
+    dead_letters.delete_one.assert_awaited_once_with({"ingestion_id": "job-1"})
+    assert fresh_admission.stats()["queue_depth"] == 1
+
+    # The job was finished by a later attempt: the stale entry goes, and nothing is charged
+    ingestion_collection.update_one.return_value = MagicMock(matched_count=0)
+    async with AsyncClient(transport=transport, base_url=API_BASE_URL) as client:
+        response = await client.post("/ingestion/dead-letters/job-1/redrive", headers={"Authorization": AUTH_HEADER_TEMPLATE.format(TEST_TOKEN)})
+    assert response.status_code == 409
+    stale = dead_letters.delete_one.call_args[0][0]
+    assert stale["ingestion_id"] == "job-1" and "$lt" in stale["dead_lettered_at"]
+    assert fresh_admission.stats()["queue_depth"] == 1
+
+
+@pytest.mark.asyncio
+async def test_dead_letter_withdraws_its_entry_when_the_lease_was_lost():
+    dead_letters = MagicMock()
+    dead_letters.replace_one = AsyncMock()
+    dead_letters.delete_one = AsyncMock()
+    collection = MagicMock()
+    collection.update_one = AsyncMock(return_value=MagicMock(matched_count=0))
+    queue = IngestionQueue(collection, dead_letter_collection=dead_letters)
+
+    assert not await queue.dead_letter(STORED_JOB, "worker-a", "boom")
+
+    entry = dead_letters.replace_one.call_args[0][1]
+    dead_letters.delete_one.assert_awaited_once_with({"ingestion_id": "job-1", "dead_lettered_at": entry["dead_lettered_at"]})
+
+
+@pytest.mark.asyncio
+async def test_status_writer_coalesces_per_job_and_flushes_on_size():
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock(return_value=MagicMock(matched_count=3))
+    writer = StatusWriter(collection, max_batch=3)
+    owned = lambda job: {"ingestion_id": job, "status": "processing", "lease_owner": "worker-a"}
+
+    first = await writer.update("job-1", owned("job-1"), {"status": "processing", "attempts": 1})
+    await writer.update("job-1", owned("job-1"), {"status": "completed"})
+    await writer.update("job-2", owned("job-2"), {"status": "completed"})
+    collection.bulk_write.assert_not_called()
+    assert not first.done()
+
+    await writer.update("job-3", owned("job-3"), {"status": "failed"})
+    assert first.result() is True
+    requests = collection.bulk_write.call_args[0][0]
+    assert collection.bulk_write.call_args.kwargs["ordered"] is False
+    assert [request._filter["ingestion_id"] for request in requests] == ["job-1", "job-2", "job-3"]
+    fields = requests[0]._doc["$set"]
+    assert {"status": fields["status"], "attempts": fields["attempts"]} == {"status": "completed", "attempts": 1}
+    assert writer.stats() == {
+        "buffered": 0, "transitions": 4, "coalesced": 1, "flushes": 1, "writes": 3, "errors": 0, "unmatched": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_status_writer_keeps_order_across_filters_and_requeues_failed_flush():
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock(side_effect=[AutoReconnect("down"), MagicMock(matched_count=1), MagicMock(matched_count=1)])
+    writer = StatusWriter(collection, max_batch=100)
+
+    pending = await writer.update("job-1", {"ingestion_id": "job-1", "lease_owner": "a"}, {"status": "pending"})
+    await writer.flush()
+    assert writer.stats()["buffered"] == 1
+    assert not pending.done()
+
+    # A different filter for the same job flushes what's buffered first
+    completed = await writer.update("job-1", {"ingestion_id": "job-1", "lease_owner": "b"}, {"status": "completed"})
+    assert collection.bulk_write.call_args[0][0][0]._filter["lease_owner"] == "a"
+    assert pending.result() is True
+
+    stop = asyncio.Event()
+    stop.set()
+    await writer.run(stop)
+    assert collection.bulk_write.call_args[0][0][0]._doc["$set"]["status"] == "completed"
+    assert completed.result() is True
+    assert writer.stats()["buffered"] == 0
+
+
+@pytest.mark.asyncio
+async def test_status_writer_tells_which_writes_matched_by_flush_id():
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock(return_value=MagicMock(matched_count=1))
+    collection.find.return_value.to_list = AsyncMock(return_value=[{"ingestion_id": "job-2"}])
+    writer = StatusWriter(collection, max_batch=100)
+
+    lost = await writer.update("job-1", {"ingestion_id": "job-1", "lease_owner": "a"}, {"status": "completed"})
+    kept = await writer.update("job-2", {"ingestion_id": "job-2", "lease_owner": "a"}, {"status": "completed"})
+    await writer.flush()
+
+    flush_id = collection.bulk_write.call_args[0][0][0]._doc["$set"]["status_flush_id"]
+    query = collection.find.call_args[0][0]
+    assert query["status_flush_id"] == flush_id and sorted(query["ingestion_id"]["$in"]) == ["job-1", "job-2"]
+    assert (lost.result(), kept.result()) == (False, True)
+    assert writer.stats()["unmatched"] == 1
+
+
+def flushed_worker(matched: int):
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock(return_value=MagicMock(matched_count=matched))
+    collection.find.return_value.to_list = AsyncMock(return_value=[])
+    writer = StatusWriter(collection, max_batch=100)
+    publisher = MagicMock()
+    publisher.publish = AsyncMock()
+    worker, ingestion_collection = make_worker(status_writer=writer, events=publisher)
+    return worker, writer, publisher, ingestion_collection
+
+
+@pytest.mark.asyncio
+async def test_worker_announces_finished_jobs_only_after_the_status_flush():
+    worker, writer, publisher, ingestion_collection = flushed_worker(matched=1)
+
+    await worker.process_document({**STORED_JOB, "document_id": str(STORED_DOCUMENT["_id"])})
+    # Let the outcome buffer its write
+    await asyncio.sleep(0)
+
+    ingestion_collection.update_one.assert_not_called()
+    assert writer.stats()["buffered"] == 1
+    assert [c.args[1] for c in publisher.publish.await_args_list] == ["processing"]
+    assert worker.stats()["completed"] == 0
+
+    await writer.flush()
+    await asyncio.gather(*worker._settling)
+    assert writer.collection.bulk_write.call_args[0][0][0]._doc["$set"]["status"] == "completed"
+    assert [c.args[1] for c in publisher.publish.await_args_list] == ["processing", "completed"]
+    assert worker.stats()["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_discards_outcome_of_a_lost_lease():
+    worker, writer, publisher, _ = flushed_worker(matched=0)
+
+    await worker.process_document({**STORED_JOB, "document_id": str(STORED_DOCUMENT["_id"])})
+    await asyncio.sleep(0)
+    await writer.flush()
+    await asyncio.gather(*worker._settling)
+
+    assert [c.args[1] for c in publisher.publish.await_args_list] == ["processing"]
+    assert (worker.stats()["completed"], worker.stats()["lost_leases"]) == (0, 1)
+    assert writer.stats()["unmatched"] == 1
+
+
+class AsyncCursor:
+    def __init__(self, items: list):
+        self.items = items
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for item in self.items:
+            yield item
+
+
+@pytest.mark.asyncio
+async def test_build_vector_index_groups_rows_by_owner_and_skips_other_sizes(tmp_path):
+    owner, document_id = ObjectId(), ObjectId()
+    embedding = embed_texts(["leave policy"], 8)[0].tobytes()
+    chunk_collection = MagicMock()
+    chunk_collection.find.return_value = AsyncCursor([
+        {"document_id": document_id, "index": 0, "embedding": embedding},
+        {"document_id": document_id, "index": 1, "owner_id": owner, "embedding": embedding},
+        {"document_id": document_id, "index": 2, "owner_id": owner, "embedding": embedding * 2},
+    ])
+
+    result = await build_vector_index(chunk_collection, str(tmp_path), dims=8)
+
+    assert (result["rows"], result["skipped"]) == (2, 1)
+    index = VectorIndex.load(str(tmp_path))
+    assert index.generation == result["generation"]
+    assert index.owner_rows(NO_OWNER) == slice(0, 1)
+    assert index.owner_rows(str(owner)) == slice(1, 2)
+    assert index.row(1) == (str(document_id), 1)
+    assert chunk_collection.find.call_args[0][0] == {"embedding": {"$exists": True}}
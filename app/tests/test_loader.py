@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from app.core.loader import BatchLoader
+
+
+@pytest.mark.asyncio
+async def test_concurrent_loads_share_one_batch():
+    calls = []
+
+    async def batch_fn(keys):
+        calls.append(keys)
+        return {key: key.upper() for key in keys if key != "missing"}
+
+    loader = BatchLoader(batch_fn)
+    results = await asyncio.gather(loader.load("a"), loader.load("b"), loader.load("a"), loader.load("missing"))
+
+    assert results == ["A", "B", "A", None]
+    assert calls == [["a", "b", "missing"]]
+    assert loader.stats()["batches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sequential_loads_are_not_cached_and_errors_propagate():
+    calls = []
+
+    async def batch_fn(keys):
+        calls.append(keys)
+        if "boom" in keys:
+            raise RuntimeError("database down")
+        return {key: len(calls) for key in keys}
+
+    loader = BatchLoader(batch_fn, max_batch_size=2)
+    assert await loader.load("a") == 1
+    assert await loader.load("a") == 2
+    assert await loader.load_many(["x", "y", "z"]) == [3, 3, 4]
+
+    with pytest.raises(RuntimeError):
+        await loader.load("boom")
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_coalesced_callers():
+    release = asyncio.Event()
+
+    async def batch_fn(keys):
+        await release.wait()
+        return {key: key.upper() for key in keys}
+
+    loader = BatchLoader(batch_fn)
+    first = asyncio.ensure_future(loader.load("a"))
+    second = asyncio.ensure_future(loader.load("a"))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == "A"
+    assert first.cancelled()
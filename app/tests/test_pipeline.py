@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from app.ingestion.pipeline import embed_texts, normalize_text, process_content, split_chunks, tokenize
+
+
+def test_normalize_text_collapses_whitespace_and_compatibility_forms():
+    assert normalize_text("  Ｌｅａｖｅ\t\n policy\u00a0 rules ") == "Leave policy rules"
+
+
+def test_chunks_overlap_and_cover_every_token():
+    text = " ".join(f"w{i}" for i in range(10))
+    chunks = split_chunks(text, tokenize(text), chunk_tokens=4, overlap_tokens=1)
+
+    assert [chunk["text"] for chunk in chunks] == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"]
+    assert [chunk["token_count"] for chunk in chunks] == [4, 4, 4]
+    assert text[chunks[1]["start"]:chunks[1]["end"]] == chunks[1]["text"]
+    assert len({chunk["digest"] for chunk in chunks}) == 3
+
+
+def test_short_and_empty_content():
+    chunks, timings = process_content("Just a few words.", chunk_tokens=256, overlap_tokens=32)
+    assert len(chunks) == 1 and chunks[0]["token_count"] == 5
+    assert set(timings) == {"normalize_ms", "tokenize_ms", "chunk_ms", "embed_ms"}
+
+    assert process_content("", chunk_tokens=256, overlap_tokens=32)[0] == []
+
+
+def test_overlap_must_be_smaller_than_chunk():
+    with pytest.raises(ValueError):
+        split_chunks("a b", tokenize("a b"), chunk_tokens=2, overlap_tokens=2)
+
+
+def test_embeddings_are_normalized_and_rank_related_text_higher():
+    vectors = embed_texts(["annual leave policy", "Annual  leave policy!", "quarterly sales figures", ""], dims=128)
+
+    assert vectors.shape == (4, 128) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert not vectors[3].any()
+    assert np.allclose(vectors[0], vectors[1])
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+def test_chunks_carry_their_embedding():
+    text = " ".join(f"w{i}" for i in range(10))
+    chunks, _ = process_content(text, chunk_tokens=4, overlap_tokens=1, embedding_dims=64)
+
+    assert all(len(chunk["embedding"]) == 64 * 4 for chunk in chunks)
+    assert np.array_equal(np.frombuffer(chunks[0]["embedding"], dtype="<f4"), embed_texts([chunks[0]["text"]], 64)[0])
@@ -1,7 +1,14 @@
+import asyncio
 import pytest
 from httpx import AsyncClient, ASGITransport
 from unittest.mock import AsyncMock, MagicMock
 from app.main import app
+from app.services.user_service import (
+    authenticate_user, get_all_users, get_user_by_id, user_count_cache, user_helper, user_loader,
+)
+from app.core.security import get_current_user
+from app.models.user import TokenData
+from bson import ObjectId
 from tests.constants import (
     TEST_LOGIN_DATA,
     MOCK_USER_DB_ENTRY,
@@ -27,11 +34,8 @@ async def test_register_user(mocker):
     mock_db = MagicMock()
     mock_db.__getitem__.return_value = mock_collection
 
-    async def mock_get_db():
-        yield mock_db
-
     # Patch dependencies
-    mocker.patch("app.services.user_service.get_db", mock_get_db)
+    mocker.patch("app.services.user_service.get_db", new=AsyncMock(return_value=mock_db))
     mock_register_user = mocker.patch(
         "app.services.user_service.register_user",
         new_callable=AsyncMock
@@ -56,11 +60,8 @@ async def test_login_user(mocker):
     mock_db = MagicMock()
     mock_db.__getitem__.return_value = mock_collection
 
-    async def mock_get_db():
-        yield mock_db
-
     # Patch dependencies
-    mocker.patch("app.services.user_service.get_db", mock_get_db)
+    mocker.patch("app.services.user_service.get_db", new=AsyncMock(return_value=mock_db))
 
     mock_authenticate_user = mocker.patch("app.api.user_routes.authenticate_user", new_callable=AsyncMock)
 
@@ -71,3 +72,121 @@ async def test_login_user(mocker):
 
     assert response.status_code == HTTP_200_OK
     assert "access_token" in response.json()
+
+
+@pytest.mark.asyncio
+async def test_authenticate_user_rehashes_outdated_password(mocker):
+    mock_collection = AsyncMock()
+    mock_collection.find_one.return_value = {
+        "_id": "123", "email": TEST_LOGIN_DATA["username"], "role": "viewer", "hashed_password": "old-hash"
+    }
+
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    mocker.patch("app.services.user_service.get_db", new=AsyncMock(return_value=mock_db))
+    mocker.patch(
+        "app.services.user_service.verify_and_update_password_async",
+        new=AsyncMock(return_value=(True, "new-hash")),
+    )
+
+    token = await authenticate_user(TEST_LOGIN_DATA["username"], TEST_LOGIN_DATA["password"])
+
+    assert token["token_type"] == "bearer"
+    mock_collection.update_one.assert_awaited_once_with({"_id": "123"}, {"$set": {"hashed_password": "new-hash"}})
+
+
+@pytest.mark.asyncio
+async def test_list_users_requires_admin_and_paginates(mocker):
+    page = {"items": [{"id": "123", "email": TEST_LOGIN_DATA["username"], "role": "viewer"}], "next_cursor": "abc", "total": 42}
+    mock_get_all = mocker.patch("app.api.user_routes.get_all_users", new_callable=AsyncMock, return_value=page)
+    previous = app.dependency_overrides.get(get_current_user)
+    try:
+        app.dependency_overrides[get_current_user] = lambda: TokenData(sub="1", role="admin")
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as client:
+            response = await client.get("/users/", params={"limit": 10, "role": "viewer"})
+
+        app.dependency_overrides[get_current_user] = lambda: TokenData(sub="1", role="viewer")
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as client:
+            forbidden = await client.get("/users/")
+    finally:
+        if previous:
+            app.dependency_overrides[get_current_user] = previous
+        else:
+            app.dependency_overrides.pop(get_current_user, None)
+
+    assert response.status_code == HTTP_200_OK
+    assert response.json()["total"] == 42
+    assert response.json()["next_cursor"] == "abc"
+    assert mock_get_all.call_args.kwargs["role"] == "viewer"
+    assert forbidden.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_get_all_users_projects_and_uses_cached_count(mocker):
+    stored = [{"_id": ObjectId(), "email": f"user{i}@example.com", "role": "viewer"} for i in range(3)]
+    mock_collection = MagicMock()
+    cursor = mock_collection.find.return_value
+    cursor.sort.return_value = cursor
+    cursor.limit.return_value = cursor
+    cursor.to_list = AsyncMock(return_value=stored)
+    mock_collection.estimated_document_count = AsyncMock(return_value=3)
+
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    mocker.patch("app.services.user_service.get_db", new=AsyncMock(return_value=mock_db))
+    user_count_cache.clear()
+
+    first = await get_all_users(limit=2)
+    await get_all_users(limit=2)
+
+    query, projection = mock_collection.find.call_args[0]
+    assert "hashed_password" not in projection
+    assert [user["email"] for user in first["items"]] == ["user0@example.com", "user1@example.com"]
+    assert first["next_cursor"] is not None
+    assert first["total"] == 3
+    assert mock_collection.estimated_document_count.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_users_batch_lookup_uses_single_query(mocker):
+    stored = [{"_id": ObjectId(), "email": f"owner{i}@example.com", "role": "user"} for i in range(2)]
+    ids = [str(user["_id"]) for user in stored]
+    mock_collection = MagicMock()
+    mock_collection.find.return_value.to_list = AsyncMock(return_value=stored)
+
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    mocker.patch("app.services.user_service.get_db", new=AsyncMock(return_value=mock_db))
+    previous = app.dependency_overrides.get(get_current_user)
+    try:
+        app.dependency_overrides[get_current_user] = lambda: TokenData(sub="1", role="user")
+        async with AsyncClient(transport=transport, base_url=API_BASE_URL) as client:
+            response = await client.post("/users/batch", json={"ids": [ids[1], "not-an-id", ids[0], ids[1]]})
+    finally:
+        if previous:
+            app.dependency_overrides[get_current_user] = previous
+        else:
+            app.dependency_overrides.pop(get_current_user, None)
+
+    assert response.status_code == HTTP_200_OK
+    assert [user["id"] for user in response.json()["items"]] == [ids[1], ids[0]]
+    assert response.json()["missing"] == ["not-an-id"]
+    mock_collection.find.assert_called_once()
+    assert set(mock_collection.find.call_args[0][0]["_id"]["$in"]) == {user["_id"] for user in stored}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_get_user_by_id_calls_are_coalesced(mocker):
+    stored = [{"_id": ObjectId(), "email": f"owner{i}@example.com", "role": "user"} for i in range(3)]
+    mock_get_many = mocker.patch.object(
+        user_loader, "batch_fn",
+        AsyncMock(return_value={str(user["_id"]): user_helper(user) for user in stored}),
+    )
+
+    users = await asyncio.gather(*(get_user_by_id(str(user["_id"])) for user in stored))
+
+    assert [user.email for user in users] == [user["email"] for user in stored]
+    mock_get_many.assert_awaited_once()
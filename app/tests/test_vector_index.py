@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.core import vector_index
+from app.core.vector_index import NO_OWNER, VectorIndex, VectorIndexStore, VectorIndexUnavailable, VectorIndexWriter
+
+OWNER_A = "64b000000000000000000001"
+OWNER_B = "64b000000000000000000002"
+
+
+def random_vectors(count: int, dims: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, dims)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build(root, vectors: np.ndarray, owners: list) -> str:
+    writer = VectorIndexWriter(str(root), vectors.shape[1])
+    for row, (vector, owner) in enumerate(zip(vectors, owners)):
+        writer.add(f"{row:024x}", row % 3, owner, vector.tobytes())
+    return writer.commit()
+
+
+def test_search_matches_brute_force_across_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "BLOCK_ROWS", 7)
+    vectors = random_vectors(50, 16)
+    build(tmp_path, vectors, [OWNER_A] * 50)
+    index = VectorIndex.load(str(tmp_path))
+    queries = random_vectors(3, 16, seed=1)
+
+    found = index.search(queries, k=5)
+
+    for query, hits in zip(queries, found):
+        expected = np.argsort(-(vectors @ query))[:5]
+        assert [row for row, _ in hits] == expected.tolist()
+        assert [score for _, score in hits] == pytest.approx((vectors[expected] @ query).tolist(), rel=1e-5)
+    assert index.row(4) == (f"{4:024x}", 1)
+
+
+def test_owner_rows_restrict_the_search(tmp_path):
+    vectors = random_vectors(10, 8)
+    build(tmp_path, vectors, [NO_OWNER] * 2 + [OWNER_A] * 5 + [OWNER_B] * 3)
+    index = VectorIndex.load(str(tmp_path))
+
+    assert index.owner_rows(OWNER_A) == slice(2, 7)
+    assert index.owner_rows(OWNER_B) == slice(7, 10)
+    assert index.owner_rows("64b000000000000000000003") == slice(0, 0)
+
+    hits = index.search(vectors[8], k=10, rows=index.owner_rows(OWNER_B))[0]
+    assert [row for row, _ in hits][0] == 8
+    assert sorted(row for row, _ in hits) == [7, 8, 9]
+    assert index.search(vectors[8], k=10, rows=slice(0, 0)) == [[]]
+
+
+def test_rows_must_be_added_in_owner_order(tmp_path):
+    writer = VectorIndexWriter(str(tmp_path), 4)
+    writer.add("a" * 24, 0, OWNER_B, random_vectors(1, 4)[0].tobytes())
+    with pytest.raises(ValueError):
+        writer.add("b" * 24, 0, OWNER_A, random_vectors(1, 4)[0].tobytes())
+    with pytest.raises(ValueError):
+        writer.add("b" * 24, 0, OWNER_B, random_vectors(1, 8)[0].tobytes())
+    writer.abort()
+    assert os.listdir(tmp_path) == []
+
+
+def test_store_picks_up_new_generations(tmp_path):
+    store = VectorIndexStore(str(tmp_path), check_seconds=0)
+    with pytest.raises(VectorIndexUnavailable):
+        store.current()
+
+    first = build(tmp_path, np.zeros((0, 4), dtype=np.float32), [])
+    assert store.current().generation == first
+    assert len(store.current()) == 0
+    assert store.current().search(random_vectors(1, 4), k=3) == [[]]
+
+    second = build(tmp_path, random_vectors(3, 4), [OWNER_A] * 3)
+    assert store.current().generation == second
+    assert len(store.current()) == 3
+    # The replaced generation stays for readers still switching over
+    assert sorted(os.listdir(tmp_path)) == sorted(["CURRENT", first, second])
+    assert store.stats()["reloads"] == 2
+
+    third = build(tmp_path, random_vectors(2, 4), [OWNER_B] * 2)
+    assert store.current().generation == third
+    assert sorted(os.listdir(tmp_path)) == sorted(["CURRENT", second, third])
+
+
+def test_commit_keeps_generations_still_being_built(tmp_path):
+    building = VectorIndexWriter(str(tmp_path), 4)
+    first = build(tmp_path, random_vectors(2, 4), [OWNER_A] * 2)
+    second = build(tmp_path, random_vectors(2, 4), [OWNER_A] * 2)
+    third = build(tmp_path, random_vectors(2, 4), [OWNER_A] * 2)
+    assert first not in os.listdir(tmp_path)
+
+    # Started before every published generation, but has no manifest yet
+    assert building.generation < first
+    building.add("a" * 24, 0, OWNER_A, random_vectors(1, 4)[0].tobytes())
+    assert building.commit() == building.generation
+    assert VectorIndex.load(str(tmp_path)).generation == building.generation
+    assert sorted(os.listdir(tmp_path)) == sorted(["CURRENT", third, building.generation])
@@ -0,0 +1,51 @@
+"""
+Per-request authentication overhead with and without the verified-token cache.
+
+Calls the shared `get_current_user` dependency repeatedly with a small pool
+of bearer tokens (as many concurrent users would) and prints the mean cost
+per call with TOKEN_CACHE_ENABLED off and on, plus the cache hit rate.
+
+    SECRET_KEY=bench python -m benchmarks.bench_auth --calls 20000 --users 50
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "docdb_bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from app.core.auth import create_access_token, settings, token_cache  # noqa: E402
+from app.core.security import get_current_user  # noqa: E402
+
+
+def measure(tokens, calls: int) -> float:
+    started = time.perf_counter()
+    for i in range(calls):
+        get_current_user(tokens[i % len(tokens)])
+    return (time.perf_counter() - started) / calls * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=50, help="distinct tokens in rotation")
+    args = parser.parse_args()
+
+    tokens = [create_access_token({"sub": f"{i:024x}", "role": "viewer"}) for i in range(args.users)]
+
+    settings.TOKEN_CACHE_ENABLED = False
+    uncached = measure(tokens, args.calls)
+
+    settings.TOKEN_CACHE_ENABLED = True
+    token_cache.clear()
+    cached = measure(tokens, args.calls)
+
+    print(f"calls: {args.calls}, distinct tokens: {args.users}")
+    print(f"without cache: {uncached:8.1f} us/request")
+    print(f"with cache:    {cached:8.1f} us/request  ({uncached / cached:.1f}x faster)")
+    print(f"cache stats:   {token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
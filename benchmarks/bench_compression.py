@@ -0,0 +1,92 @@
+"""
+Compression ratio vs CPU cost of the response encoders at different levels.
+
+Compresses a synthetic NDJSON export of text documents with every available
+encoder (gzip always; brotli and zstd when installed) and prints the ratio,
+throughput and CPU milliseconds per MB of input for each level. Use it to
+pick COMPRESSION_*_LEVEL for a given egress/CPU trade-off.
+
+    python -m benchmarks.bench_compression --documents 2000 --chunk-size 65536
+"""
+import argparse
+import json
+import random
+import time
+
+from app.core.compression import available_encoders
+
+LEVELS = {
+    "gzip": [1, 3, 6, 9],
+    "br": [1, 4, 6, 9, 11],
+    "zstd": [1, 3, 6, 12, 19],
+}
+
+WORDS = (
+    "policy employee leave request approval manager benefits payroll document section "
+    "guideline compliance training safety holiday contract review process department "
+    "the of and to in for with on by is are be will may must should"
+).split()
+
+
+def build_payload(documents: int, seed: int = 42) -> bytes:
+    rng = random.Random(seed)
+    lines = []
+    for i in range(documents):
+        content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(200, 1200)))
+        lines.append(json.dumps({
+            "id": f"{i:024x}",
+            "title": f"Document {i}",
+            "content": content,
+            "owner_id": f"{rng.randrange(16 ** 24):024x}",
+            "version": rng.randint(1, 5),
+        }))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def run(payload: bytes, chunk_size: int, repeat: int):
+    results = []
+    chunks = [payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)]
+    megabytes = len(payload) / (1024 * 1024)
+    for name, encoder_cls in available_encoders().items():
+        for level in LEVELS[name]:
+            best = None
+            for _ in range(repeat):
+                started = time.process_time()
+                encoder = encoder_cls(level)
+                # Mirror the middleware: one flushed block per streamed chunk
+                size = sum(len(encoder.compress(chunk)) + len(encoder.flush()) for chunk in chunks)
+                size += len(encoder.finish())
+                elapsed = time.process_time() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results.append({
+                "encoding": name,
+                "level": level,
+                "ratio": round(len(payload) / size, 2),
+                "mb_per_s": round(megabytes / best, 1) if best else None,
+                "cpu_ms_per_mb": round(best * 1000 / megabytes, 2),
+            })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024, help="bytes per streamed chunk")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    payload = build_payload(args.documents)
+    results = run(payload, args.chunk_size, args.repeat)
+    if args.json:
+        print(json.dumps({"payload_bytes": len(payload), "results": results}, indent=2))
+        return
+
+    print(f"payload: {len(payload) / (1024 * 1024):.1f} MB, chunk size: {args.chunk_size} bytes")
+    print(f"{'encoding':>8} {'level':>5} {'ratio':>7} {'MB/s':>8} {'CPU ms/MB':>10}")
+    for r in results:
+        print(f"{r['encoding']:>8} {r['level']:>5} {r['ratio']:>7} {r['mb_per_s']:>8} {r['cpu_ms_per_mb']:>10}")
+
+
+if __name__ == "__main__":
+    main()
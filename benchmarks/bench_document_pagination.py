@@ -0,0 +1,95 @@
+"""
+Per-page latency of the document listing as the collection grows.
+
+Seeds a scratch database (`BENCH_DB_NAME`, see `scratch_db`) in steps and, at each size, times the first page
+and a page deep into the collection, once with keyset pagination
+(`get_all_documents`) and once with the skip/offset query it replaces.
+Keyset latency should stay flat while skip grows with the page depth.
+
+Requires a running MongoDB:
+
+    MONGO_URL=mongodb://localhost:27017 SECRET_KEY=bench \
+        python -m benchmarks.bench_document_pagination --sizes 10000 100000 500000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.scratch_db import use_scratch_db
+
+use_scratch_db()
+
+from bson import ObjectId  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.pagination import encode_cursor  # noqa: E402
+from app.db.mongodb import close_db, connect_db, ensure_indexes, get_db  # noqa: E402
+from app.services.document_service import get_all_documents  # noqa: E402
+
+OWNER_ID = ObjectId()
+SEED_BATCH = 5000
+
+
+async def _seed(collection, count: int) -> None:
+    for start in range(0, count, SEED_BATCH):
+        batch = [
+            {"title": f"Document {i}", "content": "x" * 256, "owner_id": OWNER_ID}
+            for i in range(start, min(start + SEED_BATCH, count))
+        ]
+        await collection.insert_many(batch, ordered=False)
+
+
+async def _time(coro_factory, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_factory()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def main(sizes, page_size: int, repeat: int) -> None:
+    await connect_db()
+    db = await get_db()
+    collection = db[settings.DOCUMENT_COLLECTION]
+    await collection.drop()
+    await ensure_indexes()
+
+    print(f"{'docs':>10} {'depth':>8} {'keyset ms':>10} {'skip ms':>10}")
+    seeded = 0
+    for size in sorted(sizes):
+        await _seed(collection, size - seeded)
+        seeded = size
+
+        for depth in (0, size - page_size):
+            # Locate the cursor for this depth once, outside of the timed section
+            boundary = None
+            if depth:
+                anchor = await collection.find(
+                    {"owner_id": OWNER_ID}, {"_id": 1}
+                ).sort("_id", -1).skip(depth - 1).limit(1).to_list(length=1)
+                boundary = encode_cursor(anchor[0]["_id"])
+
+            keyset_ms = await _time(
+                lambda: get_all_documents(str(OWNER_ID), "viewer", limit=page_size, after=boundary),
+                repeat,
+            )
+            skip_ms = await _time(
+                lambda: collection.find({"owner_id": OWNER_ID})
+                .sort("_id", -1).skip(depth).limit(page_size).to_list(length=page_size),
+                repeat,
+            )
+            print(f"{size:>10} {depth:>8} {keyset_ms:>10.2f} {skip_ms:>10.2f}")
+
+    await collection.drop()
+    await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.page_size, args.repeat))
@@ -0,0 +1,271 @@
+"""
+Ingestion throughput and latency, end to end.
+
+Seeds documents, starts `--workers` ingestion workers built like the
+standalone worker process (`build_worker`), and queues one job per document
+through `trigger_ingestion` at `--rate` jobs/sec (as fast as possible by
+default). Reports jobs/sec, trigger-to-finish latency percentiles and the
+number of database operations per collection, including status writes.
+
+Runs against an in-memory stand-in for Motor by default, optionally with a
+simulated round-trip latency, or against a real MongoDB with `--mongo`
+(the scratch database named by `BENCH_DB_NAME`, see `scratch_db`):
+
+    python -m benchmarks.bench_ingestion --jobs 10000 --workers 2 --concurrency 16
+    python -m benchmarks.bench_ingestion --op-latency-ms 0.5 --no-status-batching
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.bench_ingestion --mongo
+
+`--json results.json` writes the results in machine-readable form. With
+`--baseline previous.json` the run fails (exit code 1) if jobs/sec dropped,
+or p99 latency grew, by more than `--max-regression` compared to that file.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.scratch_db import use_scratch_db
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("SECRET_KEY", "bench")
+use_scratch_db()
+
+from bson import ObjectId  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.db import mongodb  # noqa: E402
+from app.ingestion.pipeline import content_digest  # noqa: E402
+from app.ingestion.queue import INGESTION_STATUS_COMPLETED, INGESTION_STATUS_FAILED, INGESTION_STATUS_SKIPPED  # noqa: E402
+from app.ingestion.worker import build_worker  # noqa: E402
+from app.models.ingestion import IngestionRequest  # noqa: E402
+from app.services.ingestion_service import ingestion_admission, trigger_ingestion  # noqa: E402
+from benchmarks.memory_collection import CountingDatabase, MemoryDatabase  # noqa: E402
+
+FINISHED = {INGESTION_STATUS_COMPLETED, INGESTION_STATUS_FAILED, INGESTION_STATUS_SKIPPED}
+WORDS = "policy leave employee benefit contract notice review manager salary holiday".split()
+SEED_BATCH = 1000
+
+
+class FinishRecorder:
+    """
+    Takes the place of the worker's event publisher and records when each
+    job reached a final status, without any database writes of its own.
+    """
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.finished_at: Dict[str, float] = {}
+        self.statuses: Dict[str, int] = {}
+        self.done = asyncio.Event()
+
+    async def publish(self, job: dict, status: str, error: Optional[str] = None) -> None:
+        if status in FINISHED and job["ingestion_id"] not in self.finished_at:
+            self.finished_at[job["ingestion_id"]] = time.perf_counter()
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if len(self.finished_at) >= self.expected:
+                self.done.set()
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
+
+
+async def seed_documents(db, count: int, content_tokens: int) -> List[str]:
+    collection = db[settings.DOCUMENT_COLLECTION]
+    owner_id = ObjectId()
+    ids = []
+    for start in range(0, count, SEED_BATCH):
+        batch = []
+        for i in range(start, min(start + SEED_BATCH, count)):
+            content = " ".join(WORDS[(i + n) % len(WORDS)] for n in range(content_tokens)) + f" {i}."
+            batch.append({
+                "title": f"Document {i}",
+                "content": content,
+                "owner_id": owner_id,
+                "version": 1,
+                "content_digest": content_digest(content),
+            })
+        await collection.insert_many(batch, ordered=False)
+        ids += [str(doc["_id"]) for doc in batch]
+    return ids
+
+
+async def trigger_all(document_ids: List[str], rate: float, triggered_at: Dict[str, float]) -> int:
+    user_id = str(ObjectId())
+    rejected = 0
+    started = time.perf_counter()
+    for n, document_id in enumerate(document_ids):
+        if rate:
+            delay = started + n / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        sent = time.perf_counter()
+        try:
+            response = await trigger_ingestion(IngestionRequest(document_id=document_id), user_id, "admin")
+        except HTTPException:
+            rejected += 1
+            continue
+        triggered_at[response.ingestion_id] = sent
+    return rejected
+
+
+async def run(args) -> dict:
+    settings.INGESTION_STATUS_BATCHING = args.status_batching
+    settings.INGESTION_POLL_INTERVAL_SECONDS = args.poll_interval
+    settings.INGESTION_CHUNK_TOKENS = args.chunk_tokens
+    settings.INGESTION_CPU_WORKERS = args.cpu_workers
+    # Every job is triggered by the same user; don't let the per-user limit cap the run
+    ingestion_admission.max_pending_per_user = max(ingestion_admission.max_pending_per_user, args.jobs)
+
+    if args.mongo:
+        await mongodb.connect_db()
+        inner = await mongodb.get_db()
+        for name in (settings.DOCUMENT_COLLECTION, settings.INGESTION_COLLECTION, settings.CHUNK_COLLECTION,
+                     settings.INGESTION_DEAD_LETTER_COLLECTION):
+            await inner[name].drop()
+        await mongodb.ensure_indexes()
+    else:
+        inner = MemoryDatabase(latency_seconds=args.op_latency_ms / 1000)
+    db = CountingDatabase(inner)
+    # The service layer reads the database through get_db
+    mongodb._db = db
+
+    document_ids = await seed_documents(db, args.jobs, args.content_tokens)
+    db.reset_counts()
+
+    recorder = FinishRecorder(len(document_ids))
+    workers = [build_worker(db, args.concurrency) for _ in range(args.workers)]
+    for worker in workers:
+        worker.events = recorder
+    stop = asyncio.Event()
+    running = [asyncio.create_task(worker.run(stop)) for worker in workers]
+
+    triggered_at: Dict[str, float] = {}
+    started = time.perf_counter()
+    rejected = await trigger_all(document_ids, args.rate, triggered_at)
+    trigger_seconds = time.perf_counter() - started
+    recorder.expected = len(triggered_at)
+    if len(recorder.finished_at) >= recorder.expected:
+        recorder.done.set()
+    timed_out = False
+    try:
+        await asyncio.wait_for(recorder.done.wait(), timeout=args.timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*running)
+
+    latencies = sorted(
+        (recorder.finished_at[job] - sent) * 1000 for job, sent in triggered_at.items() if job in recorder.finished_at
+    )
+    counts = db.counts()
+    ingestion_ops = counts.get(settings.INGESTION_COLLECTION, {}).get("ops", {})
+    writer_stats = [worker.status_writer.stats() for worker in workers if worker.status_writer]
+
+    if args.mongo:
+        await mongodb.close_db()
+    else:
+        mongodb._db = None
+
+    return {
+        "benchmark": "ingestion",
+        "backend": "mongodb" if args.mongo else "memory",
+        "params": {
+            "jobs": args.jobs,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "op_latency_ms": 0 if args.mongo else args.op_latency_ms,
+            "content_tokens": args.content_tokens,
+            "chunk_tokens": args.chunk_tokens,
+            "status_batching": args.status_batching,
+        },
+        "triggered": len(triggered_at),
+        "rejected": rejected,
+        "finished": dict(recorder.statuses),
+        "timed_out": timed_out,
+        "elapsed_seconds": round(elapsed, 3),
+        "triggers_per_second": round(len(triggered_at) / trigger_seconds, 1) if trigger_seconds else None,
+        "jobs_per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p90": round(percentile(latencies, 0.90), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+        # Claims are find_one_and_update; finishing and rescheduling are update_one, or bulk_write when batched
+        "status_write_ops": ingestion_ops.get("update_one", 0) + ingestion_ops.get("bulk_write", 0),
+        "status_writer": {key: sum(stats[key] for stats in writer_stats) for key in writer_stats[0]} if writer_stats else None,
+        "ops": counts,
+    }
+
+
+def regressions(results: dict, baseline: dict, max_regression: float) -> List[str]:
+    found = []
+    if baseline.get("jobs_per_second") and results["jobs_per_second"] < baseline["jobs_per_second"] * (1 - max_regression):
+        found.append(f"jobs/sec {results['jobs_per_second']} vs baseline {baseline['jobs_per_second']}")
+    base_p99 = baseline.get("latency_ms", {}).get("p99")
+    if base_p99 and results["latency_ms"]["p99"] > base_p99 * (1 + max_regression):
+        found.append(f"p99 latency {results['latency_ms']['p99']} ms vs baseline {base_p99} ms")
+    return found
+
+
+def report(results: dict) -> None:
+    latency = results["latency_ms"]
+    print(f"backend: {results['backend']}  params: {results['params']}")
+    print(f"triggered: {results['triggered']}  rejected: {results['rejected']}  finished: {results['finished']}"
+          f"{'  (timed out)' if results['timed_out'] else ''}")
+    print(f"throughput: {results['jobs_per_second']} jobs/s  (triggers: {results['triggers_per_second']}/s)")
+    print(f"latency ms: p50 {latency['p50']}  p90 {latency['p90']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"status write ops: {results['status_write_ops']}  status writer: {results['status_writer']}")
+    for name, counts in results["ops"].items():
+        print(f"  {name:<24} {counts['ops']}  bulk requests: {counts['bulk_requests']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=1, help="worker instances sharing the queue")
+    parser.add_argument("--concurrency", type=int, default=8, help="jobs processed at once per worker")
+    parser.add_argument("--rate", type=float, default=0, help="triggers per second, 0 for as fast as possible")
+    parser.add_argument("--content-tokens", type=int, default=600, help="approximate tokens per document")
+    parser.add_argument("--chunk-tokens", type=int, default=settings.INGESTION_CHUNK_TOKENS)
+    parser.add_argument("--cpu-workers", type=int, default=None, help="processes in each worker's CPU pool")
+    parser.add_argument("--poll-interval", type=float, default=0.01, help="worker poll interval when idle, seconds")
+    parser.add_argument("--op-latency-ms", type=float, default=0.0, help="simulated round trip of the in-memory backend")
+    parser.add_argument("--no-status-batching", dest="status_batching", action="store_false")
+    parser.add_argument("--mongo", action="store_true", help="run against MONGO_URL instead of in memory")
+    parser.add_argument("--timeout", type=float, default=600, help="give up waiting for jobs after this many seconds")
+    parser.add_argument("--json", help="write the results as JSON to this file ('-' for stdout)")
+    parser.add_argument("--baseline", help="results JSON of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="tolerated fraction, default 0.2")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json == "-":
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.max_regression)
+        for message in found:
+            print(f"REGRESSION: {message}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+bcrypt hash and verify timings per cost level on this host.
+
+Prints the median time of a hash and a verify at every cost in the range,
+and the cost startup calibration would pick for PASSWORD_HASH_TARGET_MS.
+
+    python -m benchmarks.bench_password_hashing --min-rounds 10 --max-rounds 14
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "docdb_bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from passlib.hash import bcrypt  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.hashing import calibrate_bcrypt_rounds  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+def median_ms(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-rounds", type=int, default=settings.PASSWORD_HASH_MIN_ROUNDS)
+    parser.add_argument("--max-rounds", type=int, default=14)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--target-ms", type=int, default=settings.PASSWORD_HASH_TARGET_MS)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'hash ms':>9} {'verify ms':>10}")
+    timings = {}
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        handler = bcrypt.using(rounds=rounds)
+        stored = handler.hash(PASSWORD)
+        hash_ms = median_ms(lambda: handler.hash(PASSWORD), args.repeat)
+        verify_ms = median_ms(lambda: handler.verify(PASSWORD, stored), args.repeat)
+        timings[rounds] = hash_ms / 1000
+        print(f"{rounds:>6} {hash_ms:>9.1f} {verify_ms:>10.1f}")
+
+    chosen = calibrate_bcrypt_rounds(args.target_ms, args.min_rounds, args.max_rounds, measure=timings.__getitem__)
+    print(f"calibration would choose rounds={chosen} for a {args.target_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Similarity search latency over a large memory-mapped vector index.
+
+Builds an index of `--chunks` synthetic unit vectors spread over `--owners`
+owners in a temporary directory (or `--path`), then times the search the
+`/documents/similar` endpoint runs, query embedding included:
+
+  - admin: one query scanning every chunk
+  - batch: `--batch` queries scored in one pass, as the similarity loader
+    does for concurrent requests, reported per query
+  - owner: one query scanning a single owner's chunks
+
+Search cost depends on the number of rows and dimensions, not on the text,
+so the stored vectors are random; queries are embedded from real text.
+
+    python -m benchmarks.bench_similarity --chunks 1000000 --dims 128
+"""
+import argparse
+import json
+import math
+import os
+import tempfile
+import time
+from typing import List
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "docdb_bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+import numpy as np  # noqa: E402
+
+from app.core.vector_index import VectorIndex, VectorIndexWriter  # noqa: E402
+from app.ingestion.pipeline import embed_texts  # noqa: E402
+
+QUERIES = [
+    "annual leave policy for employees",
+    "contract renewal notice period",
+    "salary review and benefits",
+    "holiday schedule for the manager",
+]
+BUILD_BLOCK = 100000
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
+
+
+def build_index(root: str, chunks: int, owners: int, dims: int, seed: int = 42) -> float:
+    rng = np.random.default_rng(seed)
+    per_owner = math.ceil(chunks / owners)
+    started = time.perf_counter()
+    writer = VectorIndexWriter(root, dims)
+    for block_start in range(0, chunks, BUILD_BLOCK):
+        count = min(BUILD_BLOCK, chunks - block_start)
+        vectors = rng.standard_normal((count, dims), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        for offset, vector in enumerate(vectors):
+            row = block_start + offset
+            writer.add(f"{row // 8:024x}", row % 8, f"{row // per_owner + 1:024x}", vector.tobytes())
+    writer.commit()
+    return time.perf_counter() - started
+
+
+def time_searches(index: VectorIndex, rounds: int, batch: int, k: int, rows: slice) -> List[float]:
+    samples = []
+    for n in range(rounds):
+        texts = [QUERIES[(n + i) % len(QUERIES)] for i in range(batch)]
+        started = time.perf_counter()
+        index.search(embed_texts(texts, index.dims), k, rows)
+        samples.append((time.perf_counter() - started) * 1000 / batch)
+    return sorted(samples)
+
+
+def summary(samples: List[float]) -> dict:
+    return {
+        "p50": round(percentile(samples, 0.50), 2),
+        "p99": round(percentile(samples, 0.99), 2),
+        "max": round(samples[-1], 2) if samples else 0.0,
+    }
+
+
+def run(args, root: str) -> dict:
+    build_seconds = build_index(root, args.chunks, args.owners, args.dims)
+    index = VectorIndex.load(root)
+    # Page the vectors in first, as a long-running API process would have them
+    index.search(embed_texts(QUERIES[:1], args.dims), args.k)
+
+    owner_rows = index.owner_rows(f"{1:024x}")
+    return {
+        "benchmark": "similarity",
+        "params": {"chunks": args.chunks, "owners": args.owners, "dims": args.dims, "k": args.k, "batch": args.batch},
+        "index_mb": round(args.chunks * args.dims * 4 / 2 ** 20, 1),
+        "build_seconds": round(build_seconds, 2),
+        "admin_ms": summary(time_searches(index, args.rounds, 1, args.k, slice(None))),
+        "batch_ms_per_query": summary(time_searches(index, args.rounds, args.batch, args.k, slice(None))),
+        "owner_rows": owner_rows.stop - owner_rows.start,
+        "owner_ms": summary(time_searches(index, args.rounds, 1, args.k, owner_rows)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000000)
+    parser.add_argument("--owners", type=int, default=1000, help="owners the chunks are spread over")
+    parser.add_argument("--dims", type=int, default=128)
+    parser.add_argument("--k", type=int, default=80, help="chunks returned per query")
+    parser.add_argument("--batch", type=int, default=16, help="queries scored together in the batch case")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--path", help="directory for the index (default: a temporary one)")
+    parser.add_argument("--json", help="write the results as JSON to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.path:
+        results = run(args, args.path)
+    else:
+        with tempfile.TemporaryDirectory() as root:
+            results = run(args, root)
+
+    if args.json == "-":
+        print(json.dumps(results, indent=2))
+        return
+    print(f"params: {results['params']}  index: {results['index_mb']} MB, built in {results['build_seconds']}s")
+    for case in ("admin_ms", "batch_ms_per_query", "owner_ms"):
+        latency = results[case]
+        print(f"  {case:<20} p50 {latency['p50']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"  owner rows: {results['owner_rows']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
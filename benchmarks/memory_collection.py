@@ -0,0 +1,429 @@
+"""
+In-memory stand-in for the Motor collections used by the ingestion path.
+
+`MemoryDatabase` / `MemoryCollection` implement the subset of the Motor API
+that the ingestion service, queue, status writer and worker use, with the
+query operators they need (`$or`, `$in`, `$lt`/`$lte`/`$gt`/`$gte`, `$ne`,
+`$not`, `$exists`) and the `$set` / `$inc` / `$unset` update operators.
+Every call yields to the event loop, optionally after a simulated round-trip
+latency, so concurrent workers interleave as they would against a server.
+Equality lookups on `_id` and a few hot fields are served from hash indexes,
+so claiming a job costs in proportion to the backlog, not to every job ever
+queued.
+
+`CountingDatabase` wraps either this stand-in or a real Motor database and
+counts operations per collection and method, which is how the benchmark
+reports status-write counts for both backends.
+"""
+import asyncio
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from bson import ObjectId
+
+_MISSING = object()
+# Fields the ingestion path looks jobs, chunks and documents up by
+INDEXED_FIELDS = ("status", "ingestion_id", "document_id", "batch_id")
+
+
+def _matches_value(value: Any, condition: Any) -> bool:
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        return all(_apply_operator(value, op, arg) for op, arg in condition.items())
+    if value is _MISSING:
+        return condition is None
+    return value == condition
+
+
+def _apply_operator(value: Any, op: str, arg: Any) -> bool:
+    present = value is not _MISSING and value is not None
+    if op == "$in":
+        return (None if value is _MISSING else value) in arg
+    if op == "$nin":
+        return (None if value is _MISSING else value) not in arg
+    if op == "$ne":
+        return (None if value is _MISSING else value) != arg
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$not":
+        return not _matches_value(value, arg)
+    if op in ("$lt", "$lte", "$gt", "$gte"):
+        if not present:
+            return False
+        if op == "$lt":
+            return value < arg
+        if op == "$lte":
+            return value <= arg
+        if op == "$gt":
+            return value > arg
+        return value >= arg
+    raise NotImplementedError(f"Query operator {op} is not supported by the in-memory collection")
+
+
+def matches(doc: dict, query: Optional[dict]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif not _matches_value(doc.get(key, _MISSING), condition):
+            return False
+    return True
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return dict(doc)
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if fields and all(value for value in fields.values()):
+        result = {key: doc[key] for key in fields if key in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    excluded = {key for key, value in projection.items() if not value}
+    return {key: value for key, value in doc.items() if key not in excluded}
+
+
+def _apply_update(doc: dict, update: dict) -> None:
+    for op, fields in update.items():
+        if op == "$set":
+            doc.update(fields)
+        elif op == "$inc":
+            for key, amount in fields.items():
+                doc[key] = doc.get(key, 0) + amount
+        elif op == "$unset":
+            for key in fields:
+                doc.pop(key, None)
+        else:
+            raise NotImplementedError(f"Update operator {op} is not supported by the in-memory collection")
+
+
+def _sort_key(value: Any):
+    # Missing and null sort before everything else, like in MongoDB
+    return (0, 0) if value is None or value is _MISSING else (1, value)
+
+
+def _sorted(docs: List[dict], sort) -> List[dict]:
+    if not sort:
+        return docs
+    if isinstance(sort, str):
+        sort = [(sort, 1)]
+    for key, direction in reversed(list(sort)):
+        docs = sorted(docs, key=lambda doc: _sort_key(doc.get(key)), reverse=direction == -1)
+    return docs
+
+
+def _equality_fields(query: dict) -> dict:
+    return {
+        key: value for key, value in query.items()
+        if not key.startswith("$") and not (isinstance(value, dict) and any(k.startswith("$") for k in value))
+    }
+
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query: Optional[dict], projection: Optional[dict]):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: Optional[int] = None) -> "MemoryCursor":
+        self._sort = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else key_or_list
+        return self
+
+    def skip(self, count: int) -> "MemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> "MemoryCursor":
+        return self
+
+    def _results(self) -> List[dict]:
+        docs = _sorted(self._collection._find(self._query), self._sort)[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        await self._collection._round_trip()
+        results = self._results()
+        return results if length is None else results[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._collection._round_trip()
+        for doc in self._results():
+            yield doc
+
+
+class MemoryCollection:
+    def __init__(self, name: str, latency_seconds: float = 0.0, indexed_fields: Iterable[str] = INDEXED_FIELDS):
+        self.name = name
+        self.latency_seconds = latency_seconds
+        self.documents: Dict[Any, dict] = {}
+        # Insertion sequence of every _id, so index lookups keep natural order
+        self._order: Dict[Any, int] = {}
+        self._inserted = 0
+        # field -> value -> _ids of the documents holding that value
+        self._indexes: Dict[str, Dict[Any, Set[Any]]] = {field: defaultdict(set) for field in indexed_fields}
+
+    async def _round_trip(self) -> None:
+        # Always yield, like a real network call would
+        await asyncio.sleep(self.latency_seconds)
+
+    def _index(self, doc: dict) -> None:
+        for field, index in self._indexes.items():
+            value = doc.get(field)
+            if value is not None:
+                index[value].add(doc["_id"])
+
+    def _unindex(self, doc: dict) -> None:
+        for field, index in self._indexes.items():
+            value = doc.get(field)
+            if value is not None:
+                index[value].discard(doc["_id"])
+
+    def _candidates(self, query: Optional[dict]) -> Optional[Set[Any]]:
+        """
+        The _ids that can match `query` according to the indexes, or None if
+        no index applies and every document has to be scanned.
+        """
+        if not query:
+            return None
+        if "_id" in query:
+            wanted = query["_id"]
+            if not isinstance(wanted, dict):
+                return {wanted} if wanted in self.documents else set()
+            if "$in" in wanted:
+                return {i for i in wanted["$in"] if i in self.documents}
+        for field, index in self._indexes.items():
+            value = query.get(field)
+            if value is None:
+                continue
+            if not isinstance(value, dict):
+                return set(index.get(value, ()))
+            if set(value) == {"$in"}:
+                return set().union(*(index.get(v, ()) for v in value["$in"]))
+        if "$or" in query:
+            union: Set[Any] = set()
+            for clause in query["$or"]:
+                ids = self._candidates(clause)
+                if ids is None:
+                    return None
+                union |= ids
+            return union
+        return None
+
+    def _find(self, query: Optional[dict]) -> List[dict]:
+        ids = self._candidates(query)
+        if ids is None:
+            docs = self.documents.values()
+        else:
+            docs = (self.documents[i] for i in sorted(ids, key=self._order.__getitem__) if i in self.documents)
+        return [doc for doc in docs if matches(doc, query)]
+
+    def _insert(self, doc: dict) -> Any:
+        doc.setdefault("_id", ObjectId())
+        stored = dict(doc)
+        self.documents[doc["_id"]] = stored
+        self._inserted += 1
+        self._order[doc["_id"]] = self._inserted
+        self._index(stored)
+        return doc["_id"]
+
+    def _update(self, query: dict, update: dict, upsert: bool = False, many: bool = False) -> SimpleNamespace:
+        found = self._find(query)
+        if not many:
+            found = found[:1]
+        for doc in found:
+            self._unindex(doc)
+            _apply_update(doc, update)
+            self._index(doc)
+        upserted_id = None
+        if not found and upsert:
+            doc = _equality_fields(query)
+            _apply_update(doc, update)
+            upserted_id = self._insert(doc)
+        return SimpleNamespace(matched_count=len(found), modified_count=len(found), upserted_id=upserted_id)
+
+    def _replace(self, query: dict, replacement: dict, upsert: bool = False) -> SimpleNamespace:
+        found = self._find(query)[:1]
+        if found:
+            self._unindex(found[0])
+            replacement = {**replacement, "_id": found[0]["_id"]}
+            self.documents[found[0]["_id"]] = replacement
+            self._index(replacement)
+            return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        upserted_id = self._insert({**_equality_fields(query), **replacement}) if upsert else None
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=upserted_id)
+
+    def _delete(self, query: dict, many: bool = False) -> SimpleNamespace:
+        found = self._find(query)
+        if not many:
+            found = found[:1]
+        for doc in found:
+            self._unindex(doc)
+            del self.documents[doc["_id"]]
+            del self._order[doc["_id"]]
+        return SimpleNamespace(deleted_count=len(found))
+
+    async def insert_one(self, doc: dict) -> SimpleNamespace:
+        await self._round_trip()
+        return SimpleNamespace(inserted_id=self._insert(doc))
+
+    async def insert_many(self, docs: List[dict], ordered: bool = True) -> SimpleNamespace:
+        await self._round_trip()
+        return SimpleNamespace(inserted_ids=[self._insert(doc) for doc in docs])
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None) -> Optional[dict]:
+        await self._round_trip()
+        found = self._find(query)
+        return _project(found[0], projection) if found else None
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None) -> MemoryCursor:
+        return MemoryCursor(self, query, projection)
+
+    async def find_one_and_update(
+        self,
+        query: dict,
+        update: dict,
+        projection: Optional[dict] = None,
+        sort=None,
+        upsert: bool = False,
+        return_document: bool = False,
+    ) -> Optional[dict]:
+        await self._round_trip()
+        found = _sorted(self._find(query), sort)[:1]
+        if not found:
+            return None
+        before = dict(found[0])
+        self._unindex(found[0])
+        _apply_update(found[0], update)
+        self._index(found[0])
+        return _project(found[0] if return_document else before, projection)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False) -> SimpleNamespace:
+        await self._round_trip()
+        return self._update(query, update, upsert)
+
+    async def update_many(self, query: dict, update: dict, upsert: bool = False) -> SimpleNamespace:
+        await self._round_trip()
+        return self._update(query, update, upsert, many=True)
+
+    async def replace_one(self, query: dict, replacement: dict, upsert: bool = False) -> SimpleNamespace:
+        await self._round_trip()
+        return self._replace(query, replacement, upsert)
+
+    async def delete_one(self, query: dict) -> SimpleNamespace:
+        await self._round_trip()
+        return self._delete(query)
+
+    async def delete_many(self, query: dict) -> SimpleNamespace:
+        await self._round_trip()
+        return self._delete(query, many=True)
+
+    async def count_documents(self, query: dict, limit: int = 0) -> int:
+        await self._round_trip()
+        count = len(self._find(query))
+        return min(count, limit) if limit else count
+
+    async def bulk_write(self, requests: list, ordered: bool = True) -> SimpleNamespace:
+        await self._round_trip()
+        result = SimpleNamespace(inserted_count=0, matched_count=0, modified_count=0, deleted_count=0, upserted_count=0)
+        for request in requests:
+            kind = type(request).__name__
+            if kind == "InsertOne":
+                self._insert(request._doc)
+                result.inserted_count += 1
+            elif kind in ("UpdateOne", "UpdateMany", "ReplaceOne"):
+                upsert = bool(getattr(request, "_upsert", False))
+                if kind == "ReplaceOne":
+                    outcome = self._replace(request._filter, request._doc, upsert)
+                else:
+                    outcome = self._update(request._filter, request._doc, upsert, many=kind == "UpdateMany")
+                result.matched_count += outcome.matched_count
+                result.modified_count += outcome.modified_count
+                result.upserted_count += outcome.upserted_id is not None
+            elif kind in ("DeleteOne", "DeleteMany"):
+                result.deleted_count += self._delete(request._filter, many=kind == "DeleteMany").deleted_count
+            else:
+                raise NotImplementedError(f"Bulk request {kind} is not supported by the in-memory collection")
+        return result
+
+
+class MemoryDatabase:
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name, self.latency_seconds)
+        return self._collections[name]
+
+    async def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    async def create_collection(self, name: str, **options) -> MemoryCollection:
+        return self[name]
+
+
+class CountingCollection:
+    """
+    Forwards every call to the wrapped collection and counts it by method.
+    """
+
+    def __init__(self, inner, ops: Counter, bulk_requests: Counter):
+        self._inner = inner
+        self._ops = ops
+        self._bulk_requests = bulk_requests
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._inner, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self._ops[name] += 1
+            if name in ("bulk_write", "insert_many") and args:
+                self._bulk_requests[name] += len(args[0])
+            return attr(*args, **kwargs)
+        return counted
+
+
+class CountingDatabase:
+    def __init__(self, inner):
+        self._inner = inner
+        self._collections: Dict[str, CountingCollection] = {}
+        self.ops: Dict[str, Counter] = {}
+        self.bulk_requests: Dict[str, Counter] = {}
+
+    def __getitem__(self, name: str) -> CountingCollection:
+        if name not in self._collections:
+            self.ops[name], self.bulk_requests[name] = Counter(), Counter()
+            self._collections[name] = CountingCollection(self._inner[name], self.ops[name], self.bulk_requests[name])
+        return self._collections[name]
+
+    def __getattr__(self, name: str):
+        return getattr(self._inner, name)
+
+    def reset_counts(self) -> None:
+        for counter in (*self.ops.values(), *self.bulk_requests.values()):
+            counter.clear()
+
+    def counts(self) -> Dict[str, dict]:
+        return {
+            name: {"ops": dict(self.ops[name]), "bulk_requests": dict(self.bulk_requests[name])}
+            for name in self._collections
+            if self.ops[name]
+        }
@@ -0,0 +1,23 @@
+"""
+The scratch database of the benchmarks that drop and reseed collections.
+
+It is named by `BENCH_DB_NAME` (default `docdb_bench`), never by `DB_NAME`,
+which may name the application's own database through the environment or
+`.env`. Names that don't end in `_bench` are refused.
+
+Import this before anything that reads the settings.
+"""
+import os
+
+BENCH_DB_SUFFIX = "_bench"
+
+
+def use_scratch_db() -> str:
+    """
+    Point `DB_NAME` at the benchmark database and return its name.
+    """
+    name = os.environ.get("BENCH_DB_NAME", "docdb" + BENCH_DB_SUFFIX)
+    if not name.endswith(BENCH_DB_SUFFIX):
+        raise SystemExit(f"Refusing to drop collections in '{name}': BENCH_DB_NAME must end in '{BENCH_DB_SUFFIX}'")
+    os.environ["DB_NAME"] = name
+    return name